@@ -10,26 +10,34 @@ This backend uses:
 Architecture Reference: https://github.com/vectornguyen76/face-recognition
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import cv2
 import numpy as np
-import json
 import base64
 import os
 import uuid
 import hashlib
+import json
 from datetime import datetime
 import traceback
 from PIL import Image
 import io
 import time
+import threading
 
 # Import face detection and recognition modules
 from face_detection.scrfd_detector import SCRFD
-from face_recognition_module.arcface_recognizer import ArcFaceRecognizer, compare_encodings
+from face_recognition_module.arcface_recognizer import ArcFaceRecognizer
+from face_recognition_module.batching import EmbeddingBatcher
+from face_recognition_module.search_index import create_search_index
+from face_recognition_module.versioned_gallery import VersionedGallery
 from face_alignment.alignment import norm_crop
-from download_models import check_and_download_models
+from face_quality.quality_scorer import FaceQualityScorer
+from storage.gallery_file import GalleryFile, migrate_encoding_files
+from storage.people_store import PeopleStore
+from enrollment.bulk import ImageDecoder, ManifestError, UploadSource, ZipSource
+from download_models import check_and_download_models, resolve_model_path
 
 app = Flask(__name__)
 CORS(app)
@@ -40,7 +48,8 @@ CORS(app)
 
 # Database configuration
 DB_FOLDER = os.path.join(os.path.dirname(__file__), 'database', 'faces')
-DB_JSON = os.path.join(os.path.dirname(__file__), 'database', 'people.json')
+DB_JSON = os.path.join(os.path.dirname(__file__), 'database', 'people.json')  # Import/export format (people_json.py)
+DB_SQLITE = os.path.join(os.path.dirname(__file__), 'database', 'people.db')
 IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'database', 'images')
 ENCODINGS_DIR = os.path.join(os.path.dirname(__file__), 'database', 'encodings')
 MODELS_DIR = os.path.join(os.path.dirname(__file__), 'models')
@@ -50,13 +59,78 @@ MODELS_DIR = os.path.join(os.path.dirname(__file__), 'models')
 SCRFD_MODEL_PATH = os.path.join(MODELS_DIR, 'det_10g.onnx')
 ARCFACE_MODEL_PATH = os.path.join(MODELS_DIR, 'w600k_r50.onnx')
 
+# Model precision: 'fp32', or 'int8_dynamic' / 'int8_static' variants created by quantize_models.py
+MODEL_PRECISION = os.environ.get('MODEL_PRECISION', 'fp32')
+
+# ONNX Runtime configuration (thread counts can be pinned per worker via environment variables)
+ONNX_USE_IO_BINDING = True  # Reuse preallocated output buffers via IOBinding (falls back to session.run)
+ONNX_INTRA_OP_THREADS = int(os.environ.get('ONNX_INTRA_OP_THREADS', 0))  # 0 = ONNX Runtime default
+ONNX_INTER_OP_THREADS = int(os.environ.get('ONNX_INTER_OP_THREADS', 0))  # 0 = ONNX Runtime default
+ONNX_EXECUTION_MODE = os.environ.get('ONNX_EXECUTION_MODE', 'sequential')  # 'sequential' or 'parallel'
+ONNX_GRAPH_OPTIMIZATION_LEVEL = os.environ.get('ONNX_GRAPH_OPTIMIZATION_LEVEL', 'all')  # 'disable', 'basic', 'extended', 'all'
+ONNX_OPTIMIZED_MODELS_DIR = os.path.join(MODELS_DIR, 'optimized')  # Cache of optimized graphs (None to disable)
+
 # Detection configuration
 DETECTION_THRESHOLD = 0.5  # Face detection confidence threshold
 DETECTION_INPUT_SIZE = (640, 640)  # SCRFD input size
+DETECTION_AUTO_INPUT_SIZE = True  # Fit the input size to the frame aspect ratio instead of padding to a square
+DETECTION_NMS_MODE = 'auto'  # NMS engine: 'auto', 'greedy', 'matrix' or 'soft'
+DETECTION_PRE_NMS_TOPK = 1000  # Maximum number of candidates passed to NMS (0 = no limit)
+DETECTION_MIN_FACE_SIZE = 0  # Smallest face size in pixels to detect (0 = no limit); lowers detection resolution
+DETECTION_MAX_FACE_SIZE = 0  # Largest face size in pixels to detect (0 = no limit)
+
+# Tiled detection for high-resolution frames (e.g. 4K CCTV)
+DETECTION_TILING_ENABLED = True
+DETECTION_TILING_MIN_SIZE = 2560  # Frames whose longer side exceeds this are detected in tiles
+DETECTION_TILE_SIZE = 1280  # Tile side length in image pixels
+DETECTION_TILE_OVERLAP = 0.2  # Overlap between neighbouring tiles (fraction of tile size)
+DETECTION_TILE_COARSE_FIRST = False  # Tile only where the full-frame pass found candidates (faster, but misses faces too small for that pass)
 
 # Recognition configuration
 RECOGNITION_THRESHOLD = 0.25  # Minimum similarity score for recognition (0-1, higher is stricter)
 FACE_ALIGN_SIZE = 112  # Face alignment size for ArcFace
+RECOGNITION_BATCH_SIZE = 32  # Maximum number of faces per ArcFace inference call
+RECOGNITION_TOP_K = 1  # Best gallery matches returned per face (>1 adds 'candidates' to each match)
+RECOGNITION_ONE_TO_ONE = False  # Never label two faces of the same frame as the same person (the weaker match becomes unknown)
+
+# Gallery search index ('brute_force' is exact; 'ivf_flat' and 'hnsw' are approximate, for large galleries;
+# 'hnsw' rebuilds its graph at every startup, ~5 min per worker at 50k encodings - see hnsw_index.py)
+SEARCH_INDEX_TYPE = os.environ.get('SEARCH_INDEX_TYPE', 'brute_force')
+SEARCH_INDEX_NPROBE = int(os.environ.get('SEARCH_INDEX_NPROBE', 8))  # IVF clusters searched per face (higher = better recall)
+SEARCH_INDEX_EF = int(os.environ.get('SEARCH_INDEX_EF', 64))  # HNSW candidate list size per face (higher = better recall)
+# Compressed galleries ('sq_fp16', 'sq_int8', 'pq') keep only compact codes in memory and
+# re-score their best candidates exactly from the .npy files in ENCODINGS_DIR
+SEARCH_INDEX_RERANK = int(os.environ.get('SEARCH_INDEX_RERANK', 64))  # Candidates re-scored exactly per face (0 = off)
+
+# Binary-hash prefilter for the brute-force gallery: a Hamming scan over binary codes
+# (stored as <person_id>.hash in ENCODINGS_DIR) picks candidates that are then scored exactly
+RECOGNITION_HASH_PREFILTER = os.environ.get('RECOGNITION_HASH_PREFILTER', '0') == '1'
+RECOGNITION_HASH_BITS = 0  # Code length in bits (0 = sign bits of the 512-d encoding)
+RECOGNITION_HASH_CANDIDATES = 256  # Candidates re-ranked exactly per face
+RECOGNITION_HASH_MIN_GALLERY = 5000  # Smaller galleries are searched exactly (see benchmark_search_index.py --crossover)
+
+# Encoding storage: 'files' keeps one <person_id>.npy per person, 'consolidated' keeps one
+# memory-mapped gallery file in ENCODINGS_DIR whose pages all workers share (see migrate_gallery.py)
+GALLERY_STORAGE = os.environ.get('GALLERY_STORAGE', 'files')
+GALLERY_COMPACT_THRESHOLD = 1024  # Appended registrations/deletions that trigger a background compaction
+GALLERY_COMPACT_INTERVAL = 300.0  # Seconds after which appended records are compacted anyway
+
+# Face quality gate (skips ArcFace for tiny, turned-away or blurred faces)
+FACE_QUALITY_ENABLED = True
+FACE_QUALITY_THRESHOLD = 0.3  # Minimum quality score (0-1) for a face to be embedded
+FACE_QUALITY_MIN_SIZE = 24  # Box side in pixels at which the size factor drops to 0
+FACE_QUALITY_MAX_YAW = 60.0  # Yaw in degrees at which the pose factor drops to 0
+FACE_QUALITY_MIN_BLUR = 10.0  # Laplacian variance of the aligned crop at which the sharpness factor drops to 0
+
+# Cross-request micro-batching of embeddings (collects faces from concurrent requests)
+EMBEDDING_BATCHING_ENABLED = True
+EMBEDDING_BATCH_WINDOW_MS = 3.0  # Maximum time to wait for more faces before running a batch
+
+# Bulk enrollment (/api/register/bulk)
+BULK_DECODE_WORKERS = int(os.environ.get('BULK_DECODE_WORKERS', 0))  # Image decoder threads (0 = one per CPU)
+BULK_CHUNK_SIZE = 64  # Manifest rows decoded, detected and embedded together
+BULK_MAX_IMAGE_SIZE = 1920  # Longer image side after decoding (larger photos are downscaled)
+BULK_MAX_PEOPLE = 10000  # Maximum manifest rows per request
 
 # Create necessary directories
 os.makedirs(DB_FOLDER, exist_ok=True)
@@ -68,6 +142,15 @@ os.makedirs(MODELS_DIR, exist_ok=True)
 # Model Initialization
 # ============================================================================
 
+# Session settings shared by the detector and the recognizer
+onnx_session_config = {
+    'intra_op_num_threads': ONNX_INTRA_OP_THREADS,
+    'inter_op_num_threads': ONNX_INTER_OP_THREADS,
+    'execution_mode': ONNX_EXECUTION_MODE,
+    'graph_optimization_level': ONNX_GRAPH_OPTIMIZATION_LEVEL,
+    'optimized_model_dir': ONNX_OPTIMIZED_MODELS_DIR
+}
+
 # Check and download models if needed
 print("\n" + "="*60)
 print("Checking for required models...")
@@ -78,8 +161,18 @@ model_status = check_and_download_models(MODELS_DIR)
 detector = None
 if model_status.get('scrfd', False):
     try:
-        detector = SCRFD(model_file=SCRFD_MODEL_PATH)
-        print(f"✓ SCRFD detector loaded from {SCRFD_MODEL_PATH}")
+        detector = SCRFD(
+            model_file=resolve_model_path(SCRFD_MODEL_PATH, MODEL_PRECISION),
+            use_io_binding=ONNX_USE_IO_BINDING,
+            session_config=onnx_session_config
+        )
+        detector.prepare(
+            0,
+            nms_mode=DETECTION_NMS_MODE,
+            pre_nms_topk=DETECTION_PRE_NMS_TOPK,
+            auto_max_size=max(DETECTION_INPUT_SIZE)
+        )
+        print(f"✓ SCRFD detector loaded from {detector.model_file}")
     except Exception as e:
         print(f"✗ Failed to load SCRFD detector: {e}")
 else:
@@ -89,16 +182,113 @@ else:
 recognizer = None
 if model_status.get('arcface', False):
     try:
-        recognizer = ArcFaceRecognizer(model_file=ARCFACE_MODEL_PATH)
-        print(f"✓ ArcFace recognizer loaded from {ARCFACE_MODEL_PATH}")
+        recognizer = ArcFaceRecognizer(
+            model_file=resolve_model_path(ARCFACE_MODEL_PATH, MODEL_PRECISION),
+            max_batch_size=RECOGNITION_BATCH_SIZE,
+            use_io_binding=ONNX_USE_IO_BINDING,
+            session_config=onnx_session_config
+        )
+        print(f"✓ ArcFace recognizer loaded from {recognizer.model_file}")
     except Exception as e:
         print(f"✗ Failed to load ArcFace recognizer: {e}")
 else:
     print(f"✗ ArcFace model not available - face recognition disabled")
 
-# Cache for face encodings (for faster real-time detection)
-encodings_cache = {}
-names_cache = {}
+# Initialize embedding batching scheduler
+embedding_batcher = None
+if recognizer is not None and EMBEDDING_BATCHING_ENABLED:
+    embedding_batcher = EmbeddingBatcher(
+        recognizer,
+        max_batch_size=RECOGNITION_BATCH_SIZE,
+        max_wait_ms=EMBEDDING_BATCH_WINDOW_MS
+    )
+    embedding_batcher.start()
+    print(f"✓ Embedding batcher started (window={EMBEDDING_BATCH_WINDOW_MS}ms, max batch={RECOGNITION_BATCH_SIZE})")
+
+# Initialize face quality scorer
+face_quality_scorer = None
+if FACE_QUALITY_ENABLED:
+    face_quality_scorer = FaceQualityScorer(
+        threshold=FACE_QUALITY_THRESHOLD,
+        min_face_size=FACE_QUALITY_MIN_SIZE,
+        max_yaw=FACE_QUALITY_MAX_YAW,
+        min_blur=FACE_QUALITY_MIN_BLUR,
+        image_size=FACE_ALIGN_SIZE
+    )
+
+# Decoder thread pool for bulk enrollment (threads start on the first bulk request)
+bulk_decoder = ImageDecoder(num_workers=BULK_DECODE_WORKERS, max_size=BULK_MAX_IMAGE_SIZE)
+
+
+# Serializes encoding writes with the gallery reload after a compaction, so a
+# registration is never lost between gallery_file.read() and load_gallery().
+# Re-entrant: a write can itself pick up another process's compaction.
+gallery_lock = threading.RLock()
+
+
+def on_gallery_compacted():
+    """Point the brute-force gallery at the freshly compacted file so its pages are shared again"""
+    # The first add/remove after adopting the mapped matrix copies all of it, so until the
+    # next compaction (at most GALLERY_COMPACT_INTERVAL seconds) that worker holds a private copy
+    if SEARCH_INDEX_TYPE == 'brute_force':
+        with gallery_lock:
+            person_ids, encodings = gallery_file.read()
+            load_gallery(person_ids, encodings)
+
+
+# Consolidated gallery file (None = one .npy file per person)
+gallery_file = None
+if GALLERY_STORAGE == 'consolidated':
+    gallery_file = GalleryFile(
+        ENCODINGS_DIR,
+        embedding_size=512,
+        compact_threshold=GALLERY_COMPACT_THRESHOLD,
+        compact_interval=GALLERY_COMPACT_INTERVAL,
+        on_compact=on_gallery_compacted
+    )
+    if not gallery_file.exists() and any(name.endswith('.npy') for name in os.listdir(ENCODINGS_DIR)):
+        print("⚠ No gallery file yet - migrating per-person encodings (see migrate_gallery.py)")
+        migrate_encoding_files(ENCODINGS_DIR)
+    gallery_file.open()
+    gallery_file.start()
+    print(f"✓ Gallery file mapped: {len(gallery_file)} encodings")
+
+
+def read_person_encoding(person_id):
+    """Read a face encoding from ENCODINGS_DIR, bypassing the cache"""
+    if gallery_file is not None:
+        return gallery_file.get(person_id)
+    encoding_path = os.path.join(ENCODINGS_DIR, f"{person_id}.npy")
+    if os.path.exists(encoding_path):
+        return np.load(encoding_path)
+    return None
+
+
+# Search index over all enrolled encodings, updated on register/delete
+hash_prefilter_enabled = RECOGNITION_HASH_PREFILTER and SEARCH_INDEX_TYPE == 'brute_force'
+if hash_prefilter_enabled:
+    face_gallery = create_search_index(
+        'binary_hash',
+        embedding_size=512,
+        num_bits=RECOGNITION_HASH_BITS,
+        num_candidates=RECOGNITION_HASH_CANDIDATES,
+        min_gallery_size=RECOGNITION_HASH_MIN_GALLERY
+    )
+else:
+    if RECOGNITION_HASH_PREFILTER:
+        print(f"⚠ RECOGNITION_HASH_PREFILTER ignored: only supported with the brute_force search index")
+    face_gallery = create_search_index(
+        SEARCH_INDEX_TYPE,
+        embedding_size=512,
+        nprobe=SEARCH_INDEX_NPROBE,
+        ef_search=SEARCH_INDEX_EF,
+        rerank=SEARCH_INDEX_RERANK,
+        encoding_loader=read_person_encoding
+    )
+
+# The brute-force gallery publishes immutable snapshots (matrix + ids + names) that
+# recognition reads without locks; register/delete publish a new version
+gallery_snapshots = isinstance(face_gallery, VersionedGallery)
 
 # Unknown person tracking
 unknown_faces = {}  # Track unknown faces by session
@@ -113,62 +303,138 @@ TRACKING_SIMILARITY_THRESHOLD = 0.6  # Threshold for considering same person acr
 # Database Operations
 # ============================================================================
 
-# Initialize JSON database
-if not os.path.exists(DB_JSON):
-    with open(DB_JSON, 'w') as f:
-        json.dump([], f)
+# Initialize SQLite people store (people.json is imported once, when the store is created)
+people_store_created = not os.path.exists(DB_SQLITE)
+people_store = PeopleStore(DB_SQLITE)
+if people_store_created and os.path.exists(DB_JSON):
+    try:
+        print(f"✓ Imported {people_store.import_json(DB_JSON)} people from {DB_JSON}")
+    except Exception as e:
+        print(f"Error importing {DB_JSON}: {e}")
 
 
 def load_database():
-    """Load the people database from JSON"""
+    """Load all people records (cached, reloaded only after a write)"""
     try:
-        with open(DB_JSON, 'r') as f:
-            return json.load(f)
+        return people_store.all()
     except Exception as e:
         print(f"Error loading database: {e}")
         return []
 
 
-def save_database(people):
-    """Save the people database to JSON"""
+def add_person(person):
+    """Insert a person record into the people store"""
     try:
-        with open(DB_JSON, 'w') as f:
-            json.dump(people, f, indent=2)
+        people_store.add(person)
         return True
     except Exception as e:
         print(f"Error saving database: {e}")
         return False
 
 
-def load_person_encoding(person_id):
-    """Load face encoding from file or cache"""
-    if person_id in encodings_cache:
-        return encodings_cache[person_id]
-    
-    encoding_path = os.path.join(ENCODINGS_DIR, f"{person_id}.npy")
-    if os.path.exists(encoding_path):
-        encoding = np.load(encoding_path)
-        encodings_cache[person_id] = encoding
-        return encoding
-    
-    return None
+def remove_person(person_id):
+    """Delete a person record from the people store"""
+    try:
+        people_store.delete(person_id)
+        return True
+    except Exception as e:
+        print(f"Error saving database: {e}")
+        return False
 
 
-def save_person_encoding(person_id, encoding):
-    """Save face encoding to file and cache"""
-    encoding_path = os.path.join(ENCODINGS_DIR, f"{person_id}.npy")
-    np.save(encoding_path, encoding)
-    encodings_cache[person_id] = encoding
+def save_person_encoding(person_id, encoding, name=None):
+    """Save face encoding to file and add it to the gallery"""
+    save_person_encodings([person_id], [encoding], [name])
+
+
+def save_person_encodings(person_ids, encodings, names):
+    """Save several face encodings (one gallery-file write) and add them to the gallery"""
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(len(person_ids), -1)
+    with gallery_lock:
+        if gallery_file is not None:
+            gallery_file.append_many(person_ids, encodings)
+        else:
+            for person_id, encoding in zip(person_ids, encodings):
+                np.save(os.path.join(ENCODINGS_DIR, f"{person_id}.npy"), encoding)
+        if hash_prefilter_enabled:
+            codes = face_gallery.encode(encodings)
+            for person_id, encoding, code in zip(person_ids, encodings, codes):
+                # With the gallery file, codes are recomputed from the mapped matrix at startup
+                if gallery_file is None:
+                    code.tofile(os.path.join(ENCODINGS_DIR, f"{person_id}.hash"))
+                face_gallery.add(person_id, encoding, code)
+        elif gallery_snapshots:
+            # Published as one new snapshot version
+            face_gallery.add_many(person_ids, encodings, names=names)
+        else:
+            for person_id, encoding in zip(person_ids, encodings):
+                face_gallery.add(person_id, encoding)
+
+
+def delete_person_encoding(person_id):
+    """Delete a person's encoding files and remove it from the gallery"""
+    with gallery_lock:
+        if gallery_file is not None:
+            gallery_file.delete(person_id)
+        for extension in ('.npy', '.hash'):
+            path = os.path.join(ENCODINGS_DIR, f"{person_id}{extension}")
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except Exception as e:
+                    print(f"Error deleting encoding: {e}")
+        face_gallery.remove(person_id)
+
+
+def load_person_hash_code(person_id, encoding):
+    """Load a person's binary hash code, (re)creating the .hash file if missing or stale"""
+    code_path = os.path.join(ENCODINGS_DIR, f"{person_id}.hash")
+    if os.path.exists(code_path):
+        code = np.fromfile(code_path, dtype=np.uint8)
+        if code.size == face_gallery.hasher.code_size:
+            return code
+    code = face_gallery.encode(np.asarray(encoding)[np.newaxis])[0]
+    try:
+        code.tofile(code_path)
+    except Exception as e:
+        print(f"Error saving hash code: {e}")
+    return code
+
+
+def load_gallery(person_ids, encodings, codes=None):
+    """Replace the gallery contents (snapshot galleries also keep each person's name)"""
+    if gallery_snapshots:
+        people = people_store.by_id()
+        names = [people.get(person_id, {}).get('name') for person_id in person_ids]
+        face_gallery.load(person_ids, encodings, names=names)
+    elif hash_prefilter_enabled:
+        face_gallery.load(person_ids, encodings, codes=codes)
+    else:
+        face_gallery.load(person_ids, encodings)
 
 
 def load_all_encodings():
-    """Load all face encodings into cache for faster recognition"""
-    people = load_database()
-    for person in people:
+    """Load all face encodings into the gallery for faster recognition"""
+    if gallery_file is not None:
+        # One memory-mapped matrix instead of one file per person
+        person_ids, encodings = gallery_file.read()
+        load_gallery(person_ids, encodings)
+        return len(face_gallery)
+
+    person_ids = []
+    encodings = []
+    for person in load_database():
         person_id = person.get('id')
-        load_person_encoding(person_id)
-        names_cache[person_id] = person.get('name')
-    return len(encodings_cache)
+        encoding = read_person_encoding(person_id)
+        if encoding is not None:
+            person_ids.append(person_id)
+            encodings.append(encoding)
+    codes = None
+    if hash_prefilter_enabled and person_ids:
+        codes = np.array([load_person_hash_code(person_id, encoding)
+                          for person_id, encoding in zip(person_ids, encodings)], dtype=np.uint8)
+    load_gallery(person_ids, encodings, codes=codes)
+    return len(face_gallery)
 
 
 # ============================================================================
@@ -230,7 +496,54 @@ def process_uploaded_file(file):
 # Face Detection and Recognition Functions
 # ============================================================================
 
-def detect_faces(image, thresh=None, input_size=None):
+def format_detections(bboxes, landmarks):
+    """
+    Convert raw SCRFD outputs into the API detection format.
+    
+    Args:
+        bboxes: np.array of shape (N, 5) with [x1, y1, x2, y2, score]
+        landmarks: np.array of shape (N, 5, 2) or None
+        
+    Returns:
+        List of dicts with 'bbox', 'landmarks', 'confidence' for each detected face
+    """
+    results = []
+    for i in range(len(bboxes)):
+        bbox = bboxes[i]
+        x1, y1, x2, y2, score = bbox[0], bbox[1], bbox[2], bbox[3], bbox[4]
+        
+        result = {
+            'bbox': {
+                'x': int(x1),
+                'y': int(y1),
+                'w': int(x2 - x1),
+                'h': int(y2 - y1)
+            },
+            'confidence': float(score) / 100 if score > 1 else float(score),
+            'landmarks': landmarks[i].tolist() if landmarks is not None else None
+        }
+        results.append(result)
+    
+    return results
+
+
+def resolve_detection_input_size(image, min_face_size=None):
+    """
+    Get the SCRFD input size (width, height) to use for an image.
+    
+    With DETECTION_AUTO_INPUT_SIZE enabled this is the smallest stride-aligned
+    size matching the image aspect ratio, otherwise DETECTION_INPUT_SIZE.
+    A minimum face size lowers the resolution further when possible.
+    """
+    if min_face_size is None:
+        min_face_size = DETECTION_MIN_FACE_SIZE
+    if detector is None:
+        return DETECTION_INPUT_SIZE
+    input_size = 'auto' if DETECTION_AUTO_INPUT_SIZE else DETECTION_INPUT_SIZE
+    return detector.resolve_input_size(image.shape, input_size, min_face_size)
+
+
+def detect_faces(image, thresh=None, input_size=None, min_face_size=None, max_face_size=None):
     """
     Detect faces in an image using SCRFD.
     
@@ -238,6 +551,8 @@ def detect_faces(image, thresh=None, input_size=None):
         image: Input image (BGR format)
         thresh: Detection threshold (optional)
         input_size: Model input size (optional)
+        min_face_size: Smallest face size in pixels (optional)
+        max_face_size: Largest face size in pixels (optional)
         
     Returns:
         List of dicts with 'bbox', 'landmarks', 'confidence' for each detected face
@@ -246,35 +561,70 @@ def detect_faces(image, thresh=None, input_size=None):
         raise RuntimeError("Face detector not initialized. Please check model file.")
     
     thresh = thresh or DETECTION_THRESHOLD
-    input_size = input_size or DETECTION_INPUT_SIZE
+    min_face_size = DETECTION_MIN_FACE_SIZE if min_face_size is None else min_face_size
+    max_face_size = DETECTION_MAX_FACE_SIZE if max_face_size is None else max_face_size
+    input_size = input_size or resolve_detection_input_size(image, min_face_size)
     
     try:
-        bboxes, landmarks = detector.detect(image, thresh=thresh, input_size=input_size)
-        
-        results = []
-        for i in range(len(bboxes)):
-            bbox = bboxes[i]
-            x1, y1, x2, y2, score = bbox[0], bbox[1], bbox[2], bbox[3], bbox[4]
-            
-            result = {
-                'bbox': {
-                    'x': int(x1),
-                    'y': int(y1),
-                    'w': int(x2 - x1),
-                    'h': int(y2 - y1)
-                },
-                'confidence': float(score) / 100 if score > 1 else float(score),
-                'landmarks': landmarks[i].tolist() if landmarks is not None else None
-            }
-            results.append(result)
-        
-        return results
+        if DETECTION_TILING_ENABLED and max(image.shape[:2]) > DETECTION_TILING_MIN_SIZE:
+            bboxes, landmarks = detector.detect_tiled(
+                image,
+                thresh=thresh,
+                input_size=input_size,
+                min_face_size=min_face_size,
+                max_face_size=max_face_size,
+                tile_size=DETECTION_TILE_SIZE,
+                tile_overlap=DETECTION_TILE_OVERLAP,
+                coarse_first=DETECTION_TILE_COARSE_FIRST
+            )
+        else:
+            bboxes, landmarks = detector.detect(
+                image,
+                thresh=thresh,
+                input_size=input_size,
+                min_face_size=min_face_size,
+                max_face_size=max_face_size
+            )
+        return format_detections(bboxes, landmarks)
     except Exception as e:
         print(f"Error detecting faces: {e}")
         traceback.print_exc()
         return []
 
 
+def detect_faces_batch(images, thresh=None, input_size=None):
+    """
+    Detect faces in several images with one batched SCRFD call.
+    
+    Args:
+        images: List of input images (BGR format)
+        thresh: Detection threshold (optional)
+        input_size: Model input size (optional)
+        
+    Returns:
+        List with one detection list (see detect_faces) per image
+    """
+    if detector is None:
+        raise RuntimeError("Face detector not initialized. Please check model file.")
+    
+    thresh = thresh or DETECTION_THRESHOLD
+    input_size = input_size or ('auto' if DETECTION_AUTO_INPUT_SIZE else DETECTION_INPUT_SIZE)
+    
+    try:
+        batch_results = detector.detect_batch(
+            images,
+            thresh=thresh,
+            input_size=input_size,
+            min_face_size=DETECTION_MIN_FACE_SIZE,
+            max_face_size=DETECTION_MAX_FACE_SIZE
+        )
+        return [format_detections(bboxes, landmarks) for bboxes, landmarks in batch_results]
+    except Exception as e:
+        print(f"Error detecting faces: {e}")
+        traceback.print_exc()
+        return [[] for _ in images]
+
+
 def extract_face_embedding(image, landmarks):
     """
     Extract face embedding from an image using facial landmarks for alignment.
@@ -294,11 +644,12 @@ def extract_face_embedding(image, landmarks):
         if isinstance(landmarks, list):
             landmarks = np.array(landmarks, dtype=np.float32)
         
-        # Align face using landmarks
-        aligned_face = norm_crop(image, landmarks, image_size=FACE_ALIGN_SIZE)
-        
-        # Extract embedding
-        embedding = recognizer.get_embedding(aligned_face)
+        # Align straight into the model input tensor and extract the embedding
+        # (shares an inference batch with concurrent requests if enabled)
+        if embedding_batcher is not None:
+            embedding = embedding_batcher.submit_landmarks(image, landmarks).result()
+        else:
+            embedding = recognizer.get_embeddings_from_landmarks(image, landmarks[np.newaxis])[0]
         
         return embedding
     except Exception as e:
@@ -307,91 +658,213 @@ def extract_face_embedding(image, landmarks):
         return None
 
 
-def recognize_face(face_embedding, people):
+def assess_face_quality(image, faces_data, landmarks_list):
     """
-    Recognize a face against the database of registered people.
+    Score detected faces of one image before embedding them.
     
     Args:
-        face_embedding: numpy.ndarray of shape (512,)
-        people: List of person records from database
+        image: Input image (BGR format)
+        faces_data: Detected faces (dicts with 'bbox')
+        landmarks_list: List of facial landmarks arrays, each of shape (5, 2)
         
     Returns:
-        Dict with 'recognized', 'person', 'unknown_id', 'tracking_id' keys
+        List of quality dicts (see FaceQualityScorer.score), or None per face if the gate is disabled
     """
-    global unknown_counter, face_tracking_counter
+    if face_quality_scorer is None or len(faces_data) == 0:
+        return [None] * len(faces_data)
     
     try:
-        if len(people) == 0:
-            return {'recognized': False, 'person': None, 'unknown_id': None, 'tracking_id': None}
+        boxes = [[face_data['bbox']['w'], face_data['bbox']['h']] for face_data in faces_data]
+        return face_quality_scorer.score(image, boxes, np.array(landmarks_list, dtype=np.float32))
+    except Exception as e:
+        print(f"Error assessing face quality: {e}")
+        traceback.print_exc()
+        return [None] * len(faces_data)
+
+
+def embed_faces(images, landmarks_list):
+    """
+    Align and embed faces with one inference call per batch.
+    
+    Faces are warped directly into the recognizer's preallocated input tensor,
+    so no per-face aligned crops are created.
+    
+    Args:
+        images: List with one source image (BGR format) per face
+        landmarks_list: List of facial landmarks arrays, each of shape (5, 2)
         
-        # Assign tracking ID based on embedding similarity to previous frames
-        tracking_id = None
-        best_tracking_similarity = 0
+    Returns:
+        numpy.ndarray: Array of normalized 512-dimensional face embeddings
+    """
+    if embedding_batcher is not None:
+        return embedding_batcher.embed_landmarks(images, landmarks_list)
+    return recognizer.get_embeddings_from_landmarks(images, np.array(landmarks_list, dtype=np.float32))
+
+
+def extract_face_embeddings(image, landmarks_list):
+    """
+    Extract face embeddings for several faces of the same image in one batch.
+    
+    Args:
+        image: Input image (BGR format)
+        landmarks_list: List of facial landmarks arrays, each of shape (5, 2)
         
-        # Compare with all tracked faces from previous frames
-        for tid, tracked_embedding in face_tracking_embeddings.items():
-            similarity = float(np.dot(face_embedding, tracked_embedding) / 
-                             (np.linalg.norm(face_embedding) * np.linalg.norm(tracked_embedding)))
-            if similarity > best_tracking_similarity and similarity >= TRACKING_SIMILARITY_THRESHOLD:
-                best_tracking_similarity = similarity
-                tracking_id = tid
+    Returns:
+        List of 512-dimensional face embeddings (None for faces that failed)
+    """
+    if recognizer is None:
+        raise RuntimeError("Face recognizer not initialized. Please check model file.")
+    
+    if len(landmarks_list) == 0:
+        return []
+    
+    try:
+        # Every face of the frame is aligned into one input tensor and embedded together
+        landmarks_list = [np.asarray(landmarks, dtype=np.float32) for landmarks in landmarks_list]
+        return list(embed_faces([image] * len(landmarks_list), landmarks_list))
+    except Exception as e:
+        print(f"Error extracting face embeddings: {e}")
+        traceback.print_exc()
+        return [None] * len(landmarks_list)
+
+
+def assign_tracking_id(face_embedding):
+    """
+    Assign a tracking ID based on embedding similarity to faces of previous frames.
+    
+    Args:
+        face_embedding: numpy.ndarray of shape (512,)
         
-        # If no match found, assign new tracking ID
-        if tracking_id is None:
-            face_tracking_counter += 1
-            tracking_id = face_tracking_counter
+    Returns:
+        int: Tracking ID (new if no tracked face is similar enough)
+    """
+    global face_tracking_counter
+    
+    tracking_id = None
+    best_tracking_similarity = 0
+    
+    # Compare with all tracked faces from previous frames
+    for tid, tracked_embedding in face_tracking_embeddings.items():
+        similarity = float(np.dot(face_embedding, tracked_embedding) / 
+                         (np.linalg.norm(face_embedding) * np.linalg.norm(tracked_embedding)))
+        if similarity > best_tracking_similarity and similarity >= TRACKING_SIMILARITY_THRESHOLD:
+            best_tracking_similarity = similarity
+            tracking_id = tid
+    
+    # If no match found, assign new tracking ID
+    if tracking_id is None:
+        face_tracking_counter += 1
+        tracking_id = face_tracking_counter
+    
+    # Update tracked embedding (keep it fresh with latest detection)
+    face_tracking_embeddings[tracking_id] = face_embedding.copy()
+    
+    return tracking_id
+
+
+def recognize_faces(face_embeddings, people):
+    """
+    Recognize all faces of a frame against the database of registered people.
+    
+    The faces are matched with one similarity matrix against the gallery. With
+    RECOGNITION_ONE_TO_ONE, two faces of the same frame are never labelled as
+    the same person.
+    
+    Args:
+        face_embeddings: List of numpy.ndarray of shape (512,)
+        people: Dict of person id -> person record (or list of person records)
         
-        # Update tracked embedding (keep it fresh with latest detection)
-        face_tracking_embeddings[tracking_id] = face_embedding.copy()
+    Returns:
+        List of dicts with 'recognized', 'person', 'unknown_id', 'tracking_id' keys
+    """
+    empty_result = {'recognized': False, 'person': None, 'unknown_id': None, 'tracking_id': None}
+    if len(face_embeddings) == 0:
+        return []
+    
+    try:
+        if len(people) == 0:
+            return [dict(empty_result) for _ in face_embeddings]
         
-        # Load all known encodings
-        known_encodings = []
-        known_people = []
+        tracking_ids = [assign_tracking_id(face_embedding) for face_embedding in face_embeddings]
         
-        for person in people:
-            person_id = person.get('id')
-            encoding = load_person_encoding(person_id)
-            
-            if encoding is not None:
-                known_encodings.append(encoding)
-                known_people.append(person)
+        # One reference read: matrix, ids and names stay consistent for the whole frame
+        gallery = face_gallery.snapshot() if gallery_snapshots else face_gallery
+        if len(gallery) == 0:
+            return [dict(empty_result, tracking_id=tracking_id) for tracking_id in tracking_ids]
         
-        if len(known_encodings) == 0:
-            return {'recognized': False, 'person': None, 'unknown_id': None, 'tracking_id': tracking_id}
+        # Compare all faces with all known faces using cosine similarity (one matrix product)
+        embeddings = np.asarray(face_embeddings, dtype=np.float32)
+        one_to_one = RECOGNITION_ONE_TO_ONE and len(face_embeddings) > 1
+        scores, person_ids = gallery.search(
+            embeddings, top_k=1 if one_to_one else RECOGNITION_TOP_K, one_to_one=one_to_one
+        )
+        candidate_scores, candidate_ids = scores, person_ids
+        if one_to_one and RECOGNITION_TOP_K > 1:
+            candidate_scores, candidate_ids = gallery.search(embeddings, top_k=RECOGNITION_TOP_K)
         
-        known_encodings = np.array(known_encodings)
+        people_by_id = people if isinstance(people, dict) else {person.get('id'): person for person in people}
         
-        # Compare face with all known faces using cosine similarity
-        score, best_match_idx = compare_encodings(face_embedding, known_encodings)
+        def name_of(person_id):
+            name = gallery.name(person_id) if gallery_snapshots else None
+            return name if name is not None else people_by_id[person_id].get('name')
         
-        if score >= RECOGNITION_THRESHOLD and best_match_idx >= 0:
-            person = known_people[best_match_idx]
-            return {
-                'recognized': True,
-                'person': {
-                    'name': person.get('name'),
+        results = []
+        for i, tracking_id in enumerate(tracking_ids):
+            score = float(scores[i, 0])
+            person = people_by_id.get(person_ids[i, 0])
+            
+            if score >= RECOGNITION_THRESHOLD and person is not None:
+                match = {
+                    'name': name_of(person_ids[i, 0]),
                     'id': person.get('id'),
                     'employee_id': person.get('employee_id'),
-                    'similarity': float(score),
-                    'confidence': float(score * 100)  # Convert to percentage
-                },
-                'unknown_id': None,
-                'tracking_id': tracking_id
-            }
-        else:
-            # Use tracking ID for unknown persons
-            unknown_id = f"Unknown-{tracking_id}"
-            
-            return {
-                'recognized': False, 
-                'person': None,
-                'unknown_id': unknown_id,
-                'tracking_id': tracking_id
-            }
+                    'similarity': score,
+                    'confidence': score * 100  # Convert to percentage
+                }
+                if RECOGNITION_TOP_K > 1:
+                    match['candidates'] = [
+                        {
+                            'id': candidate_id,
+                            'name': name_of(candidate_id),
+                            'similarity': float(candidate_score)
+                        }
+                        for candidate_score, candidate_id in zip(candidate_scores[i], candidate_ids[i])
+                        if candidate_id in people_by_id
+                    ]
+                results.append({
+                    'recognized': True,
+                    'person': match,
+                    'unknown_id': None,
+                    'tracking_id': tracking_id
+                })
+            else:
+                # Use tracking ID for unknown persons
+                results.append({
+                    'recognized': False,
+                    'person': None,
+                    'unknown_id': f"Unknown-{tracking_id}",
+                    'tracking_id': tracking_id
+                })
+        
+        return results
     except Exception as e:
-        print(f"Error in recognize_face: {e}")
+        print(f"Error in recognize_faces: {e}")
         traceback.print_exc()
-        return {'recognized': False, 'person': None, 'unknown_id': None, 'tracking_id': None}
+        return [dict(empty_result) for _ in face_embeddings]
+
+
+def recognize_face(face_embedding, people):
+    """
+    Recognize a face against the database of registered people.
+    
+    Args:
+        face_embedding: numpy.ndarray of shape (512,)
+        people: Dict of person id -> person record (or list of person records)
+        
+    Returns:
+        Dict with 'recognized', 'person', 'unknown_id', 'tracking_id' keys
+    """
+    return recognize_faces([face_embedding], people)[0]
 
 
 # ============================================================================
@@ -406,10 +879,18 @@ def health_check():
         'library': 'InsightFace (SCRFD + ArcFace)',
         'detector': 'SCRFD' if detector is not None else 'Not loaded',
         'recognizer': 'ArcFace' if recognizer is not None else 'Not loaded',
+        'model_precision': MODEL_PRECISION,
         'detection_threshold': DETECTION_THRESHOLD,
         'recognition_threshold': RECOGNITION_THRESHOLD,
-        'registered_people': len(load_database()),
-        'cached_encodings': len(encodings_cache)
+        'registered_people': people_store.count(),
+        'people_store_version': people_store.version,
+        'cached_encodings': len(face_gallery),
+        'gallery_version': face_gallery.version if gallery_snapshots else None,
+        'search_index': SEARCH_INDEX_TYPE,
+        'search_index_memory_mb': round(face_gallery.memory_bytes() / 2 ** 20, 2),
+        'gallery_storage': GALLERY_STORAGE,
+        'gallery_file': gallery_file.get_stats() if gallery_file is not None else None,
+        'embedding_batcher': embedding_batcher.get_stats() if embedding_batcher is not None else None
     })
 
 
@@ -428,15 +909,25 @@ def detect_and_recognize():
         # Get image from request
         img = None
         region = None
+        options = {}
         if 'image' in request.files:
             img = process_uploaded_file(request.files['image'])
+            options = request.form
         elif request.json and 'image' in request.json:
             img = base64_to_image(request.json['image'])
             region = request.json.get('region')  # Get detection region if provided
+            options = request.json
         
         if img is None:
             return jsonify({'error': 'No valid image provided'}), 400
         
+        # Optional per-request face size range (pixels)
+        try:
+            min_face_size = float(options.get('min_face_size') or DETECTION_MIN_FACE_SIZE)
+            max_face_size = float(options.get('max_face_size') or DETECTION_MAX_FACE_SIZE)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'min_face_size and max_face_size must be numbers'}), 400
+        
         # Debug: Log image dimensions
         img_h, img_w = img.shape[:2]
         print(f"[DEBUG] Input image dimensions: {img_w}x{img_h}")
@@ -458,9 +949,15 @@ def detect_and_recognize():
         
         # Detect faces
         detect_start = time.time()
-        detected_faces = detect_faces(img_crop)
+        detection_input_size = resolve_detection_input_size(img_crop, min_face_size)
+        detected_faces = detect_faces(
+            img_crop,
+            input_size=detection_input_size,
+            min_face_size=min_face_size,
+            max_face_size=max_face_size
+        )
         detect_time = (time.time() - detect_start) * 1000
-        print(f"[TIMING] Face detection: {detect_time:.2f}ms")
+        print(f"[TIMING] Face detection ({detection_input_size[0]}x{detection_input_size[1]}): {detect_time:.2f}ms")
         
         if detected_faces:
             for i, face_data in enumerate(detected_faces):
@@ -475,12 +972,15 @@ def detect_and_recognize():
             })
         
         # Load database
-        people = load_database()
+        people = people_store.by_id()
         
         # Recognize each face
         recognize_start = time.time()
-        results = []
-        for face_data in detected_faces:
+        
+        # Adjust coordinates to the original image and collect landmarks for batching
+        batch_landmarks = []
+        batch_indices = []
+        for i, face_data in enumerate(detected_faces):
             landmarks = face_data.get('landmarks')
             bbox = face_data['bbox']
             
@@ -497,23 +997,46 @@ def detect_and_recognize():
                     landmarks_adjusted[:, 1] += region_offset[1]
                     landmarks = landmarks_adjusted.tolist()
                 
-                # Extract face embedding using aligned face from original image
-                face_embedding = extract_face_embedding(img, landmarks)
-                
-                if face_embedding is not None:
-                    recognition_result = recognize_face(face_embedding, people)
-                else:
-                    recognition_result = {'recognized': False, 'person': None, 'unknown_id': None, 'tracking_id': None}
-            else:
-                recognition_result = {'recognized': False, 'person': None, 'unknown_id': None, 'tracking_id': None}
-            
+                batch_landmarks.append(landmarks)
+                batch_indices.append(i)
+        
+        # Skip embedding faces that are too small, turned away or blurred to ever match
+        face_qualities = [None] * len(detected_faces)
+        qualities = assess_face_quality(img, [detected_faces[i] for i in batch_indices], batch_landmarks)
+        for i, quality in zip(batch_indices, qualities):
+            face_qualities[i] = quality
+        embed_indices = [
+            (i, landmarks) for i, landmarks in zip(batch_indices, batch_landmarks)
+            if face_qualities[i] is None or face_qualities[i]['passed']
+        ]
+        skipped_embeddings = len(batch_indices) - len(embed_indices)
+        
+        # Extract all face embeddings in one batch using aligned faces from original image
+        face_embeddings = [None] * len(detected_faces)
+        embeddings = extract_face_embeddings(img, [landmarks for _, landmarks in embed_indices])
+        for (i, _), embedding in zip(embed_indices, embeddings):
+            face_embeddings[i] = embedding
+        
+        # Match all embedded faces of the frame at once
+        recognition_results = [
+            {'recognized': False, 'person': None, 'unknown_id': None, 'tracking_id': None}
+        ] * len(detected_faces)
+        matched_indices = [i for i, embedding in enumerate(face_embeddings) if embedding is not None]
+        matched_results = recognize_faces([face_embeddings[i] for i in matched_indices], people)
+        for i, recognition_result in zip(matched_indices, matched_results):
+            recognition_results[i] = recognition_result
+        
+        results = []
+        for face_data, recognition_result, quality in zip(detected_faces, recognition_results, face_qualities):
             results.append({
-                'bbox': bbox,
+                'bbox': face_data['bbox'],
                 'detection_confidence': face_data['confidence'],
                 'recognized': recognition_result['recognized'],
                 'person': recognition_result['person'],
                 'unknown_id': recognition_result.get('unknown_id'),
-                'tracking_id': recognition_result.get('tracking_id')
+                'tracking_id': recognition_result.get('tracking_id'),
+                'low_quality': quality is not None and not quality['passed'],
+                'quality': quality
             })
         
         recognize_time = (time.time() - recognize_start) * 1000
@@ -524,12 +1047,15 @@ def detect_and_recognize():
         return jsonify({
             'faces': results,
             'count': len(results),
+            'skipped_embeddings': skipped_embeddings,
             'image_width': img_w,
             'image_height': img_h,
             'latency': {
                 'detection_ms': round(detect_time, 2),
                 'recognition_ms': round(recognize_time, 2),
-                'total_ms': round(total_time, 2)
+                'total_ms': round(total_time, 2),
+                'detection_input_size': list(detection_input_size),
+                'detection_tiled': DETECTION_TILING_ENABLED and max(img_crop.shape[:2]) > DETECTION_TILING_MIN_SIZE
             }
         })
     
@@ -539,6 +1065,123 @@ def detect_and_recognize():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/detect-and-recognize/batch', methods=['POST'])
+def detect_and_recognize_batch():
+    """Detect and recognize faces in several images (e.g. one frame per camera) at once"""
+    start_time = time.time()
+    try:
+        if detector is None or recognizer is None:
+            return jsonify({
+                'error': 'Models not loaded. Please ensure SCRFD and ArcFace models are available.',
+                'scrfd_path': SCRFD_MODEL_PATH,
+                'arcface_path': ARCFACE_MODEL_PATH
+            }), 500
+        
+        # Get images from request (multipart 'images' files or JSON list of base64 strings)
+        images = []
+        if request.files:
+            images = [process_uploaded_file(f) for f in request.files.getlist('images')]
+        elif request.json and 'images' in request.json:
+            images = [base64_to_image(image_data) for image_data in request.json['images']]
+        
+        if len(images) == 0:
+            return jsonify({'error': 'No images provided'}), 400
+        
+        if any(img is None for img in images):
+            return jsonify({'error': 'No valid image provided'}), 400
+        
+        # Detect faces in all images with one batched detector call
+        detect_start = time.time()
+        detections = detect_faces_batch(images)
+        detect_time = (time.time() - detect_start) * 1000
+        print(f"[TIMING] Batch face detection ({len(images)} images): {detect_time:.2f}ms")
+        
+        people = people_store.by_id()
+        
+        # Align and embed the faces of every image in one batch
+        recognize_start = time.time()
+        face_images = []
+        face_landmarks = []
+        face_refs = []
+        face_qualities = {}
+        for image_idx, (img, detected_faces) in enumerate(zip(images, detections)):
+            face_indices = [i for i, face_data in enumerate(detected_faces) if face_data['landmarks'] is not None]
+            qualities = assess_face_quality(
+                img, [detected_faces[i] for i in face_indices], [detected_faces[i]['landmarks'] for i in face_indices]
+            )
+            face_qualities.update(((image_idx, i), quality) for i, quality in zip(face_indices, qualities))
+            face_indices = [i for i, quality in zip(face_indices, qualities) if quality is None or quality['passed']]
+            if face_indices:
+                face_images.extend([img] * len(face_indices))
+                face_landmarks.extend(np.array(detected_faces[i]['landmarks'], dtype=np.float32) for i in face_indices)
+                face_refs.extend((image_idx, i) for i in face_indices)
+        
+        face_embeddings = {}
+        if face_landmarks:
+            try:
+                face_embeddings = dict(zip(face_refs, embed_faces(face_images, face_landmarks)))
+            except Exception as e:
+                print(f"Error extracting face embeddings: {e}")
+                traceback.print_exc()
+        
+        image_results = []
+        for image_idx, (img, detected_faces) in enumerate(zip(images, detections)):
+            # Each image is its own frame: match its faces together
+            matched_indices = [i for i in range(len(detected_faces)) if (image_idx, i) in face_embeddings]
+            matched_results = recognize_faces([face_embeddings[(image_idx, i)] for i in matched_indices], people)
+            recognition_results = dict(zip(matched_indices, matched_results))
+            
+            results = []
+            skipped_embeddings = 0
+            for face_idx, face_data in enumerate(detected_faces):
+                quality = face_qualities.get((image_idx, face_idx))
+                low_quality = quality is not None and not quality['passed']
+                skipped_embeddings += int(low_quality)
+                recognition_result = recognition_results.get(
+                    face_idx, {'recognized': False, 'person': None, 'unknown_id': None, 'tracking_id': None}
+                )
+                
+                results.append({
+                    'bbox': face_data['bbox'],
+                    'detection_confidence': face_data['confidence'],
+                    'recognized': recognition_result['recognized'],
+                    'person': recognition_result['person'],
+                    'unknown_id': recognition_result.get('unknown_id'),
+                    'tracking_id': recognition_result.get('tracking_id'),
+                    'low_quality': low_quality,
+                    'quality': quality
+                })
+            
+            img_h, img_w = img.shape[:2]
+            image_results.append({
+                'faces': results,
+                'count': len(results),
+                'skipped_embeddings': skipped_embeddings,
+                'image_width': img_w,
+                'image_height': img_h
+            })
+        
+        recognize_time = (time.time() - recognize_start) * 1000
+        total_time = (time.time() - start_time) * 1000
+        print(f"[TIMING] Batch face recognition: {recognize_time:.2f}ms")
+        print(f"[TIMING] Batch total processing: {total_time:.2f}ms")
+        
+        return jsonify({
+            'images': image_results,
+            'count': len(image_results),
+            'latency': {
+                'detection_ms': round(detect_time, 2),
+                'recognition_ms': round(recognize_time, 2),
+                'total_ms': round(total_time, 2)
+            }
+        })
+    
+    except Exception as e:
+        print(f"Error in detect-and-recognize batch: {e}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/register', methods=['POST'])
 def register_person():
     """Register a new person with their face"""
@@ -607,7 +1250,7 @@ def register_person():
         person_id = str(uuid.uuid4())
         
         # Save face encoding
-        save_person_encoding(person_id, face_embedding)
+        save_person_encoding(person_id, face_embedding, name=name)
         
         # Save image
         image_filename = f"{person_id}.jpg"
@@ -619,9 +1262,6 @@ def register_person():
         aligned_path = os.path.join(IMAGES_DIR, f"{person_id}_aligned.jpg")
         cv2.imwrite(aligned_path, aligned_face)
         
-        # Load database
-        people = load_database()
-        
         # Add new person
         new_person = {
             'id': person_id,
@@ -630,20 +1270,15 @@ def register_person():
             'employee_id': employee_id,
             'image_path': image_path,
             'aligned_path': aligned_path,
-            'encoding_path': os.path.join(ENCODINGS_DIR, f"{person_id}.npy"),
+            'encoding_path': gallery_file.path if gallery_file is not None else os.path.join(ENCODINGS_DIR, f"{person_id}.npy"),
             'added_date': datetime.now().isoformat(),
             'image_count': 1
         }
         
-        people.append(new_person)
-        
         # Save database
-        if not save_database(people):
+        if not add_person(new_person):
             return jsonify({'error': 'Failed to save to database'}), 500
         
-        # Update cache
-        names_cache[person_id] = name
-        
         return jsonify({
             'message': 'Person registered successfully',
             'person': {
@@ -662,6 +1297,228 @@ def register_person():
         return jsonify({'error': str(e)}), 500
 
 
+def enroll_bulk_chunk(rows, indices, blobs, images):
+    """
+    Detect, validate and embed one chunk of bulk-enrollment rows.
+    
+    Faces of the whole chunk are detected with one batched SCRFD call and
+    embedded in full ArcFace batches; images of accepted rows are saved.
+    
+    Args:
+        rows: Manifest rows (see enrollment.bulk.read_manifest)
+        indices: Indices of this chunk's rows
+        blobs: Encoded image bytes per row (None if the image is missing)
+        images: Decoded BGR images per row (None if decoding failed)
+        
+    Returns:
+        Tuple of (results, people, encodings): one result dict per row in
+        order, plus the person record and encoding of every accepted row
+    """
+    results = {}
+    candidates = []
+    for index, blob, image in zip(indices, blobs, images):
+        row = rows[index]
+        results[index] = {'row': index + 1, 'name': row['name'], 'employee_id': row['employee_id']}
+        if not row['name']:
+            results[index]['error'] = 'Name is required'
+        elif not row['image']:
+            results[index]['error'] = 'Image is required'
+        elif blob is None:
+            results[index]['error'] = f"Image not found: {row['image']}"
+        elif image is None:
+            results[index]['error'] = 'No valid image provided'
+        else:
+            candidates.append((index, blob, image))
+    
+    detections = detect_faces_batch([image for _, _, image in candidates]) if candidates else []
+    faces = []
+    for (index, blob, image), detected_faces in zip(candidates, detections):
+        if len(detected_faces) == 0:
+            results[index]['error'] = 'No face detected in image'
+        elif len(detected_faces) > 1:
+            results[index]['error'] = 'Multiple faces detected. Please provide image with single face'
+        elif detected_faces[0].get('landmarks') is None:
+            results[index]['error'] = 'Could not detect facial landmarks'
+        else:
+            faces.append((index, blob, image, np.array(detected_faces[0]['landmarks'], dtype=np.float32)))
+    
+    people = []
+    encodings = []
+    if faces:
+        try:
+            embeddings = embed_faces([image for _, _, image, _ in faces], [landmarks for *_, landmarks in faces])
+        except Exception as e:
+            print(f"Error extracting face embeddings: {e}")
+            traceback.print_exc()
+            embeddings = [None] * len(faces)
+        
+        for (index, blob, image, landmarks), embedding in zip(faces, embeddings):
+            if embedding is None:
+                results[index]['error'] = 'Failed to extract face features'
+                continue
+            row = rows[index]
+            person_id = str(uuid.uuid4())
+            
+            # JPEG uploads are stored as uploaded instead of being re-encoded
+            image_path = os.path.join(IMAGES_DIR, f"{person_id}.jpg")
+            if blob[:3] == b'\xff\xd8\xff':
+                with open(image_path, 'wb') as f:
+                    f.write(blob)
+            else:
+                cv2.imwrite(image_path, image)
+            aligned_path = os.path.join(IMAGES_DIR, f"{person_id}_aligned.jpg")
+            cv2.imwrite(aligned_path, norm_crop(image, landmarks, image_size=FACE_ALIGN_SIZE))
+            
+            people.append({
+                'id': person_id,
+                'name': row['name'],
+                'email': row['email'],
+                'employee_id': row['employee_id'],
+                'image_path': image_path,
+                'aligned_path': aligned_path,
+                'encoding_path': gallery_file.path if gallery_file is not None else os.path.join(ENCODINGS_DIR, f"{person_id}.npy"),
+                'added_date': datetime.now().isoformat(),
+                'image_count': 1
+            })
+            encodings.append(embedding)
+            results[index]['id'] = person_id
+    
+    for result in results.values():
+        result['status'] = 'error' if 'error' in result else 'ok'
+    return [results[index] for index in indices], people, encodings
+
+
+def commit_bulk_enrollment(people, encodings):
+    """
+    Store the encodings, gallery entries and people records of a bulk enrollment.
+    
+    The gallery publishes all encodings as one version and the people records
+    are inserted in one transaction; if that transaction fails, the encodings
+    are removed again.
+    """
+    person_ids = [person['id'] for person in people]
+    save_person_encodings(person_ids, encodings, [person['name'] for person in people])
+    try:
+        people_store.add_many(people)
+    except Exception:
+        for person_id in person_ids:
+            delete_person_encoding(person_id)
+        raise
+
+
+def bulk_enrollment_stream(source):
+    """
+    Enroll the rows of a bulk upload chunk by chunk, yielding NDJSON lines.
+    
+    The next chunk is decoded by the decoder threads while the current one is
+    detected and embedded. Nothing is committed until every row has been
+    processed; the final summary line reports whether the commit succeeded.
+    """
+    start_time = time.time()
+    rows = source.rows
+    chunks = [range(i, min(i + BULK_CHUNK_SIZE, len(rows))) for i in range(0, len(rows), BULK_CHUNK_SIZE)]
+    people = []
+    encodings = []
+    failed = 0
+    committed = False
+    
+    def read_chunk(indices):
+        blobs = [source.read(rows[index]['image']) if rows[index]['image'] else None for index in indices]
+        return blobs, bulk_decoder.submit(blobs)
+    
+    try:
+        pending = read_chunk(chunks[0])
+        for number, indices in enumerate(chunks):
+            blobs, decoded = pending
+            images = decoded()
+            if number + 1 < len(chunks):
+                pending = read_chunk(chunks[number + 1])
+            
+            results, chunk_people, chunk_encodings = enroll_bulk_chunk(rows, indices, blobs, images)
+            people.extend(chunk_people)
+            encodings.extend(chunk_encodings)
+            for result in results:
+                failed += result['status'] == 'error'
+                yield json.dumps(result) + '\n'
+        
+        error = None
+        if people:
+            try:
+                commit_bulk_enrollment(people, encodings)
+                committed = True
+            except Exception as e:
+                print(f"Error committing bulk enrollment: {e}")
+                traceback.print_exc()
+                error = str(e)
+        
+        elapsed = time.time() - start_time
+        summary = {
+            'summary': True,
+            'total': len(rows),
+            'enrolled': len(people) if committed else 0,
+            'failed': failed,
+            'committed': committed,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'images_per_second': round(len(rows) / elapsed, 1) if elapsed > 0 else None
+        }
+        if error is not None:
+            summary['error'] = error
+        yield json.dumps(summary) + '\n'
+    
+    except Exception as e:
+        print(f"Error in bulk register: {e}")
+        traceback.print_exc()
+        yield json.dumps({'summary': True, 'committed': False, 'error': str(e)}) + '\n'
+    
+    finally:
+        source.close()
+        # Rows of an aborted or failed upload leave no images behind
+        if not committed:
+            for person in people:
+                for path in (person['image_path'], person['aligned_path']):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+
+@app.route('/api/register/bulk', methods=['POST'])
+def register_people_bulk():
+    """
+    Register many people from a CSV manifest (name, image[, email, employee_id]).
+    
+    Accepts a zip archive ('archive' file containing manifest.csv and the images)
+    or a multipart batch ('manifest' CSV file or field plus 'images' files).
+    Streams one NDJSON result per manifest row, followed by a summary line;
+    all accepted people are committed together after the last row.
+    """
+    if detector is None or recognizer is None:
+        return jsonify({
+            'error': 'Models not loaded. Please ensure SCRFD and ArcFace models are available.'
+        }), 500
+    
+    try:
+        if 'archive' in request.files:
+            source = ZipSource(request.files['archive'].stream)
+        else:
+            if 'manifest' in request.files:
+                manifest_text = request.files['manifest'].read().decode('utf-8')
+            else:
+                manifest_text = request.form.get('manifest')
+            if not manifest_text:
+                return jsonify({'error': 'Provide a zip archive or a manifest with images'}), 400
+            source = UploadSource(manifest_text, request.files.getlist('images'))
+    except (ManifestError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not source.rows:
+        source.close()
+        return jsonify({'error': 'Manifest has no rows'}), 400
+    if len(source.rows) > BULK_MAX_PEOPLE:
+        source.close()
+        return jsonify({'error': f"Manifest has more than {BULK_MAX_PEOPLE} rows"}), 400
+    
+    return Response(stream_with_context(bulk_enrollment_stream(source)), mimetype='application/x-ndjson')
+
+
 @app.route('/api/people', methods=['GET'])
 def get_people():
     """Get all registered people"""
@@ -692,14 +1549,7 @@ def get_people():
 def delete_person(person_id):
     """Delete a person from the database"""
     try:
-        people = load_database()
-        
-        # Find person
-        person = None
-        for p in people:
-            if p.get('id') == person_id:
-                person = p
-                break
+        person = people_store.get(person_id)
         
         if not person:
             return jsonify({'error': 'Person not found'}), 404
@@ -719,24 +1569,11 @@ def delete_person(person_id):
             except Exception as e:
                 print(f"Error deleting aligned image: {e}")
         
-        # Delete encoding file
-        encoding_path = os.path.join(ENCODINGS_DIR, f"{person_id}.npy")
-        if os.path.exists(encoding_path):
-            try:
-                os.remove(encoding_path)
-            except Exception as e:
-                print(f"Error deleting encoding: {e}")
-        
-        # Remove from caches
-        if person_id in encodings_cache:
-            del encodings_cache[person_id]
-        if person_id in names_cache:
-            del names_cache[person_id]
+        # Delete encoding files and remove from the gallery
+        delete_person_encoding(person_id)
         
         # Remove from database
-        people = [p for p in people if p.get('id') != person_id]
-        
-        if not save_database(people):
+        if not remove_person(person_id):
             return jsonify({'error': 'Failed to save to database'}), 500
         
         return jsonify({'message': 'Person deleted successfully'})
@@ -751,14 +1588,7 @@ def delete_person(person_id):
 def get_person_image(person_id):
     """Get a person's image"""
     try:
-        people = load_database()
-        
-        # Find person
-        person = None
-        for p in people:
-            if p.get('id') == person_id:
-                person = p
-                break
+        person = people_store.get(person_id)
         
         if not person:
             return jsonify({'error': 'Person not found'}), 404
@@ -797,7 +1627,7 @@ if __name__ == '__main__':
     print(f"Recognizer: {'ArcFace' if recognizer else 'Not loaded'}")
     print(f"Detection Threshold: {DETECTION_THRESHOLD}")
     print(f"Recognition Threshold: {RECOGNITION_THRESHOLD}")
-    print(f"Registered People: {len(load_database())}")
+    print(f"Registered People: {people_store.count()}")
     print(f"{'='*50}\n")
     
     if detector is None or recognizer is None:
@@ -0,0 +1,239 @@
+"""
+Search Index Benchmark
+
+Builds each face search index over the enrolled encodings (or a synthetic
+gallery) and reports build time, memory, query latency and recall@1 against
+brute force (the compare_encodings path) for a range of nprobe / ef / rerank
+settings. Compressed indexes re-rank from the original encodings; rerank=0
+shows the recall of the compressed codes alone.
+
+--crossover compares the binary-hash prefilter with brute force over a range
+of synthetic gallery sizes and reports the size from which the prefilter wins
+(RECOGNITION_HASH_MIN_GALLERY in app.py).
+
+Queries are noisy copies of enrolled encodings, which is what a new photo of
+an enrolled person looks like to the matcher. The synthetic gallery is
+clustered like real face encodings: identities come in groups of look-alikes
+(hard negatives), and enrolled encodings and queries are different samples
+around each identity, so the nearest neighbour is not always far ahead of the
+runner-up. Uniform random encodings are almost orthogonal and make every
+index look perfect.
+
+Usage:
+    python benchmark_search_index.py                     # encodings in database/encodings
+    python benchmark_search_index.py --synthetic 100000  # synthetic gallery
+    python benchmark_search_index.py --synthetic 20000 --indexes ivf_flat --nprobe 4 8 16
+    python benchmark_search_index.py --synthetic 100000 --indexes brute_force sq_int8 pq --rerank 0 64
+    python benchmark_search_index.py --crossover 5000 10000 20000 50000 100000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from face_recognition_module.search_index import (
+    COMPRESSED_INDEX_TYPES,
+    SEARCH_INDEX_TYPES,
+    create_search_index,
+    load_encodings_dir,
+    recall_at_1,
+)
+
+ENCODINGS_DIR = os.path.join(os.path.dirname(__file__), 'database', 'encodings')
+
+
+def sample_around(centers, similarity, rng):
+    """
+    Random unit vectors around unit centers.
+
+    Two samples around the same center have a cosine similarity of about
+    `similarity` (each is about sqrt(similarity) from the center); a
+    similarity array gives every sample its own.
+    """
+    noise = rng.standard_normal(centers.shape).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    similarity = np.asarray(similarity, dtype=np.float32).reshape(-1, 1)
+    samples = np.sqrt(similarity) * centers + np.sqrt(1.0 - similarity) * noise
+    return samples / np.linalg.norm(samples, axis=1, keepdims=True)
+
+
+def photo_similarities(count, genuine_similarity, rng, spread=0.1):
+    """Per-photo genuine similarity: photo quality varies around the mean."""
+    return rng.uniform(genuine_similarity - spread, genuine_similarity + spread, count)
+
+
+def make_synthetic_gallery(size, embedding_size=512, group_size=8, lookalike_similarity=0.8,
+                           genuine_similarity=0.5, seed=0):
+    """
+    Clustered synthetic gallery with one enrolled encoding per identity.
+
+    Args:
+        size: Number of identities
+        embedding_size: Dimension of the encodings
+        group_size: Identities per look-alike group
+        lookalike_similarity: Cosine between identity centers of the same group (hard negatives)
+        genuine_similarity: Mean cosine between two photos of the same identity (intra-class spread)
+        seed: Random seed
+
+    Returns:
+        Tuple of (person_ids, encodings, centers): the identity centers are
+        used to sample queries (see make_identity_queries)
+    """
+    rng = np.random.default_rng(seed)
+    groups = rng.standard_normal((-(-size // group_size), embedding_size)).astype(np.float32)
+    groups /= np.linalg.norm(groups, axis=1, keepdims=True)
+    centers = sample_around(np.repeat(groups, group_size, axis=0)[:size], lookalike_similarity, rng)
+    encodings = sample_around(centers, photo_similarities(size, genuine_similarity, rng), rng)
+    return [f"person-{i}" for i in range(size)], encodings, centers
+
+
+def make_identity_queries(centers, num_queries, genuine_similarity=0.5, seed=1):
+    """New photos of random enrolled identities: samples around their centers."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(centers), min(num_queries, len(centers)), replace=False)
+    return sample_around(centers[picks], photo_similarities(len(picks), genuine_similarity, rng), rng)
+
+
+def make_queries(encodings, num_queries, noise=0.04, seed=1):
+    """Noisy, re-normalized copies of random enrolled encodings (cosine ~0.75 to the original)."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(encodings), min(num_queries, len(encodings)), replace=False)
+    queries = encodings[picks] + noise * rng.standard_normal((len(picks), encodings.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def time_queries(index, queries, batch_size):
+    """Average search latency per query in milliseconds."""
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        index.search(queries[offset:offset + batch_size], top_k=1)
+    return (time.perf_counter() - start) * 1000 / max(1, len(queries))
+
+
+def run_crossover(sizes, num_queries, batch_size, num_candidates):
+    """Latency of brute force vs. binary-hash prefilter for several gallery sizes."""
+    print(f"Binary-hash crossover ({num_queries} queries, batch {batch_size}, {num_candidates} candidates)")
+    print(f"  {'gallery':>10}{'brute ms':>10}{'hash ms':>10}{'speedup':>10}{'recall@1':>10}")
+
+    crossover = None
+    for size in sizes:
+        person_ids, encodings, centers = make_synthetic_gallery(size)
+        queries = make_identity_queries(centers, num_queries)
+
+        brute = create_search_index('brute_force', encodings.shape[1])
+        brute.load(person_ids, encodings)
+        hashed = create_search_index(
+            'binary_hash', encodings.shape[1], num_candidates=num_candidates, min_gallery_size=0
+        )
+        hashed.load(person_ids, encodings)
+
+        brute_ms = time_queries(brute, queries, batch_size)
+        hash_ms = time_queries(hashed, queries, batch_size)
+        recall = recall_at_1(hashed, brute, queries)
+        print(f"  {size:>10}{brute_ms:>10.3f}{hash_ms:>10.3f}{brute_ms / hash_ms:>10.2f}{recall:>10.3f}")
+        if crossover is None and hash_ms < brute_ms:
+            crossover = size
+
+    if crossover is None:
+        print("Brute force was faster at every tested size")
+    else:
+        print(f"Prefilter is faster from about {crossover} encodings")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face search indexes against brute force")
+    parser.add_argument('--encodings-dir', default=ENCODINGS_DIR, help="Directory of <person_id>.npy encodings")
+    parser.add_argument('--synthetic', type=int, default=0, help="Use a synthetic gallery of this size instead")
+    parser.add_argument('--indexes', nargs='+', default=list(SEARCH_INDEX_TYPES), choices=SEARCH_INDEX_TYPES)
+    parser.add_argument('--queries', type=int, default=500, help="Number of queries")
+    parser.add_argument('--noise', type=float, default=0.04,
+                        help="Per-dimension query noise for enrolled encodings (0.04 ~ cosine 0.75 to the original)")
+    parser.add_argument('--group-size', type=int, default=8, help="Synthetic identities per look-alike group")
+    parser.add_argument('--lookalike-similarity', type=float, default=0.8,
+                        help="Synthetic cosine between identities of a look-alike group")
+    parser.add_argument('--genuine-similarity', type=float, default=0.5,
+                        help="Synthetic cosine between two photos of the same identity (query vs. enrolled)")
+    parser.add_argument('--batch-size', type=int, default=1, help="Queries per search call (faces per frame)")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32], help="IVF nprobe values")
+    parser.add_argument('--ef', type=int, nargs='+', default=[16, 32, 64, 128], help="HNSW ef_search values")
+    parser.add_argument('--hash-candidates', type=int, nargs='+', default=[64, 256, 1024],
+                        help="Binary-hash candidates re-ranked exactly")
+    parser.add_argument('--crossover', type=int, nargs='+', default=None,
+                        help="Gallery sizes for the brute force vs. binary-hash crossover benchmark")
+    parser.add_argument('--crossover-candidates', type=int, default=256,
+                        help="Binary-hash candidates used by --crossover (RECOGNITION_HASH_CANDIDATES)")
+    parser.add_argument('--rerank', type=int, nargs='+', default=[0, 16, 64],
+                        help="Exact re-rank candidates for compressed indexes (0 = approximate scores only)")
+    args = parser.parse_args()
+
+    if args.crossover:
+        run_crossover(args.crossover, args.queries, args.batch_size, args.crossover_candidates)
+        return 0
+
+    if args.synthetic:
+        person_ids, encodings, centers = make_synthetic_gallery(
+            args.synthetic, group_size=args.group_size, lookalike_similarity=args.lookalike_similarity,
+            genuine_similarity=args.genuine_similarity
+        )
+        queries = make_identity_queries(centers, args.queries, genuine_similarity=args.genuine_similarity)
+        source = f"synthetic ({args.synthetic}, look-alike groups of {args.group_size})"
+    else:
+        person_ids, encodings = load_encodings_dir(args.encodings_dir)
+        if len(person_ids) == 0:
+            print(f"✗ No encodings found in {args.encodings_dir} (use --synthetic N)")
+            return 1
+        queries = make_queries(encodings, args.queries, noise=args.noise)
+        source = args.encodings_dir
+
+    print(f"Gallery: {len(person_ids)} encodings from {source}, {len(queries)} queries, batch {args.batch_size}")
+    print(f"  {'index':<12}{'setting':>12}{'build s':>10}{'memory MB':>11}{'ms/query':>10}{'recall@1':>10}")
+
+    reference = create_search_index('brute_force', encodings.shape[1])
+    reference.load(person_ids, encodings)
+
+    # Stands in for reading the original .npy files when re-ranking
+    rows = {person_id: row for row, person_id in enumerate(person_ids)}
+
+    def encoding_loader(person_id):
+        return encodings[rows[person_id]]
+
+    for index_type in args.indexes:
+        index = create_search_index(index_type, encodings.shape[1], encoding_loader=encoding_loader)
+        start = time.perf_counter()
+        index.load(person_ids, encodings)
+        build_time = time.perf_counter() - start
+
+        if index_type == 'ivf_flat':
+            settings = [('nprobe', value) for value in args.nprobe]
+        elif index_type == 'hnsw':
+            settings = [('ef', value) for value in args.ef]
+        elif index_type in COMPRESSED_INDEX_TYPES:
+            settings = [('rerank', value) for value in args.rerank]
+        elif index_type == 'binary_hash':
+            index.min_gallery_size = 0
+            settings = [('cand', value) for value in args.hash_candidates]
+        else:
+            settings = [('exact', None)]
+
+        for name, value in settings:
+            if name == 'nprobe':
+                index.nprobe = value
+            elif name == 'ef':
+                index.ef_search = value
+            elif name == 'rerank':
+                index.rerank = value
+            elif name == 'cand':
+                index.num_candidates = value
+            latency = time_queries(index, queries, args.batch_size)
+            recall = recall_at_1(index, reference, queries)
+            label = name if value is None else f"{name}={value}"
+            memory = index.memory_bytes() / 2 ** 20
+            print(f"  {index_type:<12}{label:>12}{build_time:>10.2f}{memory:>11.1f}{latency:>10.3f}{recall:>10.3f}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -32,6 +32,42 @@ MODELS_DIR = os.path.join(os.path.dirname(__file__), 'models')
 BUFFALO_ZIP_URL = 'https://github.com/deepinsight/insightface/releases/download/v0.7/buffalo_l.zip'
 
 
+# INT8 variants written by quantize_models.py
+QUANTIZATION_MODES = ('dynamic', 'static')
+
+
+def get_quantized_model_path(model_path: str, mode: str) -> str:
+    """Get the file path of a quantized model variant, e.g. det_10g_int8_static.onnx."""
+    root, ext = os.path.splitext(model_path)
+    return f"{root}_int8_{mode}{ext}"
+
+
+def resolve_model_path(model_path: str, precision: str = 'fp32') -> str:
+    """
+    Get the model file to load for a precision setting.
+
+    Args:
+        model_path: Path to the FP32 model
+        precision: 'fp32', 'int8_dynamic' or 'int8_static'
+
+    Returns:
+        str: Path of the quantized variant if it exists, otherwise the FP32 model
+    """
+    if precision in (None, '', 'fp32'):
+        return model_path
+
+    mode = precision.replace('int8_', '')
+    assert mode in QUANTIZATION_MODES, f"Unknown model precision: {precision}"
+
+    quantized_path = get_quantized_model_path(model_path, mode)
+    if os.path.exists(quantized_path):
+        return quantized_path
+
+    print(f"⚠ {os.path.basename(quantized_path)} not found, using FP32 model "
+          f"(run: python quantize_models.py)")
+    return model_path
+
+
 def download_file(url: str, dest_path: str, description: str = "file") -> bool:
     """Download a file with progress indication."""
     try:
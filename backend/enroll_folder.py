@@ -0,0 +1,248 @@
+"""
+Offline Folder Enrollment
+
+Builds a gallery from a directory tree with one folder per person, without
+the Flask server:
+
+    photos/
+        jane_doe/       -> "jane doe"
+            1.jpg
+            2.jpg
+        john_smith/
+            portrait.png
+
+A pool of worker processes enrolls one person at a time; every worker has its
+own SCRFD and ArcFace sessions limited to --threads threads. Images with
+exactly one face are embedded and averaged into the person's encoding.
+
+The output is what app.py reads: images in database/images, encodings as
+database/encodings/<person_id>.npy (or the consolidated gallery.bin with
+--storage consolidated) and the people records in database/people.db. Restart
+the server afterwards to load the new encodings.
+
+Finished folders are recorded in a checkpoint, so an interrupted run picks up
+where it stopped when started again with the same arguments. Person ids and
+checkpoint entries are keyed on the resolved root directory plus the folder
+name: enrolling a second tree with the same folder names adds new people.
+
+Usage:
+    python enroll_folder.py photos/                         # one worker per CPU, 1 thread each
+    python enroll_folder.py photos/ --workers 4 --threads 2
+    python enroll_folder.py photos/ --storage consolidated
+    python enroll_folder.py photos/ --retry-failed          # re-run folders that had no usable image
+    python enroll_folder.py photos/ --restart               # ignore the checkpoint
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from download_models import resolve_model_path
+from enrollment.folder import enroll_person, init_worker, read_checkpoint, scan_people, write_checkpoint
+from model_runtime.session_factory import create_session
+from storage.gallery_file import GalleryFile, migrate_encoding_files
+from storage.people_store import PeopleStore
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database')
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+SCRFD_MODEL = 'det_10g.onnx'
+ARCFACE_MODEL = 'w600k_r50.onnx'
+CHECKPOINT_NAME = 'enroll_checkpoint.jsonl'
+
+# Same detection settings as app.py
+DETECTION_THRESHOLD = 0.5
+DETECTION_INPUT_SIZE = (640, 640)
+MAX_IMAGE_SIZE = 1920  # Longer image side after decoding (larger photos are downscaled)
+FACE_ALIGN_SIZE = 112
+
+
+class GalleryWriter:
+    """
+    Writes encodings and people records in the layout app.py reads.
+    """
+
+    def __init__(self, database_dir, storage):
+        """
+        Args:
+            database_dir: Database directory (images/, encodings/, people.db)
+            storage: 'files' (one .npy per person) or 'consolidated' (gallery.bin)
+        """
+        self.encodings_dir = os.path.join(database_dir, 'encodings')
+        os.makedirs(self.encodings_dir, exist_ok=True)
+
+        # Like app.py: a new people store starts from people.json
+        db_path = os.path.join(database_dir, 'people.db')
+        json_path = os.path.join(database_dir, 'people.json')
+        created = not os.path.exists(db_path)
+        self.people_store = PeopleStore(db_path)
+        if created and os.path.exists(json_path):
+            print(f"✓ Imported {self.people_store.import_json(json_path)} people from {json_path}")
+
+        self.gallery_file = None
+        if storage == 'consolidated':
+            self.gallery_file = GalleryFile(self.encodings_dir)
+            if not self.gallery_file.exists() and any(name.endswith('.npy') for name in os.listdir(self.encodings_dir)):
+                print("⚠ No gallery file yet - migrating per-person encodings (see migrate_gallery.py)")
+                migrate_encoding_files(self.encodings_dir)
+            self.gallery_file.open()
+
+    def commit(self, results):
+        """
+        Store the enrolled people of a list of worker results.
+
+        Encodings are written first and the people records in one transaction
+        afterwards, so a person is never listed without an encoding.
+        """
+        enrolled = [result for result in results if 'encoding' in result]
+        if not enrolled:
+            return
+        person_ids = [result['id'] for result in enrolled]
+        if self.gallery_file is not None:
+            self.gallery_file.append_many(person_ids, [result['encoding'] for result in enrolled])
+        else:
+            for result in enrolled:
+                np.save(os.path.join(self.encodings_dir, f"{result['id']}.npy"), result['encoding'])
+                # app.py recreates a missing hash code; a stale one would not match the new encoding
+                code_path = os.path.join(self.encodings_dir, f"{result['id']}.hash")
+                if os.path.exists(code_path):
+                    os.remove(code_path)
+
+        self.people_store.add_many([{
+            'id': result['id'],
+            'name': result['name'],
+            'email': '',
+            'employee_id': '',
+            'image_path': result['image_path'],
+            'aligned_path': result['aligned_path'],
+            'encoding_path': (self.gallery_file.path if self.gallery_file is not None
+                              else os.path.join(self.encodings_dir, f"{result['id']}.npy")),
+            'added_date': datetime.now().isoformat(),
+            'image_count': result['accepted']
+        } for result in enrolled])
+
+    def close(self):
+        """Fold the appended encodings into gallery.bin."""
+        if self.gallery_file is not None:
+            self.gallery_file.compact()
+
+
+def checkpoint_entry(result):
+    """Checkpoint line of a worker result (without the encoding)."""
+    entry = {key: result[key] for key in ('folder', 'id', 'images', 'accepted')}
+    entry['status'] = 'enrolled' if 'encoding' in result else 'failed'
+    if result['errors']:
+        entry['errors'] = result['errors']
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll a folder-per-person image tree into the gallery")
+    parser.add_argument('root', help="Directory with one sub-directory of images per person")
+    parser.add_argument('--database-dir', default=DATABASE_DIR, help="Database directory read by app.py")
+    parser.add_argument('--models-dir', default=MODELS_DIR, help="Directory holding the SCRFD and ArcFace models")
+    parser.add_argument('--precision', default=os.environ.get('MODEL_PRECISION', 'fp32'),
+                        help="Model precision: fp32, int8_dynamic or int8_static (see quantize_models.py)")
+    parser.add_argument('--storage', default=os.environ.get('GALLERY_STORAGE', 'files'),
+                        choices=('files', 'consolidated'), help="Encoding layout (app.py GALLERY_STORAGE)")
+    parser.add_argument('--workers', type=int, default=0, help="Worker processes (0 = CPUs / threads)")
+    parser.add_argument('--threads', type=int, default=1, help="ONNX Runtime threads per worker")
+    parser.add_argument('--commit-every', type=int, default=256, help="People per gallery/database commit")
+    parser.add_argument('--checkpoint', default=None,
+                        help=f"Checkpoint file (default: <database-dir>/{CHECKPOINT_NAME})")
+    parser.add_argument('--retry-failed', action='store_true', help="Re-run folders that had no usable image")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and enroll every folder")
+    args = parser.parse_args()
+
+    scrfd_path = resolve_model_path(os.path.join(args.models_dir, SCRFD_MODEL), args.precision)
+    arcface_path = resolve_model_path(os.path.join(args.models_dir, ARCFACE_MODEL), args.precision)
+    for path in (scrfd_path, arcface_path):
+        if not os.path.exists(path):
+            print(f"✗ Missing {path} (run: python download_models.py)")
+            return 1
+    if not os.path.isdir(args.root):
+        print(f"✗ Not a directory: {args.root}")
+        return 1
+
+    images_dir = os.path.join(os.path.abspath(args.database_dir), 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    checkpoint_path = args.checkpoint or os.path.join(args.database_dir, CHECKPOINT_NAME)
+
+    people = scan_people(args.root)
+    # The checkpoint is shared by every enrolled tree, so --restart only ignores it
+    done = {} if args.restart else read_checkpoint(checkpoint_path, args.root)
+    tasks = [(folder, paths) for folder, paths in people
+             if folder not in done or (args.retry_failed and done[folder]['status'] == 'failed')]
+    print(f"Found {len(people)} people in {args.root}: {len(people) - len(tasks)} already done, {len(tasks)} to enroll")
+    if not tasks:
+        return 0
+
+    workers = args.workers or max(1, (os.cpu_count() or 1) // max(1, args.threads))
+    workers = min(workers, len(tasks))
+    session_config = {
+        'intra_op_num_threads': args.threads,
+        'inter_op_num_threads': 1,
+        'optimized_model_dir': os.path.join(args.models_dir, 'optimized')
+    }
+    detection = {
+        'threshold': DETECTION_THRESHOLD,
+        'input_size': DETECTION_INPUT_SIZE,
+        'max_image_size': MAX_IMAGE_SIZE,
+        'align_size': FACE_ALIGN_SIZE
+    }
+
+    # Optimize the graphs once here, so the workers only load the cached files
+    for path in (scrfd_path, arcface_path):
+        create_session(path, **session_config)
+
+    writer = GalleryWriter(args.database_dir, args.storage)
+    print(f"Enrolling with {workers} workers x {args.threads} threads ({args.storage} storage)")
+
+    pending = []
+    enrolled = failed = images = 0
+    start = time.perf_counter()
+
+    def commit():
+        writer.commit(pending)
+        write_checkpoint(checkpoint_path, args.root, [checkpoint_entry(result) for result in pending])
+        pending.clear()
+
+    # spawn: each worker starts clean and creates its own sessions
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(workers, initializer=init_worker,
+                        initargs=(scrfd_path, arcface_path, session_config, detection, images_dir, args.root))
+    try:
+        for result in pool.imap_unordered(enroll_person, tasks):
+            pending.append(result)
+            images += result['images']
+            if 'encoding' in result:
+                enrolled += 1
+            else:
+                failed += 1
+                print(f"✗ {result['folder']}: no usable image ({'; '.join(sorted(set(result['errors'].values())))})")
+            if len(pending) >= args.commit_every:
+                commit()
+                elapsed = time.perf_counter() - start
+                print(f"  {enrolled + failed}/{len(tasks)} people, {images / elapsed:.1f} images/s")
+        commit()
+    except KeyboardInterrupt:
+        commit()
+        print(f"\n⚠ Interrupted - {enrolled + failed} people saved; run again to resume from {checkpoint_path}")
+        return 130
+    finally:
+        pool.terminate()
+        pool.join()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✓ Enrolled {enrolled} people ({failed} without a usable image) from {images} images "
+          f"in {elapsed:.1f}s: {images / elapsed:.1f} images/s")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
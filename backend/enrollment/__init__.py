@@ -0,0 +1 @@
+# Enrollment module
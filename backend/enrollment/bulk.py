@@ -0,0 +1,228 @@
+"""
+Bulk Enrollment Inputs
+
+Reads a batch of people to register: a CSV manifest with one row per person
+(columns name and image, optionally email and employee_id) whose image column
+names a file shipped either in the same zip archive or as a multipart upload.
+
+Uploads are copied into temporary files owned by the source, so they can be
+read after the request's own upload files are closed (streamed responses).
+
+Images are decoded (and downscaled) in a thread pool so decoding thousands of
+JPEGs keeps every core busy while the calling thread runs detection and
+embedding on the previous chunk. cv2.imdecode and cv2.resize release the GIL,
+so threads decode in parallel without forking the server (whose model sessions
+and background threads must not be copied into child processes).
+"""
+
+import csv
+import io
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+MANIFEST_NAME = 'manifest.csv'
+REQUIRED_COLUMNS = ('name', 'image')
+OPTIONAL_COLUMNS = ('email', 'employee_id')
+
+
+class ManifestError(ValueError):
+    """Raised when a bulk upload has no usable manifest."""
+
+
+def read_manifest(text):
+    """
+    Parse a CSV manifest.
+
+    Args:
+        text: CSV text with a header row
+
+    Returns:
+        List of row dicts with the keys name, image, email and employee_id
+        (stripped strings; missing optional columns are empty)
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    columns = [column.strip().lower() for column in reader.fieldnames or []]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ManifestError(f"Manifest is missing the column(s): {', '.join(missing)}")
+
+    rows = []
+    for raw in reader:
+        row = {column: (value or '').strip() for column, value in zip(columns, raw.values())}
+        rows.append({column: row.get(column, '') for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS})
+    return rows
+
+
+class ZipSource:
+    """
+    Manifest and images from a zip archive (manifest.csv anywhere in the archive).
+    """
+
+    def __init__(self, fileobj):
+        """
+        Args:
+            fileobj: File object of the zip archive
+        """
+        self.file = tempfile.TemporaryFile()
+        shutil.copyfileobj(fileobj, self.file)
+        try:
+            self.archive = zipfile.ZipFile(self.file)
+        except zipfile.BadZipFile as e:
+            self.file.close()
+            raise ManifestError(f"Invalid zip archive: {e}")
+
+        try:
+            members = [info for info in self.archive.infolist() if not info.is_dir()]
+            manifests = [info for info in members if os.path.basename(info.filename).lower() == MANIFEST_NAME]
+            if not manifests:
+                raise ManifestError(f"No {MANIFEST_NAME} in the archive")
+            manifest = min(manifests, key=lambda info: info.filename.count('/'))
+            self.rows = read_manifest(self.archive.read(manifest).decode('utf-8'))
+        except Exception:
+            # The caller never gets the source back to close it
+            self.close()
+            raise
+
+        # Image paths are relative to the manifest's folder; bare file names also match
+        self.root = os.path.dirname(manifest.filename)
+        self.members = {info.filename: info for info in members}
+        self.basenames = {}
+        for info in members:
+            self.basenames.setdefault(os.path.basename(info.filename), info)
+
+    def read(self, image_name):
+        """Raw bytes of an image, or None if the archive does not contain it."""
+        path = image_name.replace('\\', '/').lstrip('/')
+        info = self.members.get(f"{self.root}/{path}" if self.root else path) or self.members.get(path)
+        if info is None:
+            info = self.basenames.get(os.path.basename(path))
+        return None if info is None else self.archive.read(info)
+
+    def close(self):
+        self.archive.close()
+        self.file.close()
+
+
+class UploadSource:
+    """
+    Manifest text plus uploaded image files, matched by file name.
+    """
+
+    def __init__(self, manifest_text, files):
+        """
+        Args:
+            manifest_text: CSV manifest text
+            files: Iterable of uploaded files (objects with .filename and .read())
+        """
+        self.rows = read_manifest(manifest_text)
+        self.file = tempfile.TemporaryFile()
+        self.offsets = {}
+        for file in files:
+            name = os.path.basename((file.filename or '').replace('\\', '/'))
+            if name in self.offsets:
+                continue
+            offset = self.file.tell()
+            shutil.copyfileobj(file, self.file)
+            self.offsets[name] = (offset, self.file.tell() - offset)
+
+    def read(self, image_name):
+        """Raw bytes of an uploaded image, or None if it was not uploaded."""
+        location = self.offsets.get(os.path.basename(image_name.replace('\\', '/')))
+        if location is None:
+            return None
+        self.file.seek(location[0])
+        return self.file.read(location[1])
+
+    def close(self):
+        self.file.close()
+
+
+def decode_image(data, max_size=0):
+    """
+    Decode an encoded image (JPEG, PNG, ...) to BGR.
+
+    Args:
+        data: Encoded image bytes
+        max_size: Downscale so that the longer side is at most this many pixels (0 = keep)
+
+    Returns:
+        numpy.ndarray: BGR image, or None if the data is not a decodable image
+    """
+    if not data:
+        return None
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    longest = max(image.shape[:2])
+    if max_size and longest > max_size:
+        scale = max_size / longest
+        image = cv2.resize(image, (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return image
+
+
+def _decode_chunk(blobs, max_size):
+    return [decode_image(data, max_size) for data in blobs]
+
+
+class ImageDecoder:
+    """
+    Decodes batches of encoded images in a thread pool (created on first use).
+    """
+
+    def __init__(self, num_workers=0, max_size=0):
+        """
+        Args:
+            num_workers: Decoder threads (0 = one per CPU; 1 = decode in the calling thread)
+            max_size: Longest image side after decoding (0 = keep, see decode_image)
+        """
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_size = max_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix='image-decoder')
+            return self._pool
+
+    def submit(self, blobs):
+        """
+        Start decoding encoded images in the background.
+
+        Args:
+            blobs: List of encoded image bytes (None entries stay None)
+
+        Returns:
+            Callable returning the list of BGR images (None where decoding
+            failed) in input order, once all of them are decoded
+        """
+        if self.num_workers <= 1 or len(blobs) <= 1:
+            images = _decode_chunk(blobs, self.max_size)
+            return lambda: images
+
+        # A few images per task keeps the scheduling overhead small
+        per_task = max(1, -(-len(blobs) // (self.num_workers * 2)))
+        pool = self._get_pool()
+        futures = [pool.submit(_decode_chunk, blobs[i:i + per_task], self.max_size)
+                   for i in range(0, len(blobs), per_task)]
+        return lambda: [image for future in futures for image in future.result()]
+
+    def decode(self, blobs):
+        """Decode encoded images (see submit) and wait for the result."""
+        return self.submit(blobs)()
+
+    def close(self):
+        """Shut the decoder threads down (a later decode starts new ones)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,201 @@
+"""
+Folder Enrollment
+
+Offline enrollment of a directory tree with one folder per person
+(root/<person_name>/*.jpg), used by enroll_folder.py.
+
+Each worker process loads its own SCRFD and ArcFace sessions with a fixed
+thread budget and enrolls whole people: every image of the folder is decoded
+and detected, images with exactly one face are embedded in one ArcFace batch,
+and the person's encoding is the normalized mean of those embeddings. The
+worker also writes the person's image and aligned crop; the parent process
+commits encodings and people records.
+
+Person ids are derived from the resolved root directory and the folder name,
+so enrolling a folder again (e.g. after an interruption) replaces the same
+records instead of adding duplicates, while equally named folders of another
+tree (photos_2023/jane_doe, photos_2024/jane_doe) stay different people.
+Finished folders are listed in a JSON-lines checkpoint, keyed the same way.
+"""
+
+import json
+import os
+import uuid
+
+import cv2
+import numpy as np
+
+from enrollment.bulk import decode_image
+from face_alignment.alignment import norm_crop
+from face_detection.scrfd_detector import SCRFD
+from face_recognition_module.arcface_recognizer import ArcFaceRecognizer
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# Namespace of the folder-derived person ids
+ENROLLMENT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'face-recognition/enroll-folder')
+
+# Models of the current worker process (see init_worker)
+_worker = {}
+
+
+def scan_people(root):
+    """
+    List the person folders of an enrollment tree.
+
+    Args:
+        root: Directory with one sub-directory of images per person
+
+    Returns:
+        List of (folder name, sorted image paths) tuples, sorted by folder
+        (folders without images are skipped)
+    """
+    people = []
+    for entry in sorted(os.scandir(root), key=lambda entry: entry.name):
+        if not entry.is_dir() or entry.name.startswith('.'):
+            continue
+        images = sorted(
+            os.path.join(entry.path, name) for name in os.listdir(entry.path)
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.')
+        )
+        if images:
+            people.append((entry.name, images))
+    return people
+
+
+def person_id_for(root, folder):
+    """Stable person id of a person folder of an enrollment tree."""
+    return str(uuid.uuid5(ENROLLMENT_NAMESPACE, f"{os.path.realpath(root)}/{folder}"))
+
+
+def person_name_for(folder):
+    """Display name of a person folder ('jane_doe' -> 'jane doe')."""
+    return folder.replace('_', ' ').strip() or folder
+
+
+def read_checkpoint(path, root):
+    """
+    Load the folders of an enrollment tree finished by earlier runs.
+
+    Args:
+        path: Checkpoint file
+        root: Enrollment tree; entries written for other trees are skipped
+
+    Returns:
+        Dict of folder name -> checkpoint entry (a torn last line is ignored)
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    root = os.path.realpath(root)
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('root') == root:
+                done[entry['folder']] = entry
+    return done
+
+
+def write_checkpoint(path, root, entries):
+    """Append finished folders of an enrollment tree to the checkpoint and flush them to disk."""
+    root = os.path.realpath(root)
+    with open(path, 'a') as f:
+        for entry in entries:
+            f.write(json.dumps(dict(entry, root=root)) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def init_worker(scrfd_path, arcface_path, session_config, detection, images_dir, root):
+    """
+    Load the models of one worker process (multiprocessing Pool initializer).
+
+    Args:
+        scrfd_path: SCRFD model file
+        arcface_path: ArcFace model file
+        session_config: Keyword arguments for create_session (thread budget etc.)
+        detection: Dict with threshold, input_size, max_image_size and align_size
+        images_dir: Directory the person images are written to
+        root: Enrollment tree the person folders belong to (see person_id_for)
+    """
+    cv2.setNumThreads(1)
+    detector = SCRFD(model_file=scrfd_path, session_config=session_config)
+    detector.prepare(0, auto_max_size=max(detection['input_size']))
+    recognizer = ArcFaceRecognizer(model_file=arcface_path, session_config=session_config)
+    _worker.update(detector=detector, recognizer=recognizer, detection=detection, images_dir=images_dir,
+                   root=root)
+
+
+def enroll_person(task):
+    """
+    Detect, embed and store the images of one person (runs in a worker).
+
+    Args:
+        task: Tuple of (folder name, image paths)
+
+    Returns:
+        Dict with folder, id, name, images (number of images), accepted
+        (images with exactly one face), errors (image -> reason) and, if any
+        image was accepted, encoding, image_path and aligned_path
+    """
+    folder, paths = task
+    detector, recognizer = _worker['detector'], _worker['recognizer']
+    detection = _worker['detection']
+    person_id = person_id_for(_worker['root'], folder)
+    result = {'folder': folder, 'id': person_id, 'name': person_name_for(folder),
+              'images': len(paths), 'accepted': 0, 'errors': {}}
+
+    faces = []
+    for path in paths:
+        name = os.path.basename(path)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            image = decode_image(data, detection['max_image_size'])
+            if image is None:
+                result['errors'][name] = 'No valid image provided'
+                continue
+            bboxes, landmarks = detector.detect(image, thresh=detection['threshold'], input_size='auto')
+        except Exception as e:
+            result['errors'][name] = str(e)
+            continue
+        if len(bboxes) == 0:
+            result['errors'][name] = 'No face detected in image'
+        elif len(bboxes) > 1:
+            result['errors'][name] = 'Multiple faces detected'
+        elif landmarks is None:
+            result['errors'][name] = 'Could not detect facial landmarks'
+        else:
+            faces.append((path, data, image, np.asarray(landmarks[0], dtype=np.float32)))
+
+    if not faces:
+        return result
+
+    try:
+        embeddings = recognizer.get_embeddings_from_landmarks(
+            [image for _, _, image, _ in faces], np.array([landmarks for *_, landmarks in faces])
+        )
+    except Exception as e:
+        for path, *_ in faces:
+            result['errors'][os.path.basename(path)] = f"Failed to extract face features: {e}"
+        return result
+    encoding = embeddings.mean(axis=0)
+    encoding /= max(np.linalg.norm(encoding), 1e-12)
+
+    # The first accepted image becomes the person's picture (JPEGs are copied as they are)
+    path, data, image, landmarks = faces[0]
+    image_path = os.path.join(_worker['images_dir'], f"{person_id}.jpg")
+    if data[:3] == b'\xff\xd8\xff':
+        with open(image_path, 'wb') as f:
+            f.write(data)
+    else:
+        cv2.imwrite(image_path, image)
+    aligned_path = os.path.join(_worker['images_dir'], f"{person_id}_aligned.jpg")
+    cv2.imwrite(aligned_path, norm_crop(image, landmarks, image_size=detection['align_size']))
+
+    result.update(accepted=len(faces), encoding=encoding.astype(np.float32),
+                  image_path=image_path, aligned_path=aligned_path)
+    return result
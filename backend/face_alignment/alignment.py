@@ -4,11 +4,19 @@ Based on: https://github.com/vectornguyen76/face-recognition
 
 This module provides face alignment using similarity transformation
 to align faces to a standard ArcFace template.
+
+The similarity transforms are estimated with a closed-form, batched NumPy
+implementation of Umeyama's method. scikit-image is optional and only used
+by estimate_norm_reference to cross-check the results.
 """
 
 import cv2
 import numpy as np
-from skimage import transform as trans
+
+try:
+    from skimage import transform as trans
+except ImportError:  # Optional reference implementation only
+    trans = None
 
 # Standard ArcFace destination landmarks
 # These are the target positions for the 5 facial landmarks:
@@ -25,19 +33,16 @@ ARCFACE_DST = np.array(
 )
 
 
-def estimate_norm(lmk, image_size=112, mode="arcface"):
+def get_arcface_dst(image_size=112):
     """
-    Estimate the transformation matrix for aligning facial landmarks.
+    Get the ArcFace template landmarks scaled to an output image size.
 
     Args:
-        lmk: numpy.ndarray of shape (5, 2) representing facial landmarks.
-        image_size: Desired output image size (default: 112 for ArcFace).
-        mode: Alignment mode, currently only "arcface" is supported.
+        image_size: Desired output image size (multiple of 112 or 128).
 
     Returns:
-        numpy.ndarray: Transformation matrix (2x3) for aligning facial landmarks.
+        numpy.ndarray: Destination landmarks of shape (5, 2).
     """
-    assert lmk.shape == (5, 2), f"Expected landmarks shape (5, 2), got {lmk.shape}"
     assert image_size % 112 == 0 or image_size % 128 == 0
 
     # Adjust ratio and x-coordinate difference based on image size
@@ -52,9 +57,130 @@ def estimate_norm(lmk, image_size=112, mode="arcface"):
     dst = ARCFACE_DST * ratio
     dst[:, 0] += diff_x
 
-    # Estimate the similarity transformation
-    tform = trans.SimilarityTransform()
-    tform.estimate(lmk, dst)
+    return dst
+
+
+def umeyama_batch(src, dst):
+    """
+    Estimate similarity transforms (rotation, uniform scale, translation) for a batch.
+
+    Closed-form least-squares solution of Umeyama (PAMI 1991), vectorized over
+    N point sets. Matches skimage.transform.SimilarityTransform.estimate.
+
+    Args:
+        src: numpy.ndarray of shape (N, K, 2), source points per set.
+        dst: numpy.ndarray of shape (K, 2), shared destination points.
+
+    Returns:
+        numpy.ndarray: Transformation matrices of shape (N, 2, 3). Degenerate
+        point sets yield NaN matrices.
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    num = src.shape[1]
+
+    # Means and demeaned coordinates
+    src_mean = src.mean(axis=1)
+    dst_mean = dst.mean(axis=0)
+    src_demean = src - src_mean[:, np.newaxis, :]
+    dst_demean = dst - dst_mean
+
+    # Cross-covariance between destination and each source set, Eq. (38)
+    A = np.einsum('kd,nke->nde', dst_demean, src_demean) / num
+
+    # Reflection correction, Eq. (39)
+    d = np.ones((src.shape[0], 2), dtype=np.float64)
+    d[np.linalg.det(A) < 0, 1] = -1
+
+    U, S, V = np.linalg.svd(A)
+
+    # Rank from singular values (as numpy.linalg.matrix_rank)
+    tol = S.max(axis=1) * 2 * np.finfo(float).eps
+    rank = np.count_nonzero(S > tol[:, np.newaxis], axis=1)
+
+    # Rank-1 sets only flip the last axis when U and V disagree in orientation, Eq. (40) and (43)
+    rank_deficient = rank == 1
+    if np.any(rank_deficient):
+        same_orientation = np.linalg.det(U) * np.linalg.det(V) > 0
+        d[rank_deficient, 1] = np.where(same_orientation[rank_deficient], 1.0, -1.0)
+
+    R = np.einsum('nij,nj,njk->nik', U, d, V)
+
+    # Uniform scale, Eq. (41) and (42)
+    scale = np.sum(S * d, axis=1) / src_demean.var(axis=1).sum(axis=1)
+
+    M = np.empty((src.shape[0], 2, 3), dtype=np.float64)
+    M[:, :, :2] = R * scale[:, np.newaxis, np.newaxis]
+    M[:, :, 2] = dst_mean - scale[:, np.newaxis] * np.einsum('nij,nj->ni', R, src_mean)
+    M[rank == 0] = np.nan
+
+    return M
+
+
+def estimate_norm_batch(lmks, image_size=112, mode="arcface"):
+    """
+    Estimate alignment matrices for N sets of facial landmarks at once.
+
+    Args:
+        lmks: numpy.ndarray of shape (N, 5, 2) with facial landmarks.
+        image_size: Desired output image size (default: 112 for ArcFace).
+        mode: Alignment mode, currently only "arcface" is supported.
+
+    Returns:
+        numpy.ndarray: Transformation matrices of shape (N, 2, 3).
+    """
+    lmks = np.asarray(lmks, dtype=np.float32)
+    assert lmks.ndim == 3 and lmks.shape[1:] == (5, 2), \
+        f"Expected landmarks shape (N, 5, 2), got {lmks.shape}"
+
+    return umeyama_batch(lmks, get_arcface_dst(image_size))
+
+
+def estimate_norm(lmk, image_size=112, mode="arcface"):
+    """
+    Estimate the transformation matrix for aligning facial landmarks.
+
+    Args:
+        lmk: numpy.ndarray of shape (5, 2) representing facial landmarks.
+        image_size: Desired output image size (default: 112 for ArcFace).
+        mode: Alignment mode, currently only "arcface" is supported.
+
+    Returns:
+        numpy.ndarray: Transformation matrix (2x3) for aligning facial landmarks.
+    """
+    assert lmk.shape == (5, 2), f"Expected landmarks shape (5, 2), got {lmk.shape}"
+
+    return estimate_norm_batch(lmk[np.newaxis], image_size, mode)[0]
+
+
+def estimate_norm_reference(lmk, image_size=112, mode="arcface"):
+    """
+    Reference implementation of estimate_norm using scikit-image.
+
+    Used to cross-check the NumPy implementation; requires scikit-image.
+
+    Args:
+        lmk: numpy.ndarray of shape (5, 2) representing facial landmarks.
+        image_size: Desired output image size (default: 112 for ArcFace).
+        mode: Alignment mode, currently only "arcface" is supported.
+
+    Returns:
+        numpy.ndarray: Transformation matrix (2x3) for aligning facial landmarks.
+    """
+    if trans is None:
+        raise ImportError("scikit-image is required for estimate_norm_reference")
+
+    assert lmk.shape == (5, 2), f"Expected landmarks shape (5, 2), got {lmk.shape}"
+
+    # Estimate the similarity transformation (from_estimate replaces the deprecated estimate)
+    dst = get_arcface_dst(image_size)
+    if hasattr(trans.SimilarityTransform, "from_estimate"):
+        tform = trans.SimilarityTransform.from_estimate(lmk, dst)
+        if not tform:
+            raise ValueError(f"Could not estimate the alignment transform: {tform}")
+    else:
+        tform = trans.SimilarityTransform()
+        tform.estimate(lmk, dst)
     M = tform.params[0:2, :]
 
     return M
@@ -96,3 +222,35 @@ def norm_crop(img, landmark, image_size=112, mode="arcface"):
     warped = cv2.warpAffine(img, M, (image_size, image_size), borderValue=0.0)
 
     return warped
+
+
+def norm_crop_batch(img, landmarks, image_size=112, mode="arcface", out=None):
+    """
+    Align and crop several faces of the same image.
+
+    All transforms are estimated in one vectorized step and each face is
+    warped straight into a slot of the output array.
+
+    Args:
+        img: Input image (BGR format).
+        landmarks: numpy.ndarray of shape (N, 5, 2) with facial landmarks.
+        image_size: Desired output image size (default: 112 for ArcFace).
+        mode: Alignment mode, currently only "arcface" is supported.
+        out: Optional preallocated uint8 array of shape (N, image_size, image_size, 3).
+
+    Returns:
+        numpy.ndarray: Contiguous aligned faces of shape (N, image_size, image_size, 3).
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 5, 2)
+    num_faces = landmarks.shape[0]
+
+    if out is None:
+        out = np.empty((num_faces, image_size, image_size, 3), dtype=np.uint8)
+    if num_faces == 0:
+        return out
+
+    M = estimate_norm_batch(landmarks, image_size, mode)
+    for i in range(num_faces):
+        cv2.warpAffine(img, M[i], (image_size, image_size), dst=out[i], borderValue=0.0)
+
+    return out
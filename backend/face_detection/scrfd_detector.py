@@ -6,10 +6,15 @@ SCRFD (Sample and Computation Redistribution for Face Detection) is a
 state-of-the-art face detector known for its speed and accuracy.
 """
 
+import math
 import os.path as osp
+import threading
+from collections import OrderedDict
 import cv2
 import numpy as np
-import onnxruntime
+
+from model_runtime.io_binding import IOBindingRunner
+from model_runtime.session_factory import create_session
 
 
 def softmax(z):
@@ -39,16 +44,12 @@ def distance2bbox(points, distance, max_shape=None):
 
 def distance2kps(points, distance, max_shape=None):
     """Convert distance predictions to keypoint coordinates."""
-    preds = []
-    for i in range(0, distance.shape[1], 2):
-        px = points[:, i % 2] + distance[:, i]
-        py = points[:, i % 2 + 1] + distance[:, i + 1]
-        if max_shape is not None:
-            px = px.clip(min=0, max=max_shape[1])
-            py = py.clip(min=0, max=max_shape[0])
-        preds.append(px)
-        preds.append(py)
-    return np.stack(preds, axis=-1)
+    num_points = distance.shape[0]
+    preds = distance.reshape((num_points, distance.shape[1] // 2, 2)) + points[:, np.newaxis, :2]
+    if max_shape is not None:
+        preds[:, :, 0] = preds[:, :, 0].clip(min=0, max=max_shape[1])
+        preds[:, :, 1] = preds[:, :, 1].clip(min=0, max=max_shape[0])
+    return preds.reshape((num_points, distance.shape[1]))
 
 
 class SCRFD:
@@ -58,32 +59,43 @@ class SCRFD:
     This detector provides face detection with facial landmarks (5 keypoints).
     """
     
-    def __init__(self, model_file=None, session=None):
+    def __init__(self, model_file=None, session=None, use_io_binding=False, session_config=None):
         """
         Initialize SCRFD detector.
         
         Args:
             model_file: Path to the ONNX model file
             session: Existing ONNX Runtime session (optional)
+            use_io_binding: Run inference through IOBinding with reused output buffers
+            session_config: Keyword arguments for create_session (threads,
+                execution mode, optimization level, optimized model cache)
         """
         self.model_file = model_file
         self.session = session
+        self.use_io_binding = use_io_binding
         self.taskname = "detection"
         self.batched = False
         
         if self.session is None:
             assert self.model_file is not None
             assert osp.exists(self.model_file), f"Model file not found: {self.model_file}"
-            # Try GPU first, fallback to CPU
-            providers = ['CUDAExecutionProvider', 'CPUExecutionProvider']
-            self.session = onnxruntime.InferenceSession(
-                self.model_file, 
-                providers=providers
-            )
+            # Try GPU first, fallback to CPU (unless providers are set in session_config)
+            self.session = create_session(self.model_file, **(session_config or {}))
             print(f"SCRFD using provider: {self.session.get_providers()[0]}")
         
         self.center_cache = {}
+        # Per-thread preprocessing buffers, keyed by (batch size, height, width)
+        self._workspace_local = threading.local()
+        self.max_workspaces = 8
         self.nms_thresh = 0.4
+        self.nms_mode = "auto"
+        self.nms_matrix_max = 500
+        self.pre_nms_topk = 0
+        self.soft_nms_sigma = 0.5
+        self.soft_nms_min_score = 0.001
+        self.auto_max_size = 640
+        # Smallest face size (in network input pixels) that min_face_size scaling targets
+        self.min_face_input_size = 64
         self._init_vars()
 
     def _init_vars(self):
@@ -102,15 +114,23 @@ class SCRFD:
         if len(outputs[0].shape) == 3:
             self.batched = True
         
+        # A fixed integer batch dimension means only one image per session call
+        batch_dim = input_shape[0]
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else None
+        
         output_names = []
         for o in outputs:
             output_names.append(o.name)
         
         self.input_name = input_name
         self.output_names = output_names
+        self.io_runner = IOBindingRunner(self.session, input_name, output_names) if self.use_io_binding else None
         self.use_kps = False
         self._num_anchors = 1
         
+        # Anchor sizes (network input pixels) per stride, used to skip FPN levels by face size
+        self._anchor_sizes = {}
+        
         if len(outputs) == 6:
             self.fmc = 3
             self._feat_stride_fpn = [8, 16, 32]
@@ -129,6 +149,10 @@ class SCRFD:
             self._feat_stride_fpn = [8, 16, 32, 64, 128]
             self._num_anchors = 1
             self.use_kps = True
+        
+        # The 5-level models use other anchor scales: they keep every level
+        if len(outputs) in (6, 9):
+            self._anchor_sizes = {8: (16, 32), 16: (64, 128), 32: (256, 512)}
 
     def prepare(self, ctx_id, **kwargs):
         """
@@ -145,6 +169,26 @@ class SCRFD:
         if nms_thresh is not None:
             self.nms_thresh = nms_thresh
         
+        # NMS engine: 'greedy', 'matrix', 'soft' or 'auto' (matrix for small N, greedy otherwise)
+        nms_mode = kwargs.get("nms_mode", None)
+        if nms_mode is not None:
+            assert nms_mode in ("auto", "greedy", "matrix", "soft"), f"Unknown nms_mode: {nms_mode}"
+            self.nms_mode = nms_mode
+        
+        # Maximum number of candidates passed to NMS (0 = no limit)
+        pre_nms_topk = kwargs.get("pre_nms_topk", None)
+        if pre_nms_topk is not None:
+            self.pre_nms_topk = pre_nms_topk
+        
+        soft_nms_sigma = kwargs.get("soft_nms_sigma", None)
+        if soft_nms_sigma is not None:
+            self.soft_nms_sigma = soft_nms_sigma
+        
+        # Longer-side size used when detect() is called with input_size="auto"
+        auto_max_size = kwargs.get("auto_max_size", None)
+        if auto_max_size is not None:
+            self.auto_max_size = auto_max_size
+        
         input_size = kwargs.get("input_size", None)
         if input_size is not None:
             if self.input_size is not None:
@@ -152,13 +196,76 @@ class SCRFD:
             else:
                 self.input_size = input_size
 
-    def forward(self, img, thresh):
+    def forward(self, img, thresh, face_range=None):
         """
         Forward pass through the network.
         
         Args:
             img: Input image (preprocessed)
             thresh: Detection threshold
+            face_range: Optional (min, max) face size in input pixels; FPN levels
+                whose anchors cannot produce faces in range are not decoded
+            
+        Returns:
+            Tuple of (scores_list, bboxes_list, kpss_list)
+        """
+        input_size = tuple(img.shape[0:2][::-1])
+        _, blob = self._get_workspace(1, input_size)
+        self._fill_blob(img[np.newaxis], blob)
+        net_outs = self._run_session(blob)
+
+        return self._decode_outputs(net_outs, 0, blob.shape[2], blob.shape[3], thresh, face_range)
+
+    def forward_batch(self, imgs, thresh, face_ranges=None):
+        """
+        Forward pass for several letterboxed images of the same size in one session call.
+        
+        Args:
+            imgs: List or (N, H, W, 3) array of input images (preprocessed, identical shapes)
+            thresh: Detection threshold
+            face_ranges: Optional list with one face_range (see forward) per image
+            
+        Returns:
+            List of (scores_list, bboxes_list, kpss_list) tuples, one per image
+        """
+        input_size = tuple(imgs[0].shape[0:2][::-1])
+        _, blob = self._get_workspace(len(imgs), input_size)
+        self._fill_blob(imgs, blob)
+        net_outs = self._run_session(blob)
+
+        if face_ranges is None:
+            face_ranges = [None] * len(imgs)
+        
+        return [
+            self._decode_outputs(net_outs, i, blob.shape[2], blob.shape[3], thresh, face_ranges[i])
+            for i in range(len(imgs))
+        ]
+
+    def _run_session(self, blob):
+        """
+        Run the network on a blob, through IOBinding when enabled.
+        
+        Falls back to a plain session.run if IOBinding fails.
+        """
+        if self.io_runner is not None:
+            try:
+                return self.io_runner.run(blob)
+            except Exception as e:
+                print(f"SCRFD IOBinding failed, falling back to session.run: {e}")
+                self.io_runner = None
+        return self.session.run(self.output_names, {self.input_name: blob})
+
+    def _decode_outputs(self, net_outs, batch_index, input_height, input_width, thresh, face_range=None):
+        """
+        Decode raw network outputs of one image into scores, boxes and keypoints.
+        
+        Args:
+            net_outs: Raw session outputs
+            batch_index: Index of the image within a batched output
+            input_height: Network input height
+            input_width: Network input width
+            thresh: Detection threshold
+            face_range: Optional (min, max) face size in input pixels
             
         Returns:
             Tuple of (scores_list, bboxes_list, kpss_list)
@@ -166,69 +273,116 @@ class SCRFD:
         scores_list = []
         bboxes_list = []
         kpss_list = []
-        
-        input_size = tuple(img.shape[0:2][::-1])
-        blob = cv2.dnn.blobFromImage(
-            img, 1.0 / 128, input_size, (127.5, 127.5, 127.5), swapRB=True
-        )
-        net_outs = self.session.run(self.output_names, {self.input_name: blob})
-
-        input_height = blob.shape[2]
-        input_width = blob.shape[3]
         fmc = self.fmc
+        anchor_centers_fpn = self._get_anchor_centers(input_height, input_width)
         
         for idx, stride in enumerate(self._feat_stride_fpn):
-            # If model supports batch dim, take first output
+            # If model supports batch dim, take this image's output
             if self.batched:
-                scores = net_outs[idx][0]
-                bbox_preds = net_outs[idx + fmc][0]
-                bbox_preds = bbox_preds * stride
+                scores = net_outs[idx][batch_index]
+                bbox_preds = net_outs[idx + fmc][batch_index]
                 if self.use_kps:
-                    kps_preds = net_outs[idx + fmc * 2][0] * stride
+                    kps_preds = net_outs[idx + fmc * 2][batch_index]
             else:
                 scores = net_outs[idx]
                 bbox_preds = net_outs[idx + fmc]
-                bbox_preds = bbox_preds * stride
                 if self.use_kps:
-                    kps_preds = net_outs[idx + fmc * 2] * stride
+                    kps_preds = net_outs[idx + fmc * 2]
 
-            height = input_height // stride
-            width = input_width // stride
-            K = height * width
-            key = (height, width, stride)
-            
-            if key in self.center_cache:
-                anchor_centers = self.center_cache[key]
+            # Filter first, then decode boxes and keypoints only for surviving anchors
+            if face_range is not None and not self._stride_in_range(stride, face_range):
+                pos_inds = np.empty(0, dtype=np.intp)
             else:
-                anchor_centers = np.stack(
-                    np.mgrid[:height, :width][::-1], axis=-1
-                ).astype(np.float32)
-                anchor_centers = (anchor_centers * stride).reshape((-1, 2))
-                if self._num_anchors > 1:
-                    anchor_centers = np.stack(
-                        [anchor_centers] * self._num_anchors, axis=1
-                    ).reshape((-1, 2))
-                if len(self.center_cache) < 100:
-                    self.center_cache[key] = anchor_centers
-
-            pos_inds = np.where(scores >= thresh)[0]
-            bboxes = distance2bbox(anchor_centers, bbox_preds)
+                pos_inds = np.nonzero(scores.ravel() >= thresh)[0]
+            anchor_centers = anchor_centers_fpn[idx][pos_inds]
             pos_scores = scores[pos_inds]
-            pos_bboxes = bboxes[pos_inds]
+            pos_bboxes = distance2bbox(anchor_centers, bbox_preds[pos_inds] * stride)
             scores_list.append(pos_scores)
             bboxes_list.append(pos_bboxes)
             
             if self.use_kps:
-                kpss = distance2kps(anchor_centers, kps_preds)
-                kpss = kpss.reshape((kpss.shape[0], -1, 2))
-                pos_kpss = kpss[pos_inds]
+                pos_kpss = distance2kps(anchor_centers, kps_preds[pos_inds] * stride)
+                pos_kpss = pos_kpss.reshape((pos_kpss.shape[0], pos_kpss.shape[1] // 2, 2))
                 kpss_list.append(pos_kpss)
         
         return scores_list, bboxes_list, kpss_list
 
+    def _stride_in_range(self, stride, face_range):
+        """
+        Check whether an FPN level can produce faces within a size range.
+        
+        Args:
+            stride: Feature stride of the level
+            face_range: (min, max) face size in input pixels
+            
+        Returns:
+            bool: False if the level's anchors cannot match faces in range
+        """
+        sizes = self._anchor_sizes.get(stride)
+        if sizes is None:
+            return True
+        return sizes[-1] * 1.5 >= face_range[0] and sizes[0] / 2.0 <= face_range[1]
+
+    def _get_anchor_centers(self, input_height, input_width):
+        """
+        Get the anchor centers of every FPN level for an input size.
+        
+        The grids for all strides are computed once per input size and cached.
+        
+        Args:
+            input_height: Network input height
+            input_width: Network input width
+            
+        Returns:
+            List with one (K * num_anchors, 2) array per stride
+        """
+        key = (input_height, input_width)
+        if key in self.center_cache:
+            return self.center_cache[key]
+        
+        anchor_centers_fpn = []
+        for stride in self._feat_stride_fpn:
+            height = input_height // stride
+            width = input_width // stride
+            anchor_centers = np.stack(
+                np.mgrid[:height, :width][::-1], axis=-1
+            ).astype(np.float32)
+            anchor_centers = (anchor_centers * stride).reshape((-1, 2))
+            if self._num_anchors > 1:
+                anchor_centers = np.stack(
+                    [anchor_centers] * self._num_anchors, axis=1
+                ).reshape((-1, 2))
+            anchor_centers_fpn.append(anchor_centers)
+        
+        if len(self.center_cache) < 100:
+            self.center_cache[key] = anchor_centers_fpn
+        return anchor_centers_fpn
+
     def nms(self, dets):
         """
-        Apply Non-Maximum Suppression (NMS) to detection results.
+        Apply Non-Maximum Suppression (NMS) using the configured engine.
+        
+        In 'soft' mode the scores in dets[:, 4] are decayed in place.
+        
+        Args:
+            dets: Detection results (x1, y1, x2, y2, score)
+            
+        Returns:
+            List of indices to keep
+        """
+        mode = self.nms_mode
+        if mode == "auto":
+            mode = "matrix" if dets.shape[0] <= self.nms_matrix_max else "greedy"
+        
+        if mode == "matrix":
+            return self.nms_matrix(dets)
+        if mode == "soft":
+            return self.soft_nms(dets)
+        return self.nms_greedy(dets)
+
+    def nms_greedy(self, dets):
+        """
+        Apply greedy Non-Maximum Suppression (NMS) to detection results.
         
         Args:
             dets: Detection results (x1, y1, x2, y2, score)
@@ -265,25 +419,489 @@ class SCRFD:
 
         return keep
 
-    def detect(self, image, thresh=0.5, input_size=(640, 640), max_num=0, metric="default"):
+    def nms_matrix(self, dets):
+        """
+        Greedy NMS on a precomputed IoU matrix.
+        
+        Gives the same result as nms_greedy but computes all overlaps in one
+        vectorized step, so the Python loop only runs once per kept box.
+        Intended for small N since the matrix is N x N.
+        
+        Args:
+            dets: Detection results (x1, y1, x2, y2, score)
+            
+        Returns:
+            List of indices to keep
+        """
+        order = dets[:, 4].argsort()[::-1]
+        boxes = dets[order, :4]
+        
+        areas = (boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1)
+        xx1 = np.maximum(boxes[:, np.newaxis, 0], boxes[np.newaxis, :, 0])
+        yy1 = np.maximum(boxes[:, np.newaxis, 1], boxes[np.newaxis, :, 1])
+        xx2 = np.minimum(boxes[:, np.newaxis, 2], boxes[np.newaxis, :, 2])
+        yy2 = np.minimum(boxes[:, np.newaxis, 3], boxes[np.newaxis, :, 3])
+        
+        w = np.maximum(0.0, xx2 - xx1 + 1)
+        h = np.maximum(0.0, yy2 - yy1 + 1)
+        inter = w * h
+        suppress = inter / (areas[:, np.newaxis] + areas[np.newaxis, :] - inter) > self.nms_thresh
+        
+        keep = []
+        suppressed = np.zeros(order.size, dtype=bool)
+        pos = 0
+        while pos < order.size:
+            remaining = np.flatnonzero(~suppressed[pos:])
+            if remaining.size == 0:
+                break
+            i = pos + remaining[0]
+            keep.append(order[i])
+            suppressed |= suppress[i]
+            pos = i + 1
+        
+        return keep
+
+    def soft_nms(self, dets):
+        """
+        Apply Gaussian soft-NMS to detection results.
+        
+        Overlapping boxes have their scores decayed instead of being removed,
+        which keeps more faces in crowded scenes. Boxes whose score drops
+        below soft_nms_min_score are discarded here; detect drops those below
+        the detection threshold afterwards.
+        
+        Args:
+            dets: Detection results (x1, y1, x2, y2, score); scores are updated in place
+            
+        Returns:
+            List of indices to keep, in descending order of decayed score
+        """
+        x1 = dets[:, 0]
+        y1 = dets[:, 1]
+        x2 = dets[:, 2]
+        y2 = dets[:, 3]
+        scores = dets[:, 4].copy()
+
+        areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+        remaining = np.arange(dets.shape[0])
+
+        keep = []
+        while remaining.size > 0:
+            best = np.argmax(scores[remaining])
+            i = remaining[best]
+            keep.append(i)
+            remaining = np.delete(remaining, best)
+            
+            xx1 = np.maximum(x1[i], x1[remaining])
+            yy1 = np.maximum(y1[i], y1[remaining])
+            xx2 = np.minimum(x2[i], x2[remaining])
+            yy2 = np.minimum(y2[i], y2[remaining])
+
+            w = np.maximum(0.0, xx2 - xx1 + 1)
+            h = np.maximum(0.0, yy2 - yy1 + 1)
+            inter = w * h
+            ovr = inter / (areas[i] + areas[remaining] - inter)
+
+            scores[remaining] *= np.exp(-(ovr * ovr) / self.soft_nms_sigma)
+            remaining = remaining[scores[remaining] >= self.soft_nms_min_score]
+
+        dets[:, 4] = scores
+        return keep
+
+    def get_auto_input_size(self, image_shape, max_size=640):
+        """
+        Pick the smallest stride-aligned input size that fits an image's aspect ratio.
+        
+        The longer image side is mapped to max_size and the shorter side is
+        rounded up to a multiple of the largest feature stride, so a 16:9 frame
+        gets e.g. 640x384 instead of being zero-padded into 640x640.
+        
+        Args:
+            image_shape: Shape of the input image (height, width, ...)
+            max_size: Input size of the longer side
+            
+        Returns:
+            Tuple (width, height) usable as input_size
+        """
+        align = max(self._feat_stride_fpn)
+        max_size = int(math.ceil(max_size / align) * align)
+        height, width = image_shape[:2]
+        scale = float(max_size) / max(height, width)
+        
+        new_width = int(math.ceil(width * scale / align) * align)
+        new_height = int(math.ceil(height * scale / align) * align)
+        
+        return min(new_width, max_size), min(new_height, max_size)
+
+    def resolve_input_size(self, image_shape, input_size, min_face_size=0):
+        """
+        Resolve the input size for an image, expanding "auto" to an aspect-ratio-aware size.
+        
+        If min_face_size is set, the size is reduced to the smallest resolution
+        at which a face of that size still spans min_face_input_size pixels.
+        
+        Args:
+            image_shape: Shape of the input image (height, width, ...)
+            input_size: (width, height), None for the model's fixed size, or "auto"
+            min_face_size: Smallest face size of interest in image pixels (0 = any)
+            
+        Returns:
+            Tuple (width, height)
+        """
+        if input_size is None:
+            assert self.input_size is not None
+            return self.input_size
+        if self.input_size is not None and isinstance(input_size, str):
+            return self.input_size
+        if isinstance(input_size, str):
+            assert input_size == "auto", f"Unknown input_size: {input_size}"
+            input_size = self.get_auto_input_size(image_shape, self.auto_max_size)
+        
+        if min_face_size and min_face_size > 0 and self.input_size is None:
+            input_size = self._shrink_input_size(image_shape, input_size, min_face_size)
+        return tuple(input_size)
+
+    def _shrink_input_size(self, image_shape, input_size, min_face_size):
+        """Reduce an input size as far as min_face_size allows, keeping stride alignment."""
+        height, width = image_shape[:2]
+        scale = min(float(input_size[0]) / width, float(input_size[1]) / height)
+        needed_scale = float(self.min_face_input_size) / min_face_size
+        if needed_scale >= scale:
+            return input_size
+        
+        align = max(self._feat_stride_fpn)
+        factor = needed_scale / scale
+        new_width = max(align, int(math.ceil(input_size[0] * factor / align) * align))
+        new_height = max(align, int(math.ceil(input_size[1] * factor / align) * align))
+        return new_width, new_height
+
+    def _face_range(self, det_scale, min_face_size, max_face_size):
+        """Convert a face size range from image pixels to input pixels (None if unbounded)."""
+        if not min_face_size and not max_face_size:
+            return None
+        min_size = min_face_size * det_scale if min_face_size else 0.0
+        max_size = max_face_size * det_scale if max_face_size else float("inf")
+        return min_size, max_size
+
+    def detect(self, image, thresh=0.5, input_size=(640, 640), max_num=0, metric="default",
+               min_face_size=0, max_face_size=0):
         """
         Detect faces in an image.
         
         Args:
             image: Input image (BGR format)
             thresh: Detection confidence threshold
-            input_size: Model input size (width, height)
+            input_size: Model input size (width, height), or "auto" to fit the image aspect ratio
             max_num: Maximum number of faces to return (0 = no limit)
             metric: Sorting metric ('default' or 'max')
+            min_face_size: Smallest face to return, in image pixels (0 = no limit).
+                Also lowers the input resolution as far as this size allows.
+            max_face_size: Largest face to return, in image pixels (0 = no limit)
             
         Returns:
             Tuple of (bboxes, landmarks) where:
                 - bboxes: np.array of shape (N, 5) with [x1, y1, x2, y2, score]
                 - landmarks: np.array of shape (N, 5, 2) with facial landmarks
         """
-        assert input_size is not None or self.input_size is not None
-        input_size = self.input_size if input_size is None else input_size
+        input_size = self.resolve_input_size(image.shape, input_size, min_face_size)
+
+        det_imgs, _ = self._get_workspace(1, input_size)
+        det_img, det_scale = self._letterbox(image, input_size, out=det_imgs[0])
+        face_range = self._face_range(det_scale, min_face_size, max_face_size)
+
+        scores_list, bboxes_list, kpss_list = self.forward(det_img, thresh, face_range)
+
+        return self._postprocess(
+            image, scores_list, bboxes_list, kpss_list, det_scale, max_num, metric,
+            min_face_size, max_face_size, thresh
+        )
+
+    def detect_batch(self, images, thresh=0.5, input_size=(640, 640), max_num=0, metric="default",
+                     min_face_size=0, max_face_size=0):
+        """
+        Detect faces in several images with a single session call.
+        
+        All images are letterboxed to the same input size and stacked into one
+        NCHW blob. Models without a dynamic batch dimension fall back to one
+        session call per image.
+        
+        Args:
+            images: List of input images (BGR format)
+            thresh: Detection confidence threshold
+            input_size: Model input size (width, height)
+            max_num: Maximum number of faces to return per image (0 = no limit)
+            metric: Sorting metric ('default' or 'max')
+            min_face_size: Smallest face to return, in image pixels (0 = no limit)
+            max_face_size: Largest face to return, in image pixels (0 = no limit)
+            
+        Returns:
+            List of (bboxes, landmarks) tuples, one per image (see detect)
+        """
+        if len(images) == 0:
+            return []
+        
+        # Every frame shares one input size; "auto" fits it only when all frames have the same shape
+        if input_size == "auto" and any(image.shape[:2] != images[0].shape[:2] for image in images):
+            input_size = (self.auto_max_size, self.auto_max_size)
+        input_size = self.resolve_input_size(images[0].shape, input_size, min_face_size)
+
+        det_imgs, _ = self._get_workspace(len(images), input_size)
+        letterboxed = [
+            self._letterbox(image, input_size, out=det_img) for image, det_img in zip(images, det_imgs)
+        ]
+        face_ranges = [
+            self._face_range(det_scale, min_face_size, max_face_size) for _, det_scale in letterboxed
+        ]
 
+        if self.batched and self.fixed_batch is None:
+            decoded = self.forward_batch(det_imgs, thresh, face_ranges)
+        else:
+            decoded = [
+                self.forward(det_img, thresh, face_range)
+                for det_img, face_range in zip(det_imgs, face_ranges)
+            ]
+
+        results = []
+        for image, (_, det_scale), (scores_list, bboxes_list, kpss_list) in zip(images, letterboxed, decoded):
+            results.append(self._postprocess(
+                image, scores_list, bboxes_list, kpss_list, det_scale, max_num, metric,
+                min_face_size, max_face_size, thresh
+            ))
+        return results
+
+    def detect_tiled(self, image, thresh=0.5, input_size="auto", max_num=0, metric="default",
+                     min_face_size=0, max_face_size=0, tile_size=1280, tile_overlap=0.2,
+                     tile_input_size="auto", coarse_first=False, coarse_thresh=None):
+        """
+        Detect faces in a large image by running the detector on overlapping tiles.
+        
+        Tiles are run through the detector as one batch, their detections are
+        mapped back to image coordinates (boxes and landmarks) and merged with
+        a single cross-tile NMS. The whole image is also detected once at
+        input_size: tile detections touching an interior tile edge are dropped
+        (a face on a seam is cut in two), so faces larger than the tile
+        overlap or the tile itself come from the full-frame pass. With
+        coarse_first, that pass uses a lower coarse_thresh and only tiles
+        containing one of its candidates are processed at full resolution.
+        
+        Args:
+            image: Input image (BGR format)
+            thresh: Detection confidence threshold
+            input_size: Input size for the full-frame pass (see detect)
+            max_num: Maximum number of faces to return (0 = no limit)
+            metric: Sorting metric ('default' or 'max')
+            min_face_size: Smallest face to return, in image pixels (0 = no limit)
+            max_face_size: Largest face to return, in image pixels (0 = no limit)
+            tile_size: Tile side length in image pixels
+            tile_overlap: Overlap between neighbouring tiles as a fraction of tile_size
+            tile_input_size: Input size each tile is resized to (see detect)
+            coarse_first: Tile only where the full-frame pass found candidates
+            coarse_thresh: Candidate threshold of the full-frame pass with coarse_first (default: thresh / 2)
+            
+        Returns:
+            Tuple of (bboxes, landmarks) as returned by detect
+        """
+        height, width = image.shape[:2]
+        if max(height, width) <= tile_size:
+            return self.detect(
+                image, thresh, input_size, max_num, metric, min_face_size, max_face_size
+            )
+        
+        tile_w = min(tile_size, width)
+        tile_h = min(tile_size, height)
+        step = max(1, int(tile_size * (1.0 - tile_overlap)))
+        tiles = [
+            (x, y)
+            for y in self._tile_origins(height, tile_h, step)
+            for x in self._tile_origins(width, tile_w, step)
+        ]
+        
+        scores_list = []
+        bboxes_list = []
+        kpss_list = []
+        
+        # The full-frame pass always runs: it finds the faces the tile seams cut
+        full_thresh = thresh
+        if coarse_first:
+            full_thresh = thresh / 2.0 if coarse_thresh is None else min(coarse_thresh, thresh)
+        full_size = self.resolve_input_size(image.shape, input_size)
+        full_imgs, _ = self._get_workspace(1, full_size)
+        det_img, det_scale = self._letterbox(image, full_size, out=full_imgs[0])
+        face_range = self._face_range(det_scale, min_face_size, max_face_size)
+        scores, bboxes, kpss = self._merge_candidates(
+            self.forward(det_img, full_thresh, face_range), det_scale, (0, 0)
+        )
+        
+        # Confident full-frame detections are kept as they are
+        confident = scores.ravel() >= thresh
+        scores_list.append(scores[confident])
+        bboxes_list.append(bboxes[confident])
+        if self.use_kps:
+            kpss_list.append(kpss[confident])
+        
+        if coarse_first:
+            # Only tiles containing the center of a candidate are refined
+            centers_x = (bboxes[:, 0] + bboxes[:, 2]) / 2
+            centers_y = (bboxes[:, 1] + bboxes[:, 3]) / 2
+            tiles = [
+                (x, y) for x, y in tiles
+                if np.any((centers_x >= x) & (centers_x < x + tile_w) & (centers_y >= y) & (centers_y < y + tile_h))
+            ]
+        
+        if tiles:
+            crops = [image[y:y + tile_h, x:x + tile_w] for x, y in tiles]
+            tile_input = self.resolve_input_size(crops[0].shape, tile_input_size)
+            det_imgs, _ = self._get_workspace(len(crops), tile_input)
+            letterboxed = [
+                self._letterbox(crop, tile_input, out=det_img) for crop, det_img in zip(crops, det_imgs)
+            ]
+            face_ranges = [
+                self._face_range(det_scale, min_face_size, max_face_size) for _, det_scale in letterboxed
+            ]
+            
+            if self.batched and self.fixed_batch is None:
+                decoded = self.forward_batch(det_imgs, thresh, face_ranges)
+            else:
+                decoded = [
+                    self.forward(det_img, thresh, face_range)
+                    for det_img, face_range in zip(det_imgs, face_ranges)
+                ]
+            
+            # Map every tile's detections back to global image coordinates
+            for origin, (_, det_scale), outputs in zip(tiles, letterboxed, decoded):
+                scores, bboxes, kpss = self._merge_candidates(outputs, det_scale, origin)
+                whole = self._off_tile_seams(bboxes, origin, (tile_w, tile_h), (width, height))
+                scores_list.append(scores[whole])
+                bboxes_list.append(bboxes[whole])
+                if self.use_kps:
+                    kpss_list.append(kpss[whole])
+        
+        # Coordinates are already global, so the merged candidates are not rescaled again
+        return self._postprocess(
+            image, scores_list, bboxes_list, kpss_list, 1.0, max_num, metric,
+            min_face_size, max_face_size, thresh
+        )
+
+    @staticmethod
+    def _off_tile_seams(bboxes, origin, tile_size, image_size, margin=2.0):
+        """
+        Mask of tile detections that do not touch an interior tile edge.
+        
+        A box reaching an edge shared with a neighbouring tile is a face cut by
+        the seam; it is found whole by the neighbour or the full-frame pass.
+        
+        Args:
+            bboxes: (N, 4) boxes in image coordinates
+            origin: (x, y) offset of the tile within the image
+            tile_size: (width, height) of the tile
+            image_size: (width, height) of the image
+            margin: Distance to the edge (pixels) that still counts as touching
+            
+        Returns:
+            Boolean array of shape (N,)
+        """
+        x, y = origin
+        tile_w, tile_h = tile_size
+        width, height = image_size
+        keep = np.ones(len(bboxes), dtype=bool)
+        if x > 0:
+            keep &= bboxes[:, 0] > x + margin
+        if y > 0:
+            keep &= bboxes[:, 1] > y + margin
+        if x + tile_w < width:
+            keep &= bboxes[:, 2] < x + tile_w - margin
+        if y + tile_h < height:
+            keep &= bboxes[:, 3] < y + tile_h - margin
+        return keep
+
+    @staticmethod
+    def _tile_origins(length, tile, step):
+        """Get tile start offsets along one axis, with the last tile flush to the border."""
+        if length <= tile:
+            return [0]
+        origins = list(range(0, length - tile, step))
+        origins.append(length - tile)
+        return origins
+
+    def _merge_candidates(self, outputs, det_scale, origin):
+        """
+        Stack decoded per-level candidates and map them to image coordinates.
+        
+        Args:
+            outputs: Tuple of (scores_list, bboxes_list, kpss_list) from forward
+            det_scale: Letterbox scale of the (tile) image
+            origin: (x, y) offset of the tile within the full image
+            
+        Returns:
+            Tuple of (scores, bboxes, kpss); kpss is None without keypoints
+        """
+        scores_list, bboxes_list, kpss_list = outputs
+        offset = np.array(origin, dtype=np.float32)
+        
+        scores = np.vstack(scores_list)
+        bboxes = np.vstack(bboxes_list) / det_scale + np.tile(offset, 2)
+        kpss = None
+        if self.use_kps:
+            kpss = np.vstack(kpss_list) / det_scale + offset
+        
+        return scores, bboxes, kpss
+
+    def _get_workspace(self, batch_size, input_size):
+        """
+        Get this thread's reusable preprocessing buffers for a batch size and input size.
+        
+        Args:
+            batch_size: Number of images in the batch
+            input_size: Model input size (width, height)
+            
+        Returns:
+            Tuple of (det_imgs, blob): uint8 (N, H, W, 3) letterbox canvases and
+            the float32 (N, 3, H, W) network input
+        """
+        workspaces = getattr(self._workspace_local, "workspaces", None)
+        if workspaces is None:
+            workspaces = self._workspace_local.workspaces = OrderedDict()
+        
+        key = (batch_size, input_size[1], input_size[0])
+        workspace = workspaces.get(key)
+        if workspace is not None:
+            workspaces.move_to_end(key)
+        else:
+            # Drop only the least recently used buffers
+            if len(workspaces) >= self.max_workspaces:
+                workspaces.popitem(last=False)
+            workspace = (
+                np.zeros((batch_size, input_size[1], input_size[0], 3), dtype=np.uint8),
+                np.empty((batch_size, 3, input_size[1], input_size[0]), dtype=np.float32),
+            )
+            workspaces[key] = workspace
+        return workspace
+
+    @staticmethod
+    def _fill_blob(imgs, blob):
+        """
+        Normalize (N, H, W, 3) BGR images into an existing float32 NCHW RGB blob.
+        
+        Equivalent to cv2.dnn.blobFromImages(imgs, 1/128, mean=127.5, swapRB=True)
+        without allocating a new blob.
+        """
+        imgs = np.asarray(imgs)
+        np.subtract(imgs[..., ::-1].transpose(0, 3, 1, 2), np.float32(127.5), out=blob, casting="unsafe")
+        np.multiply(blob, np.float32(1.0 / 128), out=blob)
+        return blob
+
+    def _letterbox(self, image, input_size, out=None):
+        """
+        Resize an image into the top-left corner of a zero-padded input canvas.
+        
+        Args:
+            image: Input image (BGR format)
+            input_size: Model input size (width, height)
+            out: Optional preallocated (height, width, 3) uint8 canvas to resize into
+            
+        Returns:
+            Tuple of (det_img, det_scale)
+        """
         im_ratio = float(image.shape[0]) / image.shape[1]
         model_ratio = float(input_size[1]) / input_size[0]
         
@@ -295,31 +913,70 @@ class SCRFD:
             new_height = int(new_width * im_ratio)
         
         det_scale = float(new_height) / image.shape[0]
-        resized_img = cv2.resize(image, (new_width, new_height))
-        det_img = np.zeros((input_size[1], input_size[0], 3), dtype=np.uint8)
-        det_img[:new_height, :new_width, :] = resized_img
+        if out is None:
+            out = np.zeros((input_size[1], input_size[0], 3), dtype=np.uint8)
+        else:
+            # Clear whatever a previous frame left in the padding
+            out[new_height:, :, :] = 0
+            out[:new_height, new_width:, :] = 0
+        
+        # Resize straight into the canvas instead of allocating a new image
+        cv2.resize(image, (new_width, new_height), dst=out[:new_height, :new_width, :])
 
-        scores_list, bboxes_list, kpss_list = self.forward(det_img, thresh)
+        return out, det_scale
 
+    def _postprocess(self, image, scores_list, bboxes_list, kpss_list, det_scale, max_num, metric,
+                     min_face_size=0, max_face_size=0, thresh=0.0):
+        """
+        Rescale, run NMS and optionally limit the detections of one image.
+        
+        Soft-NMS decays the scores of overlapping faces, so the detection
+        threshold is applied again after NMS.
+        
+        Returns:
+            Tuple of (bboxes, landmarks) as returned by detect
+        """
         scores = np.vstack(scores_list)
         scores_ravel = scores.ravel()
-        order = scores_ravel.argsort()[::-1]
-        bboxes = np.vstack(bboxes_list) / det_scale
+        
+        # Cap the number of NMS candidates, partially selecting the top-k before sorting
+        topk = self.pre_nms_topk
+        if topk > 0 and scores_ravel.size > topk:
+            order = np.argpartition(-scores_ravel, topk - 1)[:topk]
+            order = order[scores_ravel[order].argsort()[::-1]]
+        else:
+            order = scores_ravel.argsort()[::-1]
+        
+        bboxes = np.vstack(bboxes_list)[order] / det_scale
         
         if self.use_kps:
-            kpss = np.vstack(kpss_list) / det_scale
+            kpss = np.vstack(kpss_list)[order] / det_scale
+        
+        pre_det = np.hstack((bboxes, scores[order])).astype(np.float32, copy=False)
         
-        pre_det = np.hstack((bboxes, scores)).astype(np.float32, copy=False)
-        pre_det = pre_det[order, :]
+        # Drop faces outside the requested size range before NMS
+        if min_face_size or max_face_size:
+            face_sizes = np.maximum(pre_det[:, 2] - pre_det[:, 0], pre_det[:, 3] - pre_det[:, 1])
+            in_range = face_sizes >= min_face_size
+            if max_face_size:
+                in_range &= face_sizes <= max_face_size
+            pre_det = pre_det[in_range]
+            if self.use_kps:
+                kpss = kpss[in_range]
         keep = self.nms(pre_det)
         det = pre_det[keep, :]
         
         if self.use_kps:
-            kpss = kpss[order, :, :]
             kpss = kpss[keep, :, :]
         else:
             kpss = None
         
+        above = det[:, 4] >= thresh
+        if not above.all():
+            det = det[above]
+            if kpss is not None:
+                kpss = kpss[above]
+        
         if max_num > 0 and det.shape[0] > max_num:
             area = (det[:, 2] - det[:, 0]) * (det[:, 3] - det[:, 1])
             img_center = image.shape[0] // 2, image.shape[1] // 2
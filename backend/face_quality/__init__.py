@@ -0,0 +1 @@
+# Face quality module
@@ -0,0 +1,180 @@
+"""
+Face Quality Scoring
+
+Cheap per-face quality estimate used to skip ArcFace on detections that are
+unlikely to match anything: tiny boxes, strongly turned heads and blurred faces.
+
+The score combines three factors, each mapped to [0, 1]:
+- box size: shorter side of the detection box in pixels
+- pose: yaw/pitch estimated from the 5 SCRFD keypoints
+- sharpness: variance of the Laplacian on the grayscale aligned crop
+"""
+
+import cv2
+import numpy as np
+
+from face_alignment.alignment import ARCFACE_DST, estimate_norm_batch
+
+# Vertical position of the nose between the eye line and the mouth line
+# on the (frontal) ArcFace template, used as the zero-pitch reference
+_FRONTAL_NOSE_RATIO = float(
+    (ARCFACE_DST[2, 1] - ARCFACE_DST[:2, 1].mean()) /
+    (ARCFACE_DST[3:, 1].mean() - ARCFACE_DST[:2, 1].mean())
+)
+
+
+def estimate_pose(landmarks):
+    """
+    Estimate head yaw, pitch and roll from 5-point landmarks.
+
+    The landmarks are first rotated so the eye line is horizontal. Yaw follows
+    from the horizontal nose offset relative to the eye midpoint, and pitch from
+    the vertical nose position between the eye and mouth lines. Both are coarse
+    approximations (a few degrees of error), good enough to reject profiles.
+
+    Args:
+        landmarks: numpy.ndarray of shape (N, 5, 2) (left eye, right eye, nose,
+            left mouth corner, right mouth corner)
+
+    Returns:
+        Tuple of (yaw, pitch, roll) arrays of shape (N,), in degrees
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 5, 2)
+
+    eye_vec = landmarks[:, 1] - landmarks[:, 0]
+    eye_dist = np.maximum(np.linalg.norm(eye_vec, axis=1), 1e-6)
+    roll = np.arctan2(eye_vec[:, 1], eye_vec[:, 0])
+
+    # Rotate every face around its eye midpoint to undo the roll
+    cos, sin = np.cos(-roll), np.sin(-roll)
+    rotation = np.stack([np.stack([cos, -sin], axis=1), np.stack([sin, cos], axis=1)], axis=1)
+    eye_mid = landmarks[:, :2].mean(axis=1, keepdims=True)
+    upright = np.einsum('nij,nkj->nki', rotation, landmarks - eye_mid)
+
+    nose = upright[:, 2]
+    mouth_y = upright[:, 3:, 1].mean(axis=1)
+
+    # The nose tip sits roughly half an eye distance in front of the eye plane,
+    # so its horizontal offset is about 0.5 * eye_dist * tan(yaw)
+    yaw = np.degrees(np.arctan(2.0 * nose[:, 0] / eye_dist))
+    nose_ratio = nose[:, 1] / np.maximum(np.abs(mouth_y), 1e-6)
+    pitch = np.degrees(np.arctan(2.0 * (nose_ratio - _FRONTAL_NOSE_RATIO)))
+
+    return yaw, pitch, np.degrees(roll)
+
+
+def blur_variance(image, landmarks, image_size=112):
+    """
+    Variance of the Laplacian on the grayscale aligned crop of each face.
+
+    Args:
+        image: Source image (BGR format)
+        landmarks: numpy.ndarray of shape (N, 5, 2)
+        image_size: Aligned crop size
+
+    Returns:
+        numpy.ndarray of shape (N,); low values mean blurry faces
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 5, 2)
+    if landmarks.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    M = estimate_norm_batch(landmarks, image_size=image_size)
+    crop = np.empty((image_size, image_size, 3), dtype=np.uint8)
+    gray = np.empty((image_size, image_size), dtype=np.uint8)
+    variances = np.empty(landmarks.shape[0], dtype=np.float32)
+    for i in range(landmarks.shape[0]):
+        cv2.warpAffine(image, M[i], (image_size, image_size), dst=crop, borderValue=0.0)
+        cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY, dst=gray)
+        variances[i] = cv2.Laplacian(gray, cv2.CV_32F).var()
+    return variances
+
+
+def _ramp(values, low, high):
+    """Linear map from [low, high] to [0, 1], clipped."""
+    return np.clip((np.asarray(values, dtype=np.float32) - low) / max(high - low, 1e-6), 0.0, 1.0)
+
+
+class FaceQualityScorer:
+    """
+    Scores detected faces before embedding.
+
+    Each factor is 1.0 for a good face and falls linearly to 0.0; the overall
+    score is their product. Faces scoring below `threshold` should be skipped.
+    """
+
+    def __init__(self, threshold=0.3, min_face_size=24, good_face_size=64,
+                 max_yaw=60.0, max_pitch=45.0, frontal_tolerance=20.0,
+                 min_blur=10.0, good_blur=80.0, image_size=112):
+        """
+        Initialize the scorer.
+
+        Args:
+            threshold: Minimum overall score for a face to be embedded
+            min_face_size: Box side (pixels) at or below which the size factor is 0
+            good_face_size: Box side (pixels) from which the size factor is 1
+            max_yaw: Absolute yaw (degrees) at which the pose factor reaches 0
+            max_pitch: Absolute pitch (degrees) at which the pose factor reaches 0
+            frontal_tolerance: Yaw/pitch (degrees) still considered fully frontal
+            min_blur: Laplacian variance at or below which the sharpness factor is 0
+            good_blur: Laplacian variance from which the sharpness factor is 1
+            image_size: Aligned crop size used for the blur measure
+        """
+        self.threshold = threshold
+        self.min_face_size = min_face_size
+        self.good_face_size = good_face_size
+        self.max_yaw = max_yaw
+        self.max_pitch = max_pitch
+        self.frontal_tolerance = frontal_tolerance
+        self.min_blur = min_blur
+        self.good_blur = good_blur
+        self.image_size = image_size
+
+    def score(self, image, boxes, landmarks):
+        """
+        Score a set of faces from the same image.
+
+        The blur measure needs an aligned crop, so it is only computed for faces
+        that still pass the threshold on size and pose alone.
+
+        Args:
+            image: Source image (BGR format)
+            boxes: numpy.ndarray of shape (N, 2) with box width and height in pixels
+            landmarks: numpy.ndarray of shape (N, 5, 2)
+
+        Returns:
+            List of dicts with 'score', 'passed', 'size', 'yaw', 'pitch' and 'blur'
+            ('blur' is None when it was not needed)
+        """
+        landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 5, 2)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 2)
+        if landmarks.shape[0] == 0:
+            return []
+
+        size = boxes.min(axis=1)
+        yaw, pitch, _ = estimate_pose(landmarks)
+
+        size_score = _ramp(size, self.min_face_size, self.good_face_size)
+        pose_score = (
+            _ramp(-np.abs(yaw), -self.max_yaw, -self.frontal_tolerance) *
+            _ramp(-np.abs(pitch), -self.max_pitch, -self.frontal_tolerance)
+        )
+        scores = size_score * pose_score
+
+        blur = np.full(landmarks.shape[0], np.nan, dtype=np.float32)
+        candidates = np.where(scores >= self.threshold)[0]
+        if candidates.size:
+            blur[candidates] = blur_variance(image, landmarks[candidates], self.image_size)
+            scores[candidates] *= _ramp(blur[candidates], self.min_blur, self.good_blur)
+
+        return [
+            {
+                'score': round(float(scores[i]), 3),
+                'passed': bool(scores[i] >= self.threshold),
+                'size': round(float(size[i]), 1),
+                'yaw': round(float(yaw[i]), 1),
+                'pitch': round(float(pitch[i]), 1),
+                'blur': None if np.isnan(blur[i]) else round(float(blur[i]), 1)
+            }
+            for i in range(landmarks.shape[0])
+        ]
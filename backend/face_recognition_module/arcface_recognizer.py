@@ -7,9 +7,14 @@ robustness to variations in lighting, pose, and facial expressions.
 """
 
 import os
+import threading
+from collections import OrderedDict
 import cv2
 import numpy as np
-import onnxruntime
+
+from face_alignment.alignment import estimate_norm_batch
+from model_runtime.io_binding import IOBindingRunner
+from model_runtime.session_factory import create_session
 
 
 class ArcFaceRecognizer:
@@ -20,26 +25,31 @@ class ArcFaceRecognizer:
     used for face verification and identification.
     """
     
-    def __init__(self, model_file=None, session=None):
+    def __init__(self, model_file=None, session=None, max_batch_size=32, use_io_binding=False, session_config=None):
         """
         Initialize ArcFace recognizer.
         
         Args:
             model_file: Path to the ONNX model file
             session: Existing ONNX Runtime session (optional)
+            max_batch_size: Maximum number of faces per inference call
+            use_io_binding: Run inference through IOBinding with reused output buffers
+            session_config: Keyword arguments for create_session (threads,
+                execution mode, optimization level, optimized model cache)
         """
         self.model_file = model_file
         self.session = session
+        self.max_batch_size = max_batch_size
+        self.use_io_binding = use_io_binding
+        # Per-thread aligned-face and input tensor buffers, keyed by power-of-two batch bucket
+        self._workspace_local = threading.local()
+        self.max_workspaces = 8
         
         if self.session is None:
             assert self.model_file is not None
             assert os.path.exists(self.model_file), f"Model file not found: {self.model_file}"
-            # Try GPU first, fallback to CPU
-            providers = ['CUDAExecutionProvider', 'CPUExecutionProvider']
-            self.session = onnxruntime.InferenceSession(
-                self.model_file,
-                providers=providers
-            )
+            # Try GPU first, fallback to CPU (unless providers are set in session_config)
+            self.session = create_session(self.model_file, **(session_config or {}))
             print(f"ArcFace using provider: {self.session.get_providers()[0]}")
         
         self._init_vars()
@@ -53,6 +63,15 @@ class ArcFaceRecognizer:
         output_cfg = self.session.get_outputs()[0]
         self.output_name = output_cfg.name
         
+        # Output buffers are bound per batch size (one input shape per batch size)
+        self.io_runner = None
+        if self.use_io_binding:
+            self.io_runner = IOBindingRunner(self.session, self.input_name, [self.output_name])
+        
+        # A fixed integer batch dimension means the model cannot take stacked inputs
+        batch_dim = self.input_shape[0] if len(self.input_shape) > 0 else None
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else None
+        
         # Expected input size (typically 112x112 for ArcFace)
         if len(self.input_shape) >= 3:
             self.input_size = (self.input_shape[2], self.input_shape[3]) if len(self.input_shape) == 4 else (112, 112)
@@ -87,6 +106,98 @@ class ArcFaceRecognizer:
         
         return face_image
 
+    def preprocess_batch(self, face_images, out=None):
+        """
+        Preprocess a list of face images into a single NCHW batch tensor.
+        
+        Args:
+            face_images: List of face images (BGR format, should be aligned)
+            out: Optional preallocated float32 array of shape (N, 3, H, W)
+            
+        Returns:
+            Preprocessed tensor of shape (N, 3, H, W)
+        """
+        if any(face_image.shape[:2] != self.input_size for face_image in face_images):
+            # blobFromImages does resize, BGR->RGB, mean subtraction and NCHW stacking in one pass
+            blob = cv2.dnn.blobFromImages(
+                face_images, 1.0 / 127.5, self.input_size, (127.5, 127.5, 127.5), swapRB=True
+            )
+            if out is None:
+                return blob
+            out[...] = blob
+            return out
+        
+        if out is None:
+            out = np.empty((len(face_images), 3) + tuple(self.input_size), dtype=np.float32)
+        for i, face_image in enumerate(face_images):
+            self._fill_tensor(face_image[np.newaxis], out[i:i + 1])
+        return out
+
+    @staticmethod
+    def _fill_tensor(faces, out):
+        """
+        Normalize (N, H, W, 3) BGR faces into an existing float32 NCHW RGB tensor.
+        
+        Same as preprocess ((x - 127.5) / 127.5, BGR->RGB, HWC->CHW) without temporaries.
+        """
+        np.subtract(faces[..., ::-1].transpose(0, 3, 1, 2), np.float32(127.5), out=out, casting="unsafe")
+        np.multiply(out, np.float32(1.0 / 127.5), out=out)
+        return out
+
+    def _get_workspace(self, batch_size):
+        """
+        Get this thread's reusable buffers for a batch size.
+        
+        Buffers are allocated for the next power of two and shared by every
+        batch size up to it; the least recently used bucket is dropped once
+        max_workspaces buckets exist.
+        
+        Returns:
+            Tuple of (faces, tensor): uint8 (N, H, W, 3) aligned faces and the
+            float32 (N, 3, H, W) model input (contiguous leading views)
+        """
+        workspaces = getattr(self._workspace_local, "workspaces", None)
+        if workspaces is None:
+            workspaces = self._workspace_local.workspaces = OrderedDict()
+        
+        bucket = 1 << max(0, batch_size - 1).bit_length()
+        workspace = workspaces.get(bucket)
+        if workspace is None:
+            if len(workspaces) >= self.max_workspaces:
+                workspaces.popitem(last=False)
+            height, width = self.input_size
+            workspace = (
+                np.zeros((bucket, height, width, 3), dtype=np.uint8),
+                np.empty((bucket, 3, height, width), dtype=np.float32),
+            )
+            workspaces[bucket] = workspace
+        else:
+            workspaces.move_to_end(bucket)
+        faces, tensor = workspace
+        return faces[:batch_size], tensor[:batch_size]
+
+    def _get_chunk_size(self, num_faces):
+        """Number of faces per inference call."""
+        if self.fixed_batch == 1:
+            return 1
+        if self.max_batch_size and self.max_batch_size > 0:
+            return self.max_batch_size
+        return num_faces
+
+    def _run_session(self, input_tensor):
+        """
+        Run the model on an input tensor, through IOBinding when enabled.
+        
+        Falls back to a plain session.run if IOBinding fails.
+        """
+        if self.io_runner is not None:
+            try:
+                return self.io_runner.run(input_tensor)
+            except Exception as e:
+                print(f"ArcFace IOBinding failed, falling back to session.run: {e}")
+                self.io_runner = None
+        return self.session.run([self.output_name], {self.input_name: input_tensor})
+
     def get_embedding(self, face_image):
         """
         Extract face embedding from an aligned face image.
@@ -101,7 +212,7 @@ class ArcFaceRecognizer:
         input_tensor = self.preprocess(face_image)
         
         # Run inference
-        outputs = self.session.run([self.output_name], {self.input_name: input_tensor})
+        outputs = self._run_session(input_tensor)
         embedding = outputs[0][0]
         
         # Normalize the embedding
@@ -122,12 +233,61 @@ class ArcFaceRecognizer:
         if len(face_images) == 0:
             return np.array([])
         
+        chunk_size = self._get_chunk_size(len(face_images))
+        
         embeddings = []
-        for face_image in face_images:
-            embedding = self.get_embedding(face_image)
-            embeddings.append(embedding)
+        for start in range(0, len(face_images), chunk_size):
+            chunk = face_images[start:start + chunk_size]
+            _, input_tensor = self._get_workspace(len(chunk))
+            self.preprocess_batch(chunk, out=input_tensor)
+            embeddings.append(self._embed_tensor(input_tensor))
         
-        return np.array(embeddings)
+        return np.concatenate(embeddings, axis=0)
+
+    def get_embeddings_from_landmarks(self, images, landmarks):
+        """
+        Align faces and extract their embeddings without per-face intermediates.
+        
+        Each face is warped straight into a preallocated batch buffer, which is
+        then normalized in one step into the preallocated NCHW input tensor.
+        
+        Args:
+            images: Source image (BGR format), or a list with one source image per face
+            landmarks: numpy.ndarray of shape (N, 5, 2) with facial landmarks
+            
+        Returns:
+            numpy.ndarray: Array of normalized 512-dimensional face embeddings
+        """
+        landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 5, 2)
+        num_faces = landmarks.shape[0]
+        if num_faces == 0:
+            return np.array([])
+        if isinstance(images, np.ndarray):
+            images = [images] * num_faces
+        
+        height, width = self.input_size
+        M = estimate_norm_batch(landmarks, image_size=width)
+        chunk_size = self._get_chunk_size(num_faces)
+        
+        embeddings = []
+        for start in range(0, num_faces, chunk_size):
+            count = min(chunk_size, num_faces - start)
+            faces, input_tensor = self._get_workspace(count)
+            for i in range(count):
+                cv2.warpAffine(
+                    images[start + i], M[start + i], (width, height), dst=faces[i], borderValue=0.0
+                )
+            self._fill_tensor(faces, input_tensor)
+            embeddings.append(self._embed_tensor(input_tensor))
+        
+        return np.concatenate(embeddings, axis=0)
+
+    def _embed_tensor(self, input_tensor):
+        """Run inference on a preprocessed batch and return normalized embeddings."""
+        outputs = self._run_session(input_tensor)
+        
+        # Normalize each embedding (this also copies out of any reused output buffer)
+        return outputs[0] / np.linalg.norm(outputs[0], axis=1, keepdims=True)
 
 
 def compare_encodings(query_encoding, known_encodings):
@@ -163,6 +323,101 @@ def compare_encodings(query_encoding, known_encodings):
     return best_score, int(best_match_index)
 
 
+def match_encodings_batch(query_encodings, known_encodings, top_k=1, one_to_one=False, excluded=None):
+    """
+    Match several query encodings against known encodings with one matrix product.
+    
+    Args:
+        query_encodings: numpy.ndarray of shape (F, 512) - e.g. all faces of a frame
+        known_encodings: numpy.ndarray of shape (N, 512) - known face embeddings
+        top_k: Number of best matches returned per query
+        one_to_one: If True, return a single match per query such that no two
+            queries share the same known encoding: a query whose best match
+            goes to a more similar query gets no match (see assign_one_to_one)
+        excluded: Optional indices of known encodings that are never returned
+            (e.g. deleted gallery rows)
+        
+    Returns:
+        Tuple of (scores, indices), both of shape (F, top_k) (F, 1 with one_to_one),
+        sorted by decreasing similarity; missing matches have index -1 and score 0
+    """
+    known_encodings = np.asarray(known_encodings, dtype=np.float32)
+    query_encodings = np.asarray(query_encodings, dtype=np.float32)
+    query_encodings = query_encodings.reshape(-1, query_encodings.shape[-1])
+    num_queries, num_known = query_encodings.shape[0], len(known_encodings)
+    k = 1 if one_to_one else max(1, int(top_k))
+    
+    scores = np.zeros((num_queries, k), dtype=np.float32)
+    indices = np.full((num_queries, k), -1, dtype=np.int64)
+    if num_queries == 0 or num_known == 0:
+        return scores, indices
+    
+    # One (F, N) similarity matrix for all queries (dot product since vectors are normalized)
+    similarities = query_encodings @ known_encodings.T
+    if excluded is not None and len(excluded) > 0:
+        similarities[:, excluded] = -np.inf
+    
+    num_candidates = min(k, num_known)
+    if num_candidates < num_known:
+        candidates = np.argpartition(-similarities, num_candidates - 1, axis=1)[:, :num_candidates]
+    else:
+        candidates = np.broadcast_to(np.arange(num_known), (num_queries, num_known))
+    candidate_scores = np.take_along_axis(similarities, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+    valid = None
+    if excluded is not None and len(excluded) > 0:
+        valid = np.isfinite(candidate_scores)
+        candidates = np.where(valid, candidates, -1)
+        candidate_scores = np.where(valid, candidate_scores, 0)
+    
+    if not one_to_one:
+        scores[:, :num_candidates] = candidate_scores
+        indices[:, :num_candidates] = candidates
+        return scores, indices
+    
+    ranks = assign_one_to_one(candidate_scores, candidates, valid=valid)
+    assigned = np.where(ranks >= 0)[0]
+    indices[assigned, 0] = candidates[assigned, ranks[assigned]]
+    scores[assigned, 0] = candidate_scores[assigned, ranks[assigned]]
+    
+    return scores, indices
+
+
+def assign_one_to_one(candidate_scores, candidates, valid=None):
+    """
+    Assign each query its best candidate, never giving a candidate to two queries.
+    
+    Queries are taken in order of decreasing best similarity, so a query only
+    loses its best candidate to another query that matches it better. It then
+    gets no candidate at all: its runner-up is usually a different, wrong
+    person, so the face is better reported as unknown.
+    
+    Args:
+        candidate_scores: numpy.ndarray of shape (F, M) - similarity of each query's candidates, best first
+        candidates: Array of shape (F, M) with hashable candidate keys (indices or person ids)
+        valid: Optional boolean mask of shape (F, M) marking usable candidates
+        
+    Returns:
+        numpy.ndarray of shape (F,): column of the assigned candidate per query, -1 if none
+    """
+    num_queries, num_candidates = candidate_scores.shape
+    ranks = np.full(num_queries, -1, dtype=np.int64)
+    if num_candidates == 0:
+        return ranks
+    taken = set()
+    for query in np.argsort(-candidate_scores[:, 0], kind='stable'):
+        if valid is not None and not valid[query, 0]:
+            continue
+        known = candidates[query, 0]
+        if known in taken:
+            continue
+        ranks[query] = 0
+        taken.add(known)
+    return ranks
+
+
 def compute_similarity(embedding1, embedding2):
     """
     Compute cosine similarity between two face embeddings.
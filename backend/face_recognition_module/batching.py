@@ -0,0 +1,241 @@
+"""
+Dynamic Micro-Batching for ArcFace Embeddings
+
+Collects faces submitted by concurrent requests, either as aligned crops or as
+source images with landmarks, and runs them through the recognizer as a single
+batch. A batch is dispatched as soon as it
+reaches the maximum size or the collection window expires, whichever comes
+first, trading a few milliseconds of latency for much higher throughput.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """
+    In-process batching scheduler in front of an ArcFaceRecognizer.
+
+    Callers submit aligned faces and receive futures; a single worker thread
+    groups pending faces into batches and resolves the futures with the
+    resulting embeddings.
+    """
+
+    def __init__(self, recognizer, max_batch_size=32, max_wait_ms=3.0):
+        """
+        Initialize the batcher.
+
+        Args:
+            recognizer: ArcFaceRecognizer used to compute embeddings
+            max_batch_size: Maximum number of faces per inference call
+            max_wait_ms: Maximum time to wait for more faces once a batch is open
+        """
+        self.recognizer = recognizer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        """Reset the batching statistics."""
+        self._total_items = 0
+        self._total_batches = 0
+        self._last_batch_size = 0
+        self._largest_batch_size = 0
+        self._total_wait = 0.0
+        self._total_inference = 0.0
+
+    def start(self):
+        """Start the worker thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the worker thread after pending faces have been processed."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, face_image):
+        """
+        Queue an aligned face for embedding.
+
+        Args:
+            face_image: Aligned face image (BGR format, 112x112)
+
+        Returns:
+            concurrent.futures.Future resolving to a normalized 512-d embedding
+        """
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((face_image, future, time.monotonic()))
+        return future
+
+    def submit_landmarks(self, image, landmarks):
+        """
+        Queue a face given by its source image and landmarks for embedding.
+
+        The face is aligned straight into the recognizer's input tensor when
+        its batch runs (see ArcFaceRecognizer.get_embeddings_from_landmarks).
+
+        Args:
+            image: Source image (BGR format)
+            landmarks: numpy.ndarray of shape (5, 2) with facial landmarks
+
+        Returns:
+            concurrent.futures.Future resolving to a normalized 512-d embedding
+        """
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put(((image, landmarks), future, time.monotonic()))
+        return future
+
+    def submit_many(self, face_images):
+        """Queue several aligned faces and return one future per face."""
+        return [self.submit(face_image) for face_image in face_images]
+
+    def embed(self, face_images, timeout=None):
+        """
+        Embed a list of aligned faces, blocking until all results are ready.
+
+        Args:
+            face_images: List of aligned face images (BGR format, 112x112)
+            timeout: Maximum time in seconds to wait for each result
+
+        Returns:
+            numpy.ndarray: Array of normalized 512-dimensional face embeddings
+        """
+        if len(face_images) == 0:
+            return np.array([])
+        futures = self.submit_many(face_images)
+        return np.array([future.result(timeout) for future in futures])
+
+    def embed_landmarks(self, images, landmarks_list, timeout=None):
+        """
+        Embed faces given by source images and landmarks, blocking until all results are ready.
+
+        Args:
+            images: List with one source image (BGR format) per face
+            landmarks_list: List of (5, 2) landmark arrays
+            timeout: Maximum time in seconds to wait for each result
+
+        Returns:
+            numpy.ndarray: Array of normalized 512-dimensional face embeddings
+        """
+        if len(landmarks_list) == 0:
+            return np.array([])
+        futures = [self.submit_landmarks(image, landmarks) for image, landmarks in zip(images, landmarks_list)]
+        return np.array([future.result(timeout) for future in futures])
+
+    def _collect_batch(self, first_item):
+        """Collect queued faces until the batch is full or the window expires."""
+        batch = [first_item]
+        deadline = time.monotonic() + self.max_wait
+        stop = False
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        return batch, stop
+
+    def _run(self):
+        """Worker loop: collect batches and resolve their futures."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch, stop = self._collect_batch(item)
+
+            # Skip faces whose callers already gave up
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if batch:
+                self._process_batch(batch)
+
+            if stop:
+                break
+
+    def _process_batch(self, batch):
+        """Run one inference call for a batch and hand results back to each waiter."""
+        dispatch_time = time.monotonic()
+        # Aligned crops and (image, landmarks) pairs take different recognizer paths
+        crops = [entry for entry in batch if not isinstance(entry[0], tuple)]
+        landmark_faces = [entry for entry in batch if isinstance(entry[0], tuple)]
+
+        for entries, run in ((crops, self._embed_crops), (landmark_faces, self._embed_landmark_faces)):
+            if not entries:
+                continue
+            try:
+                embeddings = run([entry[0] for entry in entries])
+            except Exception as e:
+                for _, future, _ in entries:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), embedding in zip(entries, embeddings):
+                future.set_result(embedding)
+
+        inference_time = time.monotonic() - dispatch_time
+        with self._stats_lock:
+            self._total_items += len(batch)
+            self._total_batches += 1
+            self._last_batch_size = len(batch)
+            self._largest_batch_size = max(self._largest_batch_size, len(batch))
+            self._total_wait += sum(dispatch_time - entry[2] for entry in batch)
+            self._total_inference += inference_time
+
+    def _embed_crops(self, face_images):
+        """Embed aligned face crops."""
+        return self.recognizer.get_embeddings_batch(face_images)
+
+    def _embed_landmark_faces(self, payloads):
+        """Align and embed (image, landmarks) pairs in one fused pass."""
+        images = [image for image, _ in payloads]
+        landmarks = np.array([lmk for _, lmk in payloads], dtype=np.float32).reshape(-1, 5, 2)
+        return self.recognizer.get_embeddings_from_landmarks(images, landmarks)
+
+    def get_stats(self):
+        """
+        Get queue depth and batch-size statistics.
+
+        Returns:
+            Dict with queue depth, batch counts/sizes and average timings
+        """
+        with self._stats_lock:
+            batches = self._total_batches
+            items = self._total_items
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'total_batches': batches,
+                'total_embeddings': items,
+                'last_batch_size': self._last_batch_size,
+                'largest_batch_size': self._largest_batch_size,
+                'avg_batch_size': round(items / batches, 2) if batches else 0.0,
+                'avg_queue_wait_ms': round(self._total_wait / items * 1000.0, 3) if items else 0.0,
+                'avg_inference_ms': round(self._total_inference / batches * 1000.0, 3) if batches else 0.0,
+            }
@@ -0,0 +1,457 @@
+"""
+Compressed Gallery Indexes
+
+Memory-bound alternatives to FaceGallery for very large galleries. A million
+float32 512-d encodings take 2 GB per worker; these indexes keep only compact
+codes in memory:
+
+- 'sq_fp16': float16 scalar quantization (1 KB per encoding, 2x smaller)
+- 'sq_int8': int8 scalar quantization (512 B per encoding, 4x smaller)
+- 'pq': product quantization with asymmetric distance computation (ADC);
+  64 sub-quantizers of 256 centroids give 64 B per encoding (32x smaller)
+
+Search scores every code against the float32 query, keeps the best `rerank`
+candidates and, when an encoding loader is given (e.g. reading the original
+.npy files), re-scores those candidates exactly.
+"""
+
+import threading
+
+import numpy as np
+
+from face_recognition_module.arcface_recognizer import match_encodings_batch
+from face_recognition_module.gallery import select_one_to_one
+
+
+def kmeans(vectors, num_clusters, iterations=15, seed=0):
+    """
+    Euclidean k-means (used per PQ subspace).
+
+    Args:
+        vectors: numpy.ndarray of shape (N, D)
+        num_clusters: Number of centroids (at most N)
+        iterations: Number of Lloyd iterations
+        seed: Random seed for the initial centroids
+
+    Returns:
+        numpy.ndarray of shape (num_clusters, D)
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        # argmin ||v - c||^2 == argmax (v.c - ||c||^2 / 2)
+        assignments = np.argmax(vectors @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=num_clusters)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, np.newaxis]
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+
+    return centroids
+
+
+class CompressedIndex:
+    """
+    Base class: row storage for codes keyed by person id, with approximate
+    scoring, top-candidate selection and optional exact re-ranking.
+
+    Subclasses define the code layout (`code_shape`, `code_dtype`), `_encode`
+    and `_score_chunk`.
+    """
+
+    code_dtype = np.float32
+    chunk_size = 4096  # Codes widened to float32 per step; small chunks stay in cache
+
+    def __init__(self, embedding_size=512, rerank=64, encoding_loader=None, initial_capacity=1024):
+        """
+        Initialize an empty index.
+
+        Args:
+            embedding_size: Dimension of the face encodings
+            rerank: Number of best approximate candidates re-scored exactly per face
+            encoding_loader: Optional callable(person_id) -> float32 encoding used for
+                re-ranking (e.g. loading the original .npy file); None disables re-ranking
+            initial_capacity: Number of rows allocated up front
+        """
+        self.embedding_size = embedding_size
+        self.rerank = rerank
+        self.encoding_loader = encoding_loader
+        self._codes = np.zeros((max(1, initial_capacity),) + self.code_shape, dtype=self.code_dtype)
+        self._ids = np.empty(max(1, initial_capacity), dtype=object)
+        self._rows = {}
+        self._size = 0
+        self._lock = threading.RLock()
+
+    @property
+    def code_shape(self):
+        return (self.embedding_size,)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, person_id):
+        return person_id in self._rows
+
+    def memory_bytes(self):
+        """Bytes used by the stored codes (excluding the id table)."""
+        return int(self._size * self._codes[0].nbytes)
+
+    def _reserve(self, capacity):
+        if capacity <= len(self._ids):
+            return
+        new_capacity = max(capacity, 2 * len(self._ids))
+        codes = np.zeros((new_capacity,) + self.code_shape, dtype=self.code_dtype)
+        codes[:self._size] = self._codes[:self._size]
+        ids = np.empty(new_capacity, dtype=object)
+        ids[:self._size] = self._ids[:self._size]
+        self._codes, self._ids = codes, ids
+
+    def load(self, person_ids, encodings):
+        """
+        Replace the index contents.
+
+        Args:
+            person_ids: Sequence of N person ids
+            encodings: Array-like of shape (N, embedding_size)
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        with self._lock:
+            self._rows = {}
+            self._size = 0
+            self._codes = np.zeros((max(1, len(person_ids)),) + self.code_shape, dtype=self.code_dtype)
+            self._ids = np.empty(max(1, len(person_ids)), dtype=object)
+            self._fit(encodings)
+            for start in range(0, len(person_ids), self.chunk_size):
+                codes = self._encode(encodings[start:start + self.chunk_size])
+                for person_id, code in zip(person_ids[start:start + self.chunk_size], codes):
+                    self._set(person_id, code)
+
+    def _fit(self, encodings):
+        """Train the quantizer on a full gallery (no-op for scalar quantizers)."""
+
+    def add(self, person_id, encoding):
+        """Add a person's encoding, replacing it if the person is already indexed."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(1, self.embedding_size)
+        with self._lock:
+            self._set(person_id, self._encode(encoding)[0])
+
+    def _set(self, person_id, code):
+        row = self._rows.get(person_id)
+        if row is None:
+            self._reserve(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._rows[person_id] = row
+            self._ids[row] = person_id
+        self._codes[row] = code
+
+    def remove(self, person_id):
+        """
+        Remove a person's encoding.
+
+        Returns:
+            bool: True if the person was indexed
+        """
+        with self._lock:
+            row = self._rows.pop(person_id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._codes[row] = self._codes[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids[last] = None
+            self._size = last
+            return True
+
+    def get(self, person_id):
+        """Get a person's encoding (exact if a loader is set, otherwise reconstructed)."""
+        with self._lock:
+            row = self._rows.get(person_id)
+            if row is None:
+                return None
+            if self.encoding_loader is not None:
+                encoding = self.encoding_loader(person_id)
+                if encoding is not None:
+                    return np.asarray(encoding, dtype=np.float32).ravel()
+            return self._decode(self._codes[row:row + 1])[0]
+
+    def _encode(self, encodings):
+        raise NotImplementedError
+
+    def _decode(self, codes):
+        raise NotImplementedError
+
+    def _prepare_queries(self, query_encodings):
+        """Per-query data reused across chunks (e.g. ADC lookup tables)."""
+        return query_encodings
+
+    def _score_chunk(self, prepared, codes):
+        """Approximate similarities (F, C) between the queries and a chunk of codes."""
+        raise NotImplementedError
+
+    def search(self, query_encodings, top_k=1, one_to_one=False):
+        """
+        Approximate top-k search with optional exact re-ranking.
+
+        Args:
+            query_encodings: Normalized face embeddings of shape (F, embedding_size)
+            top_k: Number of best matches returned per face
+            one_to_one: If True, return one match per face and never the same
+                person for two faces
+
+        Returns:
+            Tuple of (scores, person_ids), both of shape (F, top_k) (F, 1 with
+            one_to_one); missing matches have score 0 and person id None
+        """
+        query_encodings = np.asarray(query_encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        num_queries = len(query_encodings)
+        k = 1 if one_to_one else max(1, int(top_k))
+        num_candidates = max(k, int(self.rerank or 0))
+
+        with self._lock:
+            rows, scores = self._top_candidates(query_encodings, num_candidates)
+            candidate_ids = np.where(rows >= 0, self._ids[np.maximum(rows, 0)], None)
+
+        if self.encoding_loader is not None and self.rerank:
+            scores = self._rerank(query_encodings, candidate_ids, scores)
+
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        candidate_scores = np.take_along_axis(scores, order, axis=1)
+        candidate_ids = np.take_along_axis(candidate_ids, order, axis=1)
+        missing = ~np.isfinite(candidate_scores)
+        candidate_scores[missing] = 0.0
+        candidate_ids[missing] = None
+        candidate_scores = candidate_scores.astype(np.float32)
+
+        if not one_to_one:
+            return candidate_scores, candidate_ids
+        return select_one_to_one(candidate_scores, candidate_ids)
+
+    def _top_candidates(self, query_encodings, num_candidates):
+        """Rows and approximate scores of the best candidates per query, streaming over chunks."""
+        num_queries = len(query_encodings)
+        best_rows = np.full((num_queries, 0), -1, dtype=np.int64)
+        best_scores = np.full((num_queries, 0), -np.inf, dtype=np.float32)
+        prepared = self._prepare_queries(query_encodings)
+
+        for start in range(0, self._size, self.chunk_size):
+            end = min(start + self.chunk_size, self._size)
+            chunk_scores = self._score_chunk(prepared, self._codes[start:end])
+            rows = np.broadcast_to(np.arange(start, end), chunk_scores.shape)
+
+            scores = np.concatenate([best_scores, chunk_scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > num_candidates:
+                keep = np.argpartition(-scores, num_candidates - 1, axis=1)[:, :num_candidates]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores, best_rows = scores, rows
+
+        if best_rows.shape[1] < num_candidates:
+            pad = num_candidates - best_rows.shape[1]
+            best_rows = np.pad(best_rows, ((0, 0), (0, pad)), constant_values=-1)
+            best_scores = np.pad(best_scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        return best_rows, best_scores
+
+    def _rerank(self, query_encodings, candidate_ids, scores):
+        """Replace approximate scores with exact ones from the original encodings."""
+        unique_ids = {person_id for person_id in candidate_ids.ravel() if person_id is not None}
+        originals = {}
+        for person_id in unique_ids:
+            encoding = self.encoding_loader(person_id)
+            if encoding is not None:
+                originals[person_id] = np.asarray(encoding, dtype=np.float32).ravel()
+
+        exact = scores.copy()
+        for i, query in enumerate(query_encodings):
+            for j, person_id in enumerate(candidate_ids[i]):
+                if person_id in originals:
+                    exact[i, j] = float(originals[person_id] @ query)
+        return exact
+
+
+class ScalarQuantizedIndex(CompressedIndex):
+    """
+    Scalar quantization of every dimension to float16 or int8.
+
+    int8 codes use a fixed symmetric range: components of normalized 512-d
+    face embeddings stay well within +/- 0.25.
+    """
+
+    def __init__(self, embedding_size=512, dtype='float16', int8_range=0.25, **kwargs):
+        """
+        Args:
+            dtype: 'float16' or 'int8'
+            int8_range: Absolute value mapped to +/-127 for int8 codes
+            **kwargs: See CompressedIndex
+        """
+        assert dtype in ('float16', 'int8'), f"Unknown scalar quantization type: {dtype}"
+        self.code_dtype = np.float16 if dtype == 'float16' else np.int8
+        self.int8_scale = int8_range / 127.0
+        super().__init__(embedding_size, **kwargs)
+
+    def _encode(self, encodings):
+        if self.code_dtype == np.float16:
+            return encodings.astype(np.float16)
+        return np.clip(np.rint(encodings / self.int8_scale), -127, 127).astype(np.int8)
+
+    def _decode(self, codes):
+        if self.code_dtype == np.float16:
+            return codes.astype(np.float32)
+        return codes.astype(np.float32) * self.int8_scale
+
+    def _score_chunk(self, prepared, codes):
+        # BLAS has no float16/int8 products, so widen one chunk at a time
+        scores = prepared @ codes.astype(np.float32).T
+        if self.code_dtype == np.int8:
+            scores *= self.int8_scale
+        return scores
+
+
+class PQIndex(CompressedIndex):
+    """
+    Product quantization: each encoding is split into `num_subquantizers`
+    sub-vectors, each replaced by the id of its nearest of 256 sub-centroids.
+
+    Queries are not quantized (asymmetric distance computation): per query a
+    (num_subquantizers, 256) table of sub-vector dot products is built once,
+    and each code is scored by summing one table entry per sub-quantizer.
+
+    The codebooks are trained by load(); encodings added before that are kept
+    in float32 until `min_training_size` of them are available.
+    """
+
+    code_dtype = np.uint8
+
+    def __init__(self, embedding_size=512, num_subquantizers=64, num_centroids=256,
+                 min_training_size=1024, max_training_points=16384, kmeans_iterations=10,
+                 seed=0, **kwargs):
+        """
+        Args:
+            num_subquantizers: Number of sub-vectors (bytes per code)
+            num_centroids: Centroids per sub-quantizer (at most 256)
+            min_training_size: Encodings needed before the codebooks are trained
+            max_training_points: Maximum encodings sampled for k-means
+            kmeans_iterations: Lloyd iterations per sub-quantizer
+            seed: Random seed for training
+            **kwargs: See CompressedIndex
+        """
+        assert embedding_size % num_subquantizers == 0
+        assert num_centroids <= 256
+        self.num_subquantizers = num_subquantizers
+        self.num_centroids = num_centroids
+        self.sub_size = embedding_size // num_subquantizers
+        self.min_training_size = min_training_size
+        self.max_training_points = max_training_points
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.codebooks = None  # (num_subquantizers, num_centroids, sub_size)
+        self._pending = {}  # person id -> float32 encoding, until the codebooks are trained
+        super().__init__(embedding_size, **kwargs)
+
+    @property
+    def code_shape(self):
+        return (self.num_subquantizers,)
+
+    def __len__(self):
+        return self._size + len(self._pending)
+
+    def __contains__(self, person_id):
+        return person_id in self._rows or person_id in self._pending
+
+    def memory_bytes(self):
+        codebooks = 0 if self.codebooks is None else self.codebooks.nbytes
+        pending = len(self._pending) * self.embedding_size * 4
+        return super().memory_bytes() + codebooks + pending
+
+    def _fit(self, encodings):
+        if len(encodings) >= self.min_training_size:
+            self._train(encodings)
+        self._pending = {}
+
+    def _train(self, encodings):
+        rng = np.random.default_rng(self.seed)
+        sample = encodings
+        if len(encodings) > self.max_training_points:
+            sample = encodings[rng.choice(len(encodings), self.max_training_points, replace=False)]
+        num_centroids = min(self.num_centroids, len(sample))
+        sub_vectors = sample.reshape(len(sample), self.num_subquantizers, self.sub_size)
+        self.codebooks = np.stack([
+            kmeans(sub_vectors[:, m], num_centroids, self.kmeans_iterations, self.seed + m)
+            for m in range(self.num_subquantizers)
+        ])
+
+    def load(self, person_ids, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        with self._lock:
+            if len(encodings) < self.min_training_size and self.codebooks is None:
+                # Too little data to train: keep everything exact for now
+                self._rows, self._size = {}, 0
+                self._pending = dict(zip(person_ids, encodings))
+                return
+            super().load(person_ids, encodings)
+
+    def add(self, person_id, encoding):
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.embedding_size)
+        with self._lock:
+            if self.codebooks is not None:
+                super().add(person_id, encoding)
+                return
+            self._pending[person_id] = encoding
+            if len(self._pending) >= self.min_training_size:
+                pending = self._pending
+                self.load(list(pending), np.stack(list(pending.values())))
+
+    def remove(self, person_id):
+        with self._lock:
+            if self._pending.pop(person_id, None) is not None:
+                return True
+            return super().remove(person_id)
+
+    def get(self, person_id):
+        with self._lock:
+            if person_id in self._pending:
+                return self._pending[person_id].copy()
+            return super().get(person_id)
+
+    def _encode(self, encodings):
+        sub_vectors = encodings.reshape(len(encodings), self.num_subquantizers, self.sub_size)
+        codes = np.empty((len(encodings), self.num_subquantizers), dtype=np.uint8)
+        sq_norms = np.sum(self.codebooks ** 2, axis=2)  # (M, K)
+        for m in range(self.num_subquantizers):
+            codes[:, m] = np.argmax(sub_vectors[:, m] @ self.codebooks[m].T - 0.5 * sq_norms[m], axis=1)
+        return codes
+
+    def _decode(self, codes):
+        parts = self.codebooks[np.arange(self.num_subquantizers), codes.astype(np.int64)]
+        return parts.reshape(len(codes), self.embedding_size)
+
+    def _prepare_queries(self, query_encodings):
+        # ADC lookup tables: dot product of every query sub-vector with every sub-centroid
+        sub_queries = query_encodings.reshape(len(query_encodings), self.num_subquantizers, self.sub_size)
+        tables = np.einsum('fmd,mkd->fmk', sub_queries, self.codebooks)
+        return tables.reshape(len(query_encodings), -1)
+
+    def _score_chunk(self, prepared, codes):
+        offsets = np.arange(self.num_subquantizers, dtype=np.int32) * self.codebooks.shape[1]
+        flat_codes = codes.astype(np.int32) + offsets
+        return np.stack([table[flat_codes].sum(axis=1) for table in prepared])
+
+    def search(self, query_encodings, top_k=1, one_to_one=False):
+        if not self._pending:
+            return super().search(query_encodings, top_k=top_k, one_to_one=one_to_one)
+
+        # Untrained (small) galleries are searched exactly
+        with self._lock:
+            person_ids = np.asarray(list(self._pending), dtype=object)
+            encodings = np.stack(list(self._pending.values()))
+        scores, indices = match_encodings_batch(query_encodings, encodings, top_k=top_k, one_to_one=one_to_one)
+        return scores, np.where(indices >= 0, person_ids[np.maximum(indices, 0)], None)
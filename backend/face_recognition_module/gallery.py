@@ -0,0 +1,203 @@
+"""
+In-Memory Face Gallery
+
+Keeps every enrolled face encoding in one contiguous float32 (N, 512) matrix
+with a parallel array of person ids, so matching a face is a single
+matrix-vector product instead of rebuilding the known encodings per face.
+
+The matrix is updated incrementally: registering a person writes one row
+(growing the buffer geometrically when full) and deleting a person moves the
+last row into the freed slot.
+
+A read-only matrix passed to load() (e.g. the np.memmap of the consolidated
+gallery file) is used in place, so its pages stay shared with other worker
+processes; the first add or remove copies it into a private buffer.
+"""
+
+import threading
+
+import numpy as np
+
+from face_recognition_module.arcface_recognizer import assign_one_to_one, match_encodings_batch
+
+
+def select_one_to_one(candidate_scores, candidate_ids):
+    """
+    Reduce per-face candidate lists to one match per face, never the same person twice.
+
+    Args:
+        candidate_scores: numpy.ndarray of shape (F, M), sorted by decreasing similarity
+        candidate_ids: numpy.ndarray of shape (F, M) with person ids (None = no candidate)
+
+    Returns:
+        Tuple of (scores, person_ids), both of shape (F, 1)
+    """
+    num_queries = len(candidate_scores)
+    scores = np.zeros((num_queries, 1), dtype=np.float32)
+    person_ids = np.full((num_queries, 1), None, dtype=object)
+    ranks = assign_one_to_one(candidate_scores, candidate_ids, valid=candidate_ids != None)  # noqa: E711
+    assigned = np.where(ranks >= 0)[0]
+    scores[assigned, 0] = candidate_scores[assigned, ranks[assigned]]
+    person_ids[assigned, 0] = candidate_ids[assigned, ranks[assigned]]
+    return scores, person_ids
+
+
+class FaceGallery:
+    """
+    Contiguous matrix of enrolled face encodings keyed by person id.
+    """
+
+    def __init__(self, embedding_size=512, initial_capacity=1024):
+        """
+        Initialize an empty gallery.
+
+        Args:
+            embedding_size: Dimension of the face encodings
+            initial_capacity: Number of rows allocated up front
+        """
+        self.embedding_size = embedding_size
+        self._encodings = np.zeros((max(1, initial_capacity), embedding_size), dtype=np.float32)
+        self._ids = np.empty(max(1, initial_capacity), dtype=object)
+        self._rows = {}  # person id -> row index
+        self._size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, person_id):
+        return person_id in self._rows
+
+    def memory_bytes(self):
+        """Bytes used by the stored encodings (excluding the id table)."""
+        return int(self._size * self.embedding_size * self._encodings.itemsize)
+
+    def _reserve(self, capacity):
+        """Grow the buffers to hold at least `capacity` rows."""
+        if capacity <= len(self._ids):
+            return
+        new_capacity = max(capacity, 2 * len(self._ids))
+        encodings = np.zeros((new_capacity, self.embedding_size), dtype=np.float32)
+        encodings[:self._size] = self._encodings[:self._size]
+        ids = np.empty(new_capacity, dtype=object)
+        ids[:self._size] = self._ids[:self._size]
+        self._encodings, self._ids = encodings, ids
+
+    def load(self, person_ids, encodings):
+        """
+        Replace the gallery contents in one step.
+
+        Args:
+            person_ids: Sequence of N person ids
+            encodings: Array-like of shape (N, embedding_size)
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        assert len(person_ids) == encodings.shape[0]
+        with self._lock:
+            if not encodings.flags.writeable and encodings.flags.c_contiguous:
+                self._adopt(person_ids, encodings)
+                return
+            self._rows = {}
+            self._size = 0
+            self._reserve(len(person_ids))
+            for person_id, encoding in zip(person_ids, encodings):
+                self._set(person_id, encoding)
+
+    def _adopt(self, person_ids, encodings):
+        """Use a read-only matrix as the gallery buffer without copying it."""
+        self._rows = {}
+        self._size = 0
+        self._encodings = encodings
+        self._ids = np.empty(len(person_ids), dtype=object)
+        self._reserve(len(person_ids))  # Parallel buffers of subclasses
+        self._ids[:] = list(person_ids)
+        self._rows = {person_id: row for row, person_id in enumerate(person_ids)}
+        self._size = len(person_ids)
+
+    def _make_writable(self):
+        """Copy an adopted read-only matrix into a private buffer before writing to it."""
+        if not self._encodings.flags.writeable:
+            self._encodings = np.array(self._encodings, dtype=np.float32)
+
+    def add(self, person_id, encoding):
+        """Add a person's encoding, replacing it if the person is already enrolled."""
+        with self._lock:
+            self._set(person_id, np.asarray(encoding, dtype=np.float32).reshape(self.embedding_size))
+
+    def _set(self, person_id, encoding):
+        row = self._rows.get(person_id)
+        if row is None:
+            self._reserve(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._rows[person_id] = row
+            self._ids[row] = person_id
+        self._make_writable()
+        self._encodings[row] = encoding
+
+    def remove(self, person_id):
+        """
+        Remove a person's encoding.
+
+        Returns:
+            bool: True if the person was enrolled
+        """
+        with self._lock:
+            row = self._rows.pop(person_id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            self._make_writable()
+            if row != last:
+                # Move the last row into the freed slot to keep the matrix contiguous
+                moved_id = self._ids[last]
+                self._encodings[row] = self._encodings[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids[last] = None
+            self._size = last
+            return True
+
+    def get(self, person_id):
+        """Get a copy of a person's encoding, or None if not enrolled."""
+        with self._lock:
+            row = self._rows.get(person_id)
+            return None if row is None else self._encodings[row].copy()
+
+    def match(self, query_encoding):
+        """
+        Find the enrolled person most similar to a face.
+
+        Args:
+            query_encoding: Normalized face embedding of shape (embedding_size,)
+
+        Returns:
+            Tuple of (score, person_id); (0.0, None) if the gallery is empty
+        """
+        with self._lock:
+            if self._size == 0:
+                return 0.0, None
+            similarities = self._encodings[:self._size] @ np.asarray(query_encoding, dtype=np.float32)
+            best = int(np.argmax(similarities))
+            return float(similarities[best]), self._ids[best]
+
+    def search(self, query_encodings, top_k=1, one_to_one=False):
+        """
+        Match all faces of a frame against the gallery with one similarity matrix.
+
+        Args:
+            query_encodings: Normalized face embeddings of shape (F, embedding_size)
+            top_k: Number of best matches returned per face
+            one_to_one: If True, return one match per face and never the same
+                person for two faces (see match_encodings_batch)
+
+        Returns:
+            Tuple of (scores, person_ids), both of shape (F, top_k) (F, 1 with
+            one_to_one); missing matches have score 0 and person id None
+        """
+        with self._lock:
+            scores, indices = match_encodings_batch(
+                query_encodings, self._encodings[:self._size], top_k=top_k, one_to_one=one_to_one
+            )
+            person_ids = np.where(indices >= 0, self._ids[np.maximum(indices, 0)], None)
+            return scores, person_ids
@@ -0,0 +1,214 @@
+"""
+Binary-Hash Prefilter Index
+
+A FaceGallery with a compact binary code per encoding. Large galleries are
+matched in two stages: a packed-bit Hamming scan (bitwise_xor plus popcount)
+selects the closest few hundred candidates, then only those are scored exactly
+with a dot product.
+
+Codes are kept word-major, as (words, rows) uint64, so the scan walks one
+contiguous array per 64-bit word. Popcount uses np.bitwise_count (NumPy 2)
+and falls back to a 256-entry table.
+
+Codes are either the sign bits of the encoding itself (512 bits = 64 bytes)
+or the sign bits of a fixed random projection with `num_bits` outputs.
+Below `min_gallery_size` encodings the prefilter does not pay off and the
+gallery is searched exactly.
+"""
+
+import numpy as np
+
+from face_recognition_module.arcface_recognizer import match_encodings_batch
+from face_recognition_module.gallery import FaceGallery, select_one_to_one
+
+# Number of set bits for every byte value
+POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).sum(axis=1).astype(np.uint8)
+
+_bitwise_count = getattr(np, 'bitwise_count', None)
+
+
+class BinaryHasher:
+    """Maps float encodings to packed binary codes."""
+
+    def __init__(self, embedding_size=512, num_bits=0, seed=0):
+        """
+        Args:
+            embedding_size: Dimension of the face encodings
+            num_bits: 0 for the sign bits of the encoding, otherwise the number
+                of random-projection bits (multiple of 8)
+            seed: Random seed of the projection (codes are only comparable for the same seed)
+        """
+        self.num_bits = num_bits or embedding_size
+        assert self.num_bits % 8 == 0, "num_bits must be a multiple of 8"
+        self.num_words = (self.num_bits + 63) // 64
+        self.projection = None
+        if num_bits:
+            rng = np.random.default_rng(seed)
+            self.projection = rng.standard_normal((embedding_size, num_bits)).astype(np.float32)
+
+    @property
+    def code_size(self):
+        """Bytes per code."""
+        return self.num_bits // 8
+
+    def encode(self, encodings):
+        """
+        Args:
+            encodings: numpy.ndarray of shape (N, embedding_size)
+
+        Returns:
+            numpy.ndarray of shape (N, code_size), dtype uint8
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(len(encodings), -1)
+        if self.projection is not None:
+            encodings = encodings @ self.projection
+        return np.packbits(encodings > 0, axis=1)
+
+    def to_words(self, codes):
+        """
+        Word-major layout of packed codes.
+
+        Args:
+            codes: numpy.ndarray of shape (N, code_size), dtype uint8
+
+        Returns:
+            numpy.ndarray of shape (num_words, N), dtype uint64
+        """
+        codes = np.asarray(codes, dtype=np.uint8).reshape(-1, self.code_size)
+        padded = np.zeros((len(codes), self.num_words * 8), dtype=np.uint8)
+        padded[:, :self.code_size] = codes
+        return np.ascontiguousarray(padded.view(np.uint64).T)
+
+
+def popcount(words):
+    """Number of set bits of every element of a uint64 array."""
+    if _bitwise_count is not None:
+        return _bitwise_count(words)
+    words = np.ascontiguousarray(words)
+    return POPCOUNT_TABLE[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def hamming_distances(query_words, code_words):
+    """
+    Hamming distance between one code and N codes, both in word-major layout.
+
+    Args:
+        query_words: numpy.ndarray of shape (num_words,), dtype uint64
+        code_words: numpy.ndarray of shape (num_words, N), dtype uint64
+
+    Returns:
+        numpy.ndarray of shape (N,), dtype uint16
+    """
+    distances = popcount(np.bitwise_xor(code_words[0], query_words[0])).astype(np.uint16)
+    for word in range(1, len(query_words)):
+        distances += popcount(np.bitwise_xor(code_words[word], query_words[word]))
+    return distances
+
+
+class BinaryHashIndex(FaceGallery):
+    """
+    FaceGallery with a Hamming-distance prefilter and exact re-ranking.
+    """
+
+    def __init__(self, embedding_size=512, num_bits=0, num_candidates=256, min_gallery_size=5000,
+                 seed=0, initial_capacity=1024):
+        """
+        Args:
+            embedding_size: Dimension of the face encodings
+            num_bits: Code length (0 = sign bits of the encoding)
+            num_candidates: Candidates kept by the Hamming scan and re-ranked exactly
+            min_gallery_size: Galleries smaller than this are searched exactly
+            seed: Random seed of the projection
+            initial_capacity: Number of rows allocated up front
+        """
+        self.hasher = BinaryHasher(embedding_size, num_bits, seed)
+        self.num_candidates = num_candidates
+        self.min_gallery_size = min_gallery_size
+        self._codes = np.zeros((self.hasher.num_words, max(1, initial_capacity)), dtype=np.uint64)
+        super().__init__(embedding_size, initial_capacity)
+
+    def memory_bytes(self):
+        return super().memory_bytes() + int(self._size * self.hasher.code_size)
+
+    def encode(self, encodings):
+        """Binary codes for encodings (see BinaryHasher.encode)."""
+        return self.hasher.encode(encodings)
+
+    def _reserve(self, capacity):
+        if capacity > self._codes.shape[1]:
+            codes = np.zeros((self.hasher.num_words, max(capacity, 2 * self._codes.shape[1])), dtype=np.uint64)
+            codes[:, :self._size] = self._codes[:, :self._size]
+            self._codes = codes
+        super()._reserve(capacity)
+
+    def load(self, person_ids, encodings, codes=None):
+        """
+        Replace the gallery contents in one step.
+
+        Args:
+            person_ids: Sequence of N person ids
+            encodings: Array-like of shape (N, embedding_size)
+            codes: Optional precomputed codes of shape (N, code_size)
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        with self._lock:
+            super().load(person_ids, encodings)
+            self._codes[:, :self._size] = self.hasher.to_words(self.encode(encodings) if codes is None else codes)
+
+    def add(self, person_id, encoding, code=None):
+        """Add a person's encoding (and optionally its precomputed code)."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.embedding_size)
+        with self._lock:
+            super().add(person_id, encoding)
+            code = self.encode(encoding[np.newaxis]) if code is None else code
+            self._codes[:, self._rows[person_id]] = self.hasher.to_words(code)[:, 0]
+
+    def remove(self, person_id):
+        with self._lock:
+            row = self._rows.get(person_id)
+            if row is None:
+                return False
+            # Mirror the row move done by FaceGallery.remove
+            self._codes[:, row] = self._codes[:, self._size - 1]
+            return super().remove(person_id)
+
+    def search(self, query_encodings, top_k=1, one_to_one=False):
+        """
+        Hamming prefilter followed by exact re-ranking (exact search for small galleries).
+
+        Args:
+            query_encodings: Normalized face embeddings of shape (F, embedding_size)
+            top_k: Number of best matches returned per face
+            one_to_one: If True, return one match per face and never the same
+                person for two faces
+
+        Returns:
+            Tuple of (scores, person_ids), both of shape (F, top_k) (F, 1 with
+            one_to_one); missing matches have score 0 and person id None
+        """
+        query_encodings = np.asarray(query_encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        num_queries = len(query_encodings)
+        k = 1 if one_to_one else max(1, int(top_k))
+
+        with self._lock:
+            if self._size < max(self.min_gallery_size, self.num_candidates, k):
+                return super().search(query_encodings, top_k=top_k, one_to_one=one_to_one)
+
+            num_candidates = max(self.num_candidates, k)
+            query_words = self.hasher.to_words(self.encode(query_encodings))
+            candidate_scores = np.zeros((num_queries, k), dtype=np.float32)
+            candidate_ids = np.full((num_queries, k), None, dtype=object)
+            for i in range(num_queries):
+                rows = self._hamming_candidates(query_words[:, i], num_candidates)
+                scores, indices = match_encodings_batch(query_encodings[i], self._encodings[rows], top_k=k)
+                candidate_scores[i] = scores[0]
+                candidate_ids[i] = self._ids[rows[indices[0]]]
+
+        if not one_to_one:
+            return candidate_scores, candidate_ids
+        return select_one_to_one(candidate_scores, candidate_ids)
+
+    def _hamming_candidates(self, query_words, num_candidates):
+        """Rows of the `num_candidates` codes closest to a query code."""
+        distances = hamming_distances(query_words, self._codes[:, :self._size])
+        return np.argpartition(distances, num_candidates - 1)[:num_candidates]
@@ -0,0 +1,337 @@
+"""
+IVF-Flat Search Index
+
+Inverted-file index for large galleries: a k-means coarse quantizer splits the
+encodings into `nlist` clusters, and a query is only compared against the
+encodings of its `nprobe` closest clusters. Each cluster (inverted list) is a
+FaceGallery, so encodings stay in contiguous float32 matrices and can be added
+or removed incrementally.
+
+Raising nprobe trades speed for recall; nprobe == nlist is an exact search.
+
+As the gallery grows, the quantizer is retrained in a background thread on a
+copy of the encodings; until the new centroids and lists are swapped in,
+additions go to the current lists, and changes made meanwhile are replayed
+onto the new lists before the swap.
+"""
+
+import threading
+
+import numpy as np
+
+from face_recognition_module.gallery import FaceGallery, select_one_to_one
+
+
+def spherical_kmeans(encodings, num_clusters, iterations=15, seed=0):
+    """
+    K-means on normalized encodings using cosine similarity.
+
+    Args:
+        encodings: numpy.ndarray of shape (N, D), L2-normalized
+        num_clusters: Number of centroids
+        iterations: Number of Lloyd iterations
+        seed: Random seed for the initial centroids
+
+    Returns:
+        numpy.ndarray of shape (num_clusters, D) with normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    encodings = np.asarray(encodings, dtype=np.float32)
+    centroids = encodings[rng.choice(len(encodings), num_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(encodings @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, encodings)
+        counts = np.bincount(assignments, minlength=num_clusters)
+
+        # Re-seed empty clusters with random encodings
+        empty = np.where(counts == 0)[0]
+        if empty.size:
+            sums[empty] = encodings[rng.choice(len(encodings), empty.size, replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+
+    return centroids.astype(np.float32)
+
+
+class IVFFlatIndex:
+    """
+    Inverted-file index with exact (flat) search inside the probed lists.
+
+    Until the gallery holds enough encodings to train the coarse quantizer,
+    everything lives in a single list and searches are exact.
+    """
+
+    def __init__(self, embedding_size=512, nlist=None, nprobe=8, kmeans_iterations=15,
+                 min_points_per_list=39, max_training_points=100000, retrain_growth=4.0, seed=0):
+        """
+        Initialize an empty index.
+
+        Args:
+            embedding_size: Dimension of the face encodings
+            nlist: Number of clusters (None = 4 * sqrt(N) at training time)
+            nprobe: Number of clusters searched per query
+            kmeans_iterations: Lloyd iterations when training the quantizer
+            min_points_per_list: Minimum encodings per cluster required to train
+            max_training_points: Maximum encodings sampled for k-means
+            retrain_growth: Retrain once the gallery grows by this factor since the last training
+            seed: Random seed for training
+        """
+        self.embedding_size = embedding_size
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.kmeans_iterations = kmeans_iterations
+        self.min_points_per_list = min_points_per_list
+        self.max_training_points = max_training_points
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+
+        self._centroids = None
+        self._lists = [FaceGallery(embedding_size, initial_capacity=64)]
+        self._list_of = {}  # person id -> list index
+        self._trained_size = 0
+        self._lock = threading.RLock()
+        self._retrain_thread = None
+        self._retrain_log = None  # (person id, encoding or None) changes made during a retrain
+        self._generation = 0  # bumped by load, so a retrain of the old contents is discarded
+
+    def __len__(self):
+        return len(self._list_of)
+
+    def __contains__(self, person_id):
+        return person_id in self._list_of
+
+    def memory_bytes(self):
+        """Bytes used by the stored encodings and centroids (excluding id tables)."""
+        centroids = 0 if self._centroids is None else self._centroids.nbytes
+        return centroids + sum(gallery.memory_bytes() for gallery in self._lists)
+
+    @property
+    def is_trained(self):
+        return self._centroids is not None
+
+    def _target_nlist(self, size):
+        """Number of clusters used for a gallery of `size` encodings."""
+        nlist = self.nlist or int(4 * np.sqrt(size))
+        return max(1, min(nlist, size // max(1, self.min_points_per_list)))
+
+    def _export(self):
+        """All ids and encodings currently stored, as (ids, (N, D) matrix)."""
+        person_ids = []
+        encodings = []
+        for gallery in self._lists:
+            size = len(gallery)
+            person_ids.extend(gallery._ids[:size])
+            encodings.append(gallery._encodings[:size])
+        return person_ids, np.concatenate(encodings, axis=0)
+
+    def load(self, person_ids, encodings):
+        """
+        Replace the index contents, training the quantizer if there are enough encodings.
+
+        Args:
+            person_ids: Sequence of N person ids
+            encodings: Array-like of shape (N, embedding_size)
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        with self._lock:
+            self._generation += 1
+            self._retrain_log = None
+            self._centroids = None
+            self._trained_size = 0
+            if self._target_nlist(len(person_ids)) > 1:
+                self._train(encodings)
+            self._assign_all(list(person_ids), encodings)
+
+    def train(self):
+        """(Re)train the coarse quantizer on the current contents and redistribute them (blocking)."""
+        with self._lock:
+            person_ids, encodings = self._export()
+            if self._target_nlist(len(person_ids)) > 1:
+                self._train(encodings)
+                self._assign_all(person_ids, encodings)
+
+    def _train(self, encodings):
+        rng = np.random.default_rng(self.seed)
+        sample = encodings
+        if len(encodings) > self.max_training_points:
+            sample = encodings[rng.choice(len(encodings), self.max_training_points, replace=False)]
+        self._centroids = spherical_kmeans(
+            sample, self._target_nlist(len(encodings)), self.kmeans_iterations, self.seed
+        )
+        self._trained_size = len(encodings)
+
+    def _assign_all(self, person_ids, encodings):
+        num_lists = 1 if self._centroids is None else len(self._centroids)
+        assignments = np.zeros(len(person_ids), dtype=np.int64)
+        if self._centroids is not None:
+            for start in range(0, len(person_ids), 65536):
+                chunk = encodings[start:start + 65536]
+                assignments[start:start + 65536] = np.argmax(chunk @ self._centroids.T, axis=1)
+
+        person_ids = np.asarray(person_ids, dtype=object)
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(num_lists + 1))
+        self._lists = []
+        for list_index in range(num_lists):
+            members = order[bounds[list_index]:bounds[list_index + 1]]
+            gallery = FaceGallery(self.embedding_size, initial_capacity=max(64, len(members)))
+            gallery.load(person_ids[members], encodings[members])
+            self._lists.append(gallery)
+        self._list_of = dict(zip(person_ids, assignments.tolist()))
+
+    def add(self, person_id, encoding):
+        """Add a person's encoding, replacing it if the person is already indexed."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.embedding_size)
+        with self._lock:
+            self.remove(person_id)
+            list_index = 0
+            if self._centroids is not None:
+                list_index = int(np.argmax(self._centroids @ encoding))
+            self._lists[list_index].add(person_id, encoding)
+            self._list_of[person_id] = list_index
+            if self._retrain_log is not None:
+                self._retrain_log.append((person_id, encoding))
+            self._check_retrain()
+
+    def _check_retrain(self):
+        """Train once there is enough data, and again after substantial growth."""
+        if self._retrain_log is not None:
+            return
+        size = len(self._list_of)
+        if self._centroids is None:
+            if self._target_nlist(size) > 1:
+                self._start_retrain()
+        elif size >= self.retrain_growth * self._trained_size:
+            self._start_retrain()
+
+    def _start_retrain(self):
+        """Retrain on a copy of the current contents in a background thread."""
+        person_ids, encodings = self._export()
+        self._retrain_log = []
+        self._retrain_thread = threading.Thread(
+            target=self._retrain, args=(person_ids, encodings, self._generation),
+            name='ivf-retrain', daemon=True
+        )
+        self._retrain_thread.start()
+
+    def _retrain(self, person_ids, encodings, generation):
+        # The copy never retrains itself; this index checks the growth again after the swap
+        trained = IVFFlatIndex(self.embedding_size, nlist=self.nlist, kmeans_iterations=self.kmeans_iterations,
+                               min_points_per_list=self.min_points_per_list,
+                               max_training_points=self.max_training_points,
+                               retrain_growth=float('inf'), seed=self.seed)
+        try:
+            trained.load(person_ids, encodings)
+        except Exception as e:
+            print(f"Error retraining IVF index: {e}")
+            with self._lock:
+                if self._generation == generation:
+                    self._retrain_log = None
+            return
+
+        with self._lock:
+            if self._generation != generation:
+                return
+            # Catch the new lists up with the changes made while they were built
+            for person_id, encoding in self._retrain_log:
+                if encoding is None:
+                    trained.remove(person_id)
+                else:
+                    trained.add(person_id, encoding)
+            self._centroids = trained._centroids
+            self._lists = trained._lists
+            self._list_of = trained._list_of
+            self._trained_size = trained._trained_size
+            self._retrain_log = None
+            self._check_retrain()
+
+    def wait_for_retrain(self, timeout=None):
+        """Wait until a running background retrain has been swapped in."""
+        thread = self._retrain_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def remove(self, person_id):
+        """
+        Remove a person's encoding.
+
+        Returns:
+            bool: True if the person was indexed
+        """
+        with self._lock:
+            list_index = self._list_of.pop(person_id, None)
+            if list_index is None:
+                return False
+            if self._retrain_log is not None:
+                self._retrain_log.append((person_id, None))
+            return self._lists[list_index].remove(person_id)
+
+    def get(self, person_id):
+        """Get a copy of a person's encoding, or None if not indexed."""
+        with self._lock:
+            list_index = self._list_of.get(person_id)
+            return None if list_index is None else self._lists[list_index].get(person_id)
+
+    def search(self, query_encodings, top_k=1, one_to_one=False):
+        """
+        Approximate top-k search over the `nprobe` closest clusters of each query.
+
+        Args:
+            query_encodings: Normalized face embeddings of shape (F, embedding_size)
+            top_k: Number of best matches returned per face
+            one_to_one: If True, return one match per face and never the same
+                person for two faces
+
+        Returns:
+            Tuple of (scores, person_ids), both of shape (F, top_k) (F, 1 with
+            one_to_one); missing matches have score 0 and person id None
+        """
+        query_encodings = np.asarray(query_encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        num_queries = len(query_encodings)
+        k = 1 if one_to_one else max(1, int(top_k))
+
+        with self._lock:
+            if self._centroids is None:
+                candidate_scores, candidate_ids = self._lists[0].search(query_encodings, top_k=k)
+            else:
+                candidate_scores, candidate_ids = self._search_lists(query_encodings, k)
+
+        if not one_to_one:
+            return candidate_scores, candidate_ids
+
+        return select_one_to_one(candidate_scores, candidate_ids)
+
+    def _search_lists(self, query_encodings, k):
+        num_queries = len(query_encodings)
+        nprobe = max(1, min(int(self.nprobe), len(self._centroids)))
+        coarse = query_encodings @ self._centroids.T
+        if nprobe < len(self._centroids):
+            probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(nprobe), (num_queries, nprobe))
+
+        # Search each probed list once for all queries that probe it
+        all_scores = np.full((num_queries, nprobe, k), -np.inf, dtype=np.float32)
+        all_ids = np.full((num_queries, nprobe, k), None, dtype=object)
+        for list_index in np.unique(probes):
+            queries, slots = np.nonzero(probes == list_index)
+            if len(self._lists[list_index]) == 0:
+                continue
+            scores, person_ids = self._lists[list_index].search(query_encodings[queries], top_k=k)
+            valid = person_ids != None  # noqa: E711
+            all_scores[queries, slots] = np.where(valid, scores, -np.inf)
+            all_ids[queries, slots] = person_ids
+
+        # Merge the per-list results into the global top-k per query
+        all_scores = all_scores.reshape(num_queries, -1)
+        all_ids = all_ids.reshape(num_queries, -1)
+        order = np.argsort(-all_scores, axis=1, kind='stable')[:, :k]
+        scores = np.take_along_axis(all_scores, order, axis=1)
+        person_ids = np.take_along_axis(all_ids, order, axis=1)
+        missing = ~np.isfinite(scores)
+        scores[missing] = 0.0
+        person_ids[missing] = None
+        return scores, person_ids
@@ -0,0 +1,116 @@
+"""
+Pluggable Face Search Index
+
+All indexes share the FaceGallery interface: load(ids, encodings), add(id,
+encoding), remove(id), get(id), search(queries, top_k, one_to_one) and len().
+
+- 'brute_force': VersionedGallery, exact search over lock-free snapshots (default)
+- 'ivf_flat': IVFFlatIndex, k-means inverted lists, tuned with nprobe
+- 'hnsw': HNSWIndex, navigable small-world graph, tuned with ef_search
+- 'sq_fp16', 'sq_int8': ScalarQuantizedIndex, compact codes with exact re-ranking
+- 'pq': PQIndex, product quantization (ADC) with exact re-ranking
+- 'binary_hash': BinaryHashIndex, Hamming prefilter on binary codes with exact re-ranking
+"""
+
+import glob
+import os
+
+import numpy as np
+
+from face_recognition_module.compressed_index import PQIndex, ScalarQuantizedIndex
+from face_recognition_module.hash_index import BinaryHashIndex
+from face_recognition_module.hnsw_index import HNSWIndex
+from face_recognition_module.ivf_index import IVFFlatIndex
+from face_recognition_module.versioned_gallery import VersionedGallery
+
+SEARCH_INDEX_TYPES = ('brute_force', 'ivf_flat', 'hnsw', 'sq_fp16', 'sq_int8', 'pq', 'binary_hash')
+
+# Indexes that keep only compressed codes in memory
+COMPRESSED_INDEX_TYPES = ('sq_fp16', 'sq_int8', 'pq')
+
+
+def create_search_index(index_type='brute_force', embedding_size=512, nprobe=8, ef_search=64,
+                        rerank=64, encoding_loader=None, **kwargs):
+    """
+    Create an empty search index.
+
+    Args:
+        index_type: One of SEARCH_INDEX_TYPES
+        embedding_size: Dimension of the face encodings
+        nprobe: Clusters searched per query (ivf_flat)
+        ef_search: Candidate list size per query (hnsw)
+        rerank: Candidates re-scored exactly per query (compressed indexes)
+        encoding_loader: callable(person_id) -> original encoding, used for
+            re-ranking (compressed indexes; None disables re-ranking)
+        **kwargs: Extra constructor arguments of the chosen index
+
+    Returns:
+        Search index instance
+    """
+    assert index_type in SEARCH_INDEX_TYPES, f"Unknown search index type: {index_type}"
+
+    if index_type == 'ivf_flat':
+        return IVFFlatIndex(embedding_size, nprobe=nprobe, **kwargs)
+    if index_type == 'hnsw':
+        return HNSWIndex(embedding_size, ef_search=ef_search, **kwargs)
+    if index_type == 'binary_hash':
+        return BinaryHashIndex(embedding_size, **kwargs)
+    if index_type == 'pq':
+        return PQIndex(embedding_size, rerank=rerank, encoding_loader=encoding_loader, **kwargs)
+    if index_type in ('sq_fp16', 'sq_int8'):
+        return ScalarQuantizedIndex(
+            embedding_size, dtype='float16' if index_type == 'sq_fp16' else 'int8',
+            rerank=rerank, encoding_loader=encoding_loader, **kwargs
+        )
+    return VersionedGallery(embedding_size, **kwargs)
+
+
+def load_encodings_dir(encodings_dir):
+    """
+    Load every <person_id>.npy encoding from a directory.
+
+    Args:
+        encodings_dir: Directory holding one .npy encoding per person
+
+    Returns:
+        Tuple of (person_ids, encodings) with encodings of shape (N, D)
+    """
+    person_ids = []
+    encodings = []
+    for path in sorted(glob.glob(os.path.join(encodings_dir, '*.npy'))):
+        try:
+            encoding = np.load(path)
+        except Exception as e:
+            print(f"Error loading encoding {path}: {e}")
+            continue
+        person_ids.append(os.path.splitext(os.path.basename(path))[0])
+        encodings.append(np.asarray(encoding, dtype=np.float32).ravel())
+
+    if not encodings:
+        return [], np.zeros((0, 512), dtype=np.float32)
+    return person_ids, np.stack(encodings)
+
+
+def recall_at_1(index, reference, query_encodings, batch_size=64):
+    """
+    Fraction of queries for which an index returns the same top-1 person as a reference index.
+
+    Args:
+        index: Search index under test
+        reference: Exact index (e.g. FaceGallery) holding the same encodings
+        query_encodings: numpy.ndarray of shape (Q, D)
+        batch_size: Queries searched per call
+
+    Returns:
+        float: Recall@1 in [0, 1]
+    """
+    if len(query_encodings) == 0:
+        return 1.0
+
+    hits = 0
+    for start in range(0, len(query_encodings), batch_size):
+        queries = query_encodings[start:start + batch_size]
+        _, expected = reference.search(queries, top_k=1)
+        _, found = index.search(queries, top_k=1)
+        hits += int(np.sum(expected[:, 0] == found[:, 0]))
+    return hits / len(query_encodings)
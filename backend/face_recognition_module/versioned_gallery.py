@@ -0,0 +1,259 @@
+"""
+Versioned Gallery Snapshots
+
+Copy-on-write brute-force gallery for multi-threaded servers. Readers take
+the current GallerySnapshot (encoding matrix, person ids, names and version
+number) with one reference read and search it without any lock; a published
+snapshot never changes.
+
+Writers queue register/delete operations. Whichever writer holds the publish
+lock applies every queued operation in one step and publishes a new snapshot
+with the next version number, so concurrent registrations are batched into
+a single publish.
+
+Publishing does not copy the matrix: new rows are written into spare
+capacity past the end of every published snapshot, and deleted rows become
+tombstones that searches skip. The buffer is only rebuilt (keeping the live
+rows) when it is full or when too many rows are tombstones.
+"""
+
+import threading
+
+import numpy as np
+
+from face_recognition_module.arcface_recognizer import match_encodings_batch
+
+
+class GallerySnapshot:
+    """
+    Immutable view of the gallery at one version.
+    """
+
+    def __init__(self, encodings, ids, names, rows, dead_rows, version):
+        """
+        Args:
+            encodings: Read-only matrix of shape (R, embedding_size), including tombstones
+            ids: Object array of R person ids
+            names: Object array of R names (None if unknown)
+            rows: Dict of live person id -> row
+            dead_rows: int64 array of tombstone rows
+            version: Version number
+        """
+        self.encodings = encodings
+        self.ids = ids
+        self.names = names
+        self.rows = rows
+        self.dead_rows = dead_rows
+        self.version = version
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, person_id):
+        return person_id in self.rows
+
+    def get(self, person_id):
+        """Get a copy of a person's encoding, or None if not enrolled."""
+        row = self.rows.get(person_id)
+        return None if row is None else self.encodings[row].copy()
+
+    def name(self, person_id):
+        """Name stored with a person's encoding, or None."""
+        row = self.rows.get(person_id)
+        return None if row is None else self.names[row]
+
+    def search(self, query_encodings, top_k=1, one_to_one=False):
+        """
+        Match all faces of a frame against the snapshot with one similarity matrix.
+
+        Args:
+            query_encodings: Normalized face embeddings of shape (F, embedding_size)
+            top_k: Number of best matches returned per face
+            one_to_one: If True, return one match per face and never the same
+                person for two faces (see match_encodings_batch)
+
+        Returns:
+            Tuple of (scores, person_ids), both of shape (F, top_k) (F, 1 with
+            one_to_one); missing matches have score 0 and person id None
+        """
+        scores, indices = match_encodings_batch(
+            query_encodings, self.encodings, top_k=top_k, one_to_one=one_to_one, excluded=self.dead_rows
+        )
+        person_ids = np.where(indices >= 0, self.ids[np.maximum(indices, 0)], None)
+        return scores, person_ids
+
+
+class VersionedGallery:
+    """
+    Brute-force gallery publishing immutable snapshots (FaceGallery interface).
+    """
+
+    def __init__(self, embedding_size=512, initial_capacity=1024, max_dead_ratio=0.25):
+        """
+        Initialize an empty gallery (version 0).
+
+        Args:
+            embedding_size: Dimension of the face encodings
+            initial_capacity: Number of rows allocated up front
+            max_dead_ratio: Rebuild the buffer once this fraction of rows are tombstones
+        """
+        self.embedding_size = embedding_size
+        self.initial_capacity = max(1, initial_capacity)
+        self.max_dead_ratio = max_dead_ratio
+
+        # Append-only buffers: rows below the size of a published snapshot are never written again
+        self._encodings = np.zeros((self.initial_capacity, embedding_size), dtype=np.float32)
+        self._ids = np.empty(self.initial_capacity, dtype=object)
+        self._names = np.empty(self.initial_capacity, dtype=object)
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._snapshot = self._make_snapshot(0, {}, [], 0)
+
+    def snapshot(self):
+        """Current snapshot (one atomic reference read)."""
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __contains__(self, person_id):
+        return person_id in self._snapshot
+
+    def memory_bytes(self):
+        """Bytes used by the stored encodings, including tombstones (excluding the id table)."""
+        encodings = self._snapshot.encodings
+        return int(encodings.shape[0] * self.embedding_size * encodings.itemsize)
+
+    def get(self, person_id):
+        """Get a copy of a person's encoding, or None if not enrolled."""
+        return self._snapshot.get(person_id)
+
+    def search(self, query_encodings, top_k=1, one_to_one=False):
+        """Search the current snapshot (see GallerySnapshot.search)."""
+        return self._snapshot.search(query_encodings, top_k=top_k, one_to_one=one_to_one)
+
+    def load(self, person_ids, encodings, names=None):
+        """
+        Replace the gallery contents in one step.
+
+        Args:
+            person_ids: Sequence of N person ids
+            encodings: Array-like of shape (N, embedding_size); a read-only
+                matrix (e.g. the gallery file's np.memmap) is used in place
+            names: Optional sequence of N names
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        assert len(person_ids) == encodings.shape[0]
+        names = [None] * len(person_ids) if names is None else list(names)
+        self._submit(['load', list(person_ids), encodings, names, None])
+
+    def add(self, person_id, encoding, name=None):
+        """Add a person's encoding, replacing it if the person is already enrolled."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.embedding_size)
+        self._submit(['add', person_id, encoding, name, None])
+
+    def add_many(self, person_ids, encodings, names=None):
+        """Add several encodings and publish them as one version (e.g. a bulk enrollment)."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        assert len(person_ids) == encodings.shape[0]
+        names = [None] * len(person_ids) if names is None else list(names)
+        self._submit(*[['add', person_id, encoding, name, None]
+                       for person_id, encoding, name in zip(person_ids, encodings, names)])
+
+    def remove(self, person_id):
+        """
+        Remove a person's encoding.
+
+        Returns:
+            bool: True if the person was enrolled
+        """
+        return self._submit(['remove', person_id, None, None, None])
+
+    def _submit(self, *operations):
+        """Queue operations and publish; returns the last operation's result."""
+        with self._pending_lock:
+            self._pending.extend(operations)
+        with self._publish_lock:
+            # Operations queued by other writers meanwhile are published together
+            with self._pending_lock:
+                queued, self._pending = self._pending, []
+            if queued:
+                self._publish(queued)
+        return operations[-1][4] if operations else None
+
+    def _publish(self, operations):
+        snapshot = self._snapshot
+        rows = dict(snapshot.rows)
+        dead_rows = snapshot.dead_rows.tolist()
+        size = snapshot.encodings.shape[0]
+
+        for operation in operations:
+            kind, person_id, encoding, name = operation[:4]
+            if kind == 'load':
+                person_ids, encodings, names = person_id, encoding, name
+                if not encodings.flags.writeable and encodings.flags.c_contiguous:
+                    # Used in place: pages stay shared until the next add rebuilds the buffer
+                    self._encodings = encodings
+                else:
+                    self._encodings = np.zeros((max(len(person_ids), self.initial_capacity), self.embedding_size),
+                                               dtype=np.float32)
+                    self._encodings[:len(person_ids)] = encodings
+                self._ids = np.empty(max(len(self._encodings), 1), dtype=object)
+                self._ids[:len(person_ids)] = person_ids
+                self._names = np.empty(max(len(self._encodings), 1), dtype=object)
+                self._names[:len(person_ids)] = names
+                rows = {pid: row for row, pid in enumerate(person_ids)}
+                dead_rows = []
+                size = len(person_ids)
+            elif kind == 'add':
+                row = rows.pop(person_id, None)
+                if row is not None:
+                    dead_rows.append(row)
+                if size >= len(self._ids) or not self._encodings.flags.writeable:
+                    rows, dead_rows, size = self._rebuild(rows, size + 1)
+                self._encodings[size] = encoding
+                self._ids[size] = person_id
+                self._names[size] = name
+                rows[person_id] = size
+                size += 1
+            else:
+                row = rows.pop(person_id, None)
+                operation[4] = row is not None
+                if row is not None:
+                    dead_rows.append(row)
+
+        if len(dead_rows) > self.max_dead_ratio * max(1, size):
+            rows, dead_rows, size = self._rebuild(rows, len(rows))
+        self._snapshot = self._make_snapshot(size, rows, dead_rows, snapshot.version + 1)
+
+    def _rebuild(self, rows, min_capacity):
+        """
+        Copy the live rows into fresh buffers (published snapshots keep the old ones).
+
+        Returns:
+            Tuple of (rows, dead_rows, size) for the new buffers
+        """
+        live = np.array(sorted(rows.values()), dtype=np.int64)
+        capacity = max(2 * min_capacity, self.initial_capacity)
+        encodings = np.zeros((capacity, self.embedding_size), dtype=np.float32)
+        ids = np.empty(capacity, dtype=object)
+        names = np.empty(capacity, dtype=object)
+        encodings[:len(live)] = self._encodings[live]
+        ids[:len(live)] = self._ids[live]
+        names[:len(live)] = self._names[live]
+        self._encodings, self._ids, self._names = encodings, ids, names
+        return {person_id: row for row, person_id in enumerate(ids[:len(live)])}, [], len(live)
+
+    def _make_snapshot(self, size, rows, dead_rows, version):
+        encodings = self._encodings[:size]
+        encodings.flags.writeable = False
+        return GallerySnapshot(
+            encodings, self._ids[:size], self._names[:size], rows,
+            np.array(dead_rows, dtype=np.int64), version
+        )
@@ -0,0 +1,85 @@
+"""
+Gallery Migration
+
+Converts the per-person encoding layout (database/encodings/<person_id>.npy)
+into the consolidated, memory-mapped gallery file read by app.py when
+GALLERY_STORAGE=consolidated, and verifies the result.
+
+Usage:
+    python migrate_gallery.py                   # write database/encodings/gallery.bin
+    python migrate_gallery.py --remove-files    # ... and delete the .npy/.hash files afterwards
+    python migrate_gallery.py --export-files    # write the .npy files back from gallery.bin
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from storage.gallery_file import GalleryFile, migrate_encoding_files
+
+ENCODINGS_DIR = os.path.join(os.path.dirname(__file__), 'database', 'encodings')
+
+
+def verify_gallery(encodings_dir, embedding_size):
+    """Compare every encoding of the gallery file with its .npy file (where one exists)."""
+    person_ids, encodings = GalleryFile(encodings_dir, embedding_size).open().read()
+    mismatches = 0
+    for person_id, encoding in zip(person_ids, encodings):
+        path = os.path.join(encodings_dir, f"{person_id}.npy")
+        if os.path.exists(path) and not np.array_equal(np.load(path).ravel(), encoding):
+            print(f"✗ Encoding differs for {person_id}")
+            mismatches += 1
+    return len(person_ids), mismatches
+
+
+def export_files(encodings_dir, embedding_size):
+    """Write one <person_id>.npy per encoding of the gallery file (reverse migration)."""
+    person_ids, encodings = GalleryFile(encodings_dir, embedding_size).open().read()
+    for person_id, encoding in zip(person_ids, encodings):
+        np.save(os.path.join(encodings_dir, f"{person_id}.npy"), np.array(encoding))
+    return len(person_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate per-person .npy encodings to the consolidated gallery file")
+    parser.add_argument('--encodings-dir', default=ENCODINGS_DIR, help="Directory of <person_id>.npy encodings")
+    parser.add_argument('--embedding-size', type=int, default=512)
+    parser.add_argument('--remove-files', action='store_true',
+                        help="Delete the per-person .npy/.hash files after a verified migration")
+    parser.add_argument('--export-files', action='store_true',
+                        help="Write per-person .npy files from the gallery file instead")
+    args = parser.parse_args()
+
+    if args.export_files:
+        count = export_files(args.encodings_dir, args.embedding_size)
+        print(f"✓ Exported {count} encodings to {args.encodings_dir}")
+        return 0
+
+    start = time.perf_counter()
+    person_ids, failed = migrate_encoding_files(args.encodings_dir, args.embedding_size)
+    count = len(person_ids)
+    print(f"✓ Wrote {count} encodings to {os.path.join(args.encodings_dir, 'gallery.bin')} "
+          f"in {time.perf_counter() - start:.2f}s")
+    if failed:
+        print(f"⚠ {len(failed)} encoding files could not be read and were skipped")
+
+    stored, mismatches = verify_gallery(args.encodings_dir, args.embedding_size)
+    if stored != count or mismatches:
+        print(f"✗ Verification failed ({stored} stored, {mismatches} mismatches); per-person files kept")
+        return 1
+    print(f"✓ Verified {stored} encodings")
+
+    if args.remove_files:
+        for person_id in person_ids:
+            for extension in ('.npy', '.hash'):
+                path = os.path.join(args.encodings_dir, f"{person_id}{extension}")
+                if os.path.exists(path):
+                    os.remove(path)
+        print(f"✓ Removed the per-person encoding files of {count} people")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1 @@
+# Model runtime module
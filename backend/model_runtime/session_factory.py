@@ -0,0 +1,139 @@
+"""
+ONNX Runtime Session Factory
+
+Creates InferenceSessions for the detection and recognition models with
+configurable threading, execution mode and graph optimization level.
+
+The first time a model is loaded, the graph optimized by ONNX Runtime is
+saved to a cache directory; later startups load that optimized graph with
+optimizations disabled, which skips the graph rewrite at cold start.
+"""
+
+import os
+
+import onnxruntime
+
+# Default providers: try GPU first, fallback to CPU
+DEFAULT_PROVIDERS = ['CUDAExecutionProvider', 'CPUExecutionProvider']
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    'sequential': onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def get_available_providers(providers=None):
+    """Filter the requested providers down to those available in this ONNX Runtime build."""
+    providers = providers or DEFAULT_PROVIDERS
+    available = onnxruntime.get_available_providers()
+    selected = [p for p in providers if p in available]
+    return selected or ['CPUExecutionProvider']
+
+
+def get_optimized_model_path(model_file, cache_dir, providers, graph_optimization_level='all'):
+    """
+    Get the cache path of the optimized graph for a model.
+
+    The optimized graph depends on the optimization level and the execution
+    provider it was optimized for, so both are part of the file name.
+
+    Args:
+        model_file: Path to the original ONNX model
+        cache_dir: Directory holding optimized models
+        providers: Providers the session will run with
+        graph_optimization_level: Optimization level name
+
+    Returns:
+        str: Path of the cached optimized model
+    """
+    name = os.path.splitext(os.path.basename(model_file))[0]
+    provider = providers[0].replace('ExecutionProvider', '').lower()
+    return os.path.join(cache_dir, f"{name}.{graph_optimization_level}.{provider}.onnx")
+
+
+def create_session_options(intra_op_num_threads=0, inter_op_num_threads=0,
+                           execution_mode='sequential', graph_optimization_level='all'):
+    """
+    Build SessionOptions from plain configuration values.
+
+    Args:
+        intra_op_num_threads: Threads used inside an operator (0 = ORT default)
+        inter_op_num_threads: Threads used across operators in parallel mode (0 = ORT default)
+        execution_mode: 'sequential' or 'parallel'
+        graph_optimization_level: 'disable', 'basic', 'extended' or 'all'
+
+    Returns:
+        onnxruntime.SessionOptions
+    """
+    assert execution_mode in EXECUTION_MODES, f"Unknown execution mode: {execution_mode}"
+    assert graph_optimization_level in GRAPH_OPTIMIZATION_LEVELS, \
+        f"Unknown graph optimization level: {graph_optimization_level}"
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = int(intra_op_num_threads or 0)
+    options.inter_op_num_threads = int(inter_op_num_threads or 0)
+    options.execution_mode = EXECUTION_MODES[execution_mode]
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization_level]
+    return options
+
+
+def create_session(model_file, providers=None, intra_op_num_threads=0, inter_op_num_threads=0,
+                   execution_mode='sequential', graph_optimization_level='all',
+                   optimized_model_dir=None):
+    """
+    Create an InferenceSession, reusing a cached optimized graph when possible.
+
+    Args:
+        model_file: Path to the ONNX model file
+        providers: Execution providers in order of preference (default: CUDA, then CPU)
+        intra_op_num_threads: Threads used inside an operator (0 = ORT default)
+        inter_op_num_threads: Threads used across operators (0 = ORT default)
+        execution_mode: 'sequential' or 'parallel'
+        graph_optimization_level: 'disable', 'basic', 'extended' or 'all'
+        optimized_model_dir: Directory for cached optimized graphs (None = no caching)
+
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    assert model_file is not None
+    assert os.path.exists(model_file), f"Model file not found: {model_file}"
+
+    providers = get_available_providers(providers)
+    options = create_session_options(
+        intra_op_num_threads, inter_op_num_threads, execution_mode, graph_optimization_level
+    )
+
+    if optimized_model_dir is None or graph_optimization_level == 'disable':
+        return onnxruntime.InferenceSession(model_file, sess_options=options, providers=providers)
+
+    optimized_path = get_optimized_model_path(
+        model_file, optimized_model_dir, providers, graph_optimization_level
+    )
+
+    # Load the cached graph if it is newer than the source model
+    if os.path.exists(optimized_path) and os.path.getmtime(optimized_path) >= os.path.getmtime(model_file):
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS['disable']
+        try:
+            return onnxruntime.InferenceSession(optimized_path, sess_options=options, providers=providers)
+        except Exception as e:
+            print(f"Failed to load optimized model {optimized_path}, rebuilding: {e}")
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization_level]
+
+    # Optimize from the source model and save the optimized graph for next startup
+    try:
+        os.makedirs(optimized_model_dir, exist_ok=True)
+        options.optimized_model_filepath = optimized_path
+        return onnxruntime.InferenceSession(model_file, sess_options=options, providers=providers)
+    except Exception as e:
+        print(f"Failed to cache optimized model to {optimized_path}: {e}")
+        options = create_session_options(
+            intra_op_num_threads, inter_op_num_threads, execution_mode, graph_optimization_level
+        )
+        return onnxruntime.InferenceSession(model_file, sess_options=options, providers=providers)
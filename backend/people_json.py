@@ -0,0 +1,41 @@
+"""
+People Store Import / Export
+
+Converts between the SQLite people store (database/people.db) used by app.py
+and the people.json format.
+
+Usage:
+    python people_json.py export                 # write database/people.json
+    python people_json.py import                 # merge database/people.json into the store
+    python people_json.py import other.json --replace
+"""
+
+import argparse
+import os
+
+from storage.people_store import PeopleStore
+
+DB_JSON = os.path.join(os.path.dirname(__file__), 'database', 'people.json')
+DB_SQLITE = os.path.join(os.path.dirname(__file__), 'database', 'people.db')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export the people store as JSON")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('json_path', nargs='?', default=DB_JSON, help="people.json path")
+    parser.add_argument('--db', default=DB_SQLITE, help="SQLite people store")
+    parser.add_argument('--replace', action='store_true', help="On import, delete the current records first")
+    args = parser.parse_args()
+
+    store = PeopleStore(args.db)
+    if args.action == 'export':
+        count = store.export_json(args.json_path)
+        print(f"✓ Exported {count} people to {args.json_path}")
+    else:
+        count = store.import_json(args.json_path, replace=args.replace)
+        print(f"✓ Imported {count} people into {args.db} ({store.count()} registered)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
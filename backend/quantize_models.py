@@ -0,0 +1,277 @@
+"""
+INT8 Model Quantization for CPU Inference
+
+Produces dynamic and static INT8-quantized variants of the SCRFD detector
+(det_10g.onnx) and the ArcFace recognizer (w600k_r50.onnx). Static
+quantization is calibrated on the images already stored in database/images.
+
+After quantizing, a report compares every variant against FP32:
+- per-model inference latency
+- ArcFace embedding cosine drift
+- SCRFD detection box agreement
+
+Usage:
+    python quantize_models.py                      # quantize both models, then report
+    python quantize_models.py --modes static       # static quantization only
+    python quantize_models.py --report-only        # report on existing variants
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+
+from download_models import QUANTIZATION_MODES, get_quantized_model_path
+from face_detection.scrfd_detector import SCRFD
+from face_recognition_module.arcface_recognizer import ArcFaceRecognizer
+from model_runtime.session_factory import create_session
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), 'models')
+IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'database', 'images')
+
+SCRFD_MODEL = 'det_10g.onnx'
+ARCFACE_MODEL = 'w600k_r50.onnx'
+
+CALIBRATION_INPUT_SIZE = (640, 640)
+
+
+def list_images(images_dir: str, aligned: bool) -> list:
+    """List full-frame or aligned images stored in the database."""
+    paths = sorted(glob.glob(os.path.join(images_dir, '*.jpg')))
+    return [p for p in paths if p.endswith('_aligned.jpg') == aligned]
+
+
+def load_images(paths: list, max_images: int) -> list:
+    """Load up to max_images readable images (BGR format)."""
+    images = []
+    for path in paths[:max_images]:
+        img = cv2.imread(path)
+        if img is not None:
+            images.append(img)
+    return images
+
+
+class ImageCalibrationReader(CalibrationDataReader):
+    """Feeds preprocessed database images to the static quantization calibrator."""
+
+    def __init__(self, input_name: str, blobs: list):
+        self.input_name = input_name
+        self.blobs = iter(blobs)
+
+    def get_next(self):
+        blob = next(self.blobs, None)
+        if blob is None:
+            return None
+        return {self.input_name: blob}
+
+
+def make_detection_blobs(detector: SCRFD, images: list) -> list:
+    """Letterbox and normalize full-frame images exactly as SCRFD.detect does."""
+    blobs = []
+    for img in images:
+        det_img, _ = detector._letterbox(img, CALIBRATION_INPUT_SIZE)
+        blob = np.empty((1, 3, CALIBRATION_INPUT_SIZE[1], CALIBRATION_INPUT_SIZE[0]), dtype=np.float32)
+        blobs.append(SCRFD._fill_blob(det_img[np.newaxis], blob))
+    return blobs
+
+
+def make_recognition_blobs(recognizer: ArcFaceRecognizer, images: list) -> list:
+    """Normalize aligned face images exactly as ArcFaceRecognizer does."""
+    return [recognizer.preprocess(img) for img in images]
+
+
+def quantize_model(model_path: str, mode: str, input_name: str = None, calibration_blobs: list = None) -> str:
+    """
+    Write one INT8 variant of a model.
+
+    Args:
+        model_path: Path to the FP32 model
+        mode: 'dynamic' or 'static'
+        input_name: Model input name (static mode)
+        calibration_blobs: Preprocessed calibration inputs (static mode)
+
+    Returns:
+        str: Path of the quantized model
+    """
+    output_path = get_quantized_model_path(model_path, mode)
+    print(f"⚙ Quantizing {os.path.basename(model_path)} ({mode}) -> {os.path.basename(output_path)}")
+
+    if mode == 'dynamic':
+        quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+    else:
+        assert calibration_blobs, "Static quantization needs calibration images"
+        quantize_static(
+            model_path,
+            output_path,
+            ImageCalibrationReader(input_name, calibration_blobs),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+    return output_path
+
+
+def measure_latency(session, input_name: str, blob: np.ndarray, runs: int) -> float:
+    """Median latency of session.run in milliseconds (after one warm-up run)."""
+    session.run(None, {input_name: blob})
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.run(None, {input_name: blob})
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def box_iou(box, boxes):
+    """IoU between one [x1, y1, x2, y2] box and an (N, 4) array of boxes."""
+    xx1 = np.maximum(box[0], boxes[:, 0])
+    yy1 = np.maximum(box[1], boxes[:, 1])
+    xx2 = np.minimum(box[2], boxes[:, 2])
+    yy2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-6)
+
+
+def compare_detections(reference: np.ndarray, candidate: np.ndarray, iou_thresh: float = 0.5):
+    """
+    Match candidate boxes to reference boxes greedily by IoU.
+
+    Returns:
+        Tuple of (agreement, mean_iou): fraction of boxes matched on both sides
+        and mean IoU of the matched pairs
+    """
+    if len(reference) == 0 and len(candidate) == 0:
+        return 1.0, 1.0
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0.0, 0.0
+
+    ref_boxes = reference[:, :4].astype(np.float32)
+    cand_boxes = candidate[:, :4].astype(np.float32)
+    unmatched = np.ones(len(cand_boxes), dtype=bool)
+    ious = []
+    for box in ref_boxes:
+        overlaps = box_iou(box, cand_boxes)
+        overlaps[~unmatched] = 0.0
+        best = int(np.argmax(overlaps))
+        if overlaps[best] >= iou_thresh:
+            unmatched[best] = False
+            ious.append(float(overlaps[best]))
+
+    agreement = len(ious) / max(len(ref_boxes), len(cand_boxes))
+    return agreement, float(np.mean(ious)) if ious else 0.0
+
+
+def report_detector(model_path: str, variants: dict, images: list, runs: int):
+    """Print latency and box agreement of SCRFD variants against FP32."""
+    print(f"\n{SCRFD_MODEL}")
+    print(f"  {'variant':<14}{'latency ms':>12}{'speedup':>10}{'box agreement':>16}{'mean IoU':>10}")
+
+    reference = SCRFD(session=create_session(model_path, providers=['CPUExecutionProvider']))
+    blob = make_detection_blobs(reference, images[:1])[0] if images else \
+        np.zeros((1, 3, CALIBRATION_INPUT_SIZE[1], CALIBRATION_INPUT_SIZE[0]), dtype=np.float32)
+    reference_dets = [reference.detect(img, input_size=CALIBRATION_INPUT_SIZE)[0] for img in images]
+    base_latency = measure_latency(reference.session, reference.input_name, blob, runs)
+    print(f"  {'fp32':<14}{base_latency:>12.2f}{1.0:>10.2f}{'-':>16}{'-':>10}")
+
+    for name, path in variants.items():
+        detector = SCRFD(session=create_session(path, providers=['CPUExecutionProvider']))
+        latency = measure_latency(detector.session, detector.input_name, blob, runs)
+        scores = [
+            compare_detections(ref, detector.detect(img, input_size=CALIBRATION_INPUT_SIZE)[0])
+            for img, ref in zip(images, reference_dets)
+        ]
+        agreement = np.mean([s[0] for s in scores]) if scores else float('nan')
+        mean_iou = np.mean([s[1] for s in scores]) if scores else float('nan')
+        print(f"  {name:<14}{latency:>12.2f}{base_latency / latency:>10.2f}{agreement:>16.3f}{mean_iou:>10.3f}")
+
+
+def report_recognizer(model_path: str, variants: dict, images: list, runs: int):
+    """Print latency and embedding cosine drift of ArcFace variants against FP32."""
+    print(f"\n{ARCFACE_MODEL}")
+    print(f"  {'variant':<14}{'latency ms':>12}{'speedup':>10}{'mean cosine':>14}{'min cosine':>12}")
+
+    reference = ArcFaceRecognizer(session=create_session(model_path, providers=['CPUExecutionProvider']))
+    blob = reference.preprocess(images[0]) if images else \
+        np.zeros((1, 3) + tuple(reference.input_size), dtype=np.float32)
+    reference_embeddings = reference.get_embeddings_batch(images) if images else None
+    base_latency = measure_latency(reference.session, reference.input_name, blob, runs)
+    print(f"  {'fp32':<14}{base_latency:>12.2f}{1.0:>10.2f}{'-':>14}{'-':>12}")
+
+    for name, path in variants.items():
+        recognizer = ArcFaceRecognizer(session=create_session(path, providers=['CPUExecutionProvider']))
+        latency = measure_latency(recognizer.session, recognizer.input_name, blob, runs)
+        if reference_embeddings is not None:
+            cosines = np.sum(reference_embeddings * recognizer.get_embeddings_batch(images), axis=1)
+            mean_cos, min_cos = float(np.mean(cosines)), float(np.min(cosines))
+        else:
+            mean_cos = min_cos = float('nan')
+        print(f"  {name:<14}{latency:>12.2f}{base_latency / latency:>10.2f}{mean_cos:>14.4f}{min_cos:>12.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create INT8 variants of the SCRFD and ArcFace models")
+    parser.add_argument('--models-dir', default=MODELS_DIR, help="Directory holding the FP32 models")
+    parser.add_argument('--images-dir', default=IMAGES_DIR, help="Calibration images (database/images)")
+    parser.add_argument('--modes', nargs='+', default=list(QUANTIZATION_MODES), choices=QUANTIZATION_MODES)
+    parser.add_argument('--max-images', type=int, default=200, help="Maximum calibration images per model")
+    parser.add_argument('--runs', type=int, default=20, help="Timed runs per model for the latency report")
+    parser.add_argument('--report-only', action='store_true', help="Skip quantization, report existing variants")
+    args = parser.parse_args()
+
+    scrfd_path = os.path.join(args.models_dir, SCRFD_MODEL)
+    arcface_path = os.path.join(args.models_dir, ARCFACE_MODEL)
+    for path in (scrfd_path, arcface_path):
+        if not os.path.exists(path):
+            print(f"✗ Missing {path} (run: python download_models.py)")
+            return 1
+
+    frames = load_images(list_images(args.images_dir, aligned=False), args.max_images)
+    faces = load_images(list_images(args.images_dir, aligned=True), args.max_images)
+    print(f"Calibration data: {len(frames)} frames, {len(faces)} aligned faces from {args.images_dir}")
+
+    if not args.report_only:
+        detector = SCRFD(session=create_session(scrfd_path, providers=['CPUExecutionProvider']))
+        recognizer = ArcFaceRecognizer(session=create_session(arcface_path, providers=['CPUExecutionProvider']))
+
+        for mode in args.modes:
+            if mode == 'static' and (not frames or not faces):
+                print("⚠ Skipping static quantization: no calibration images in database/images")
+                continue
+            quantize_model(scrfd_path, mode, detector.input_name, make_detection_blobs(detector, frames))
+            quantize_model(arcface_path, mode, recognizer.input_name, make_recognition_blobs(recognizer, faces))
+
+    scrfd_variants = {}
+    arcface_variants = {}
+    for mode in args.modes:
+        if os.path.exists(get_quantized_model_path(scrfd_path, mode)):
+            scrfd_variants[f"int8_{mode}"] = get_quantized_model_path(scrfd_path, mode)
+        if os.path.exists(get_quantized_model_path(arcface_path, mode)):
+            arcface_variants[f"int8_{mode}"] = get_quantized_model_path(arcface_path, mode)
+
+    print()
+    print("=" * 60)
+    print("Quantization Report (CPUExecutionProvider)")
+    print("=" * 60)
+    report_detector(scrfd_path, scrfd_variants, frames, args.runs)
+    report_recognizer(arcface_path, arcface_variants, faces, args.runs)
+    print()
+    print("Set MODEL_PRECISION (app.py or environment) to 'int8_dynamic' or 'int8_static' to use a variant.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
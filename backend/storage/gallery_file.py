@@ -0,0 +1,472 @@
+"""
+Consolidated Gallery File
+
+Stores every enrolled encoding in one file instead of one <person_id>.npy per
+person:
+
+    header    magic, version, embedding size, count, id width and the offsets
+              of the two sections (little-endian, padded to one page)
+    matrix    float32 (count, embedding_size), page-aligned, fixed row stride
+    id table  count fixed-width ASCII person ids
+
+The matrix is opened read-only with np.memmap, so all Gunicorn workers share
+its pages through the OS page cache instead of each holding a private copy.
+
+Registrations and deletions since the last compaction go to an append
+segment: a log of fixed-size records next to the gallery file. Compaction
+folds the log into a new gallery file (written to a temporary file and
+atomically renamed) and truncates the log. GalleryFile runs it in a
+background thread once the log holds `compact_threshold` records, or after
+`compact_interval` seconds. Writers in different processes are serialized
+with an flock on a lock file.
+
+Every process remembers which gallery file it mapped (inode, mtime and size)
+and how far it has replayed the log. The same background thread checks both
+every `refresh_interval` seconds, so records appended by other processes are
+picked up, and a gallery file replaced by another process's compaction is
+re-mapped (and the log replayed from the start).
+"""
+
+import glob
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+GALLERY_FILE_NAME = 'gallery.bin'
+APPEND_FILE_NAME = 'gallery.append'
+LOCK_FILE_NAME = 'gallery.lock'
+
+MAGIC = b'FGALLERY'
+VERSION = 1
+PAGE_SIZE = 4096
+
+# magic, version, embedding_size, count, id_width, matrix_offset, ids_offset
+HEADER = struct.Struct('<8sIIQQQQ')
+
+# Append segment record: op, id length, id bytes, then embedding_size float32 values
+RECORD_HEADER = struct.Struct('<BB62s')
+OP_ADD = 1
+OP_DELETE = 2
+MAX_ID_LENGTH = 62
+
+
+def write_gallery_file(path, person_ids, encodings, chunk_rows=65536):
+    """
+    Write a consolidated gallery file atomically (temporary file + rename).
+
+    Args:
+        path: Destination path
+        person_ids: Sequence of N unique person ids
+        encodings: Array-like of shape (N, embedding_size)
+        chunk_rows: Rows converted and written per step
+    """
+    encodings = np.asarray(encodings, dtype=np.float32)
+    count = len(person_ids)
+    assert encodings.ndim == 2 and len(encodings) == count
+    embedding_size = encodings.shape[1]
+
+    id_table = np.array([str(person_id).encode('ascii') for person_id in person_ids], dtype=bytes)
+    id_width = max(1, id_table.dtype.itemsize if count else 1)
+    id_table = id_table.astype(f'S{id_width}') if count else np.zeros(0, dtype=f'S{id_width}')
+
+    matrix_offset = PAGE_SIZE
+    ids_offset = matrix_offset + count * embedding_size * 4
+    header = HEADER.pack(MAGIC, VERSION, embedding_size, count, id_width, matrix_offset, ids_offset)
+
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(PAGE_SIZE, b'\0'))
+        for start in range(0, count, chunk_rows):
+            f.write(np.ascontiguousarray(encodings[start:start + chunk_rows], dtype='<f4').tobytes())
+        f.write(id_table.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def read_gallery_file(path):
+    """
+    Map a consolidated gallery file.
+
+    Args:
+        path: Gallery file path
+
+    Returns:
+        Tuple of (person_ids, encodings): a list of N ids and a read-only
+        np.memmap of shape (N, embedding_size)
+    """
+    with open(path, 'rb') as f:
+        magic, version, embedding_size, count, id_width, matrix_offset, ids_offset = HEADER.unpack(
+            f.read(HEADER.size)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a gallery file (version {VERSION}): {path}")
+        f.seek(ids_offset)
+        id_table = np.frombuffer(f.read(count * id_width), dtype=f'S{id_width}')
+
+    if count == 0:
+        encodings = np.zeros((0, embedding_size), dtype=np.float32)
+        encodings.flags.writeable = False
+    else:
+        encodings = np.memmap(path, dtype='<f4', mode='r', offset=matrix_offset, shape=(count, embedding_size))
+    return [person_id.decode('ascii') for person_id in id_table], encodings
+
+
+class GalleryFile:
+    """
+    Memory-mapped gallery file with an append segment and background compaction.
+    """
+
+    def __init__(self, directory, embedding_size=512, compact_threshold=1024, compact_interval=300.0,
+                 refresh_interval=1.0, on_compact=None):
+        """
+        Args:
+            directory: Directory of the gallery file (ENCODINGS_DIR)
+            embedding_size: Dimension of the face encodings
+            compact_threshold: Appended records that trigger a compaction
+            compact_interval: Seconds after which appended records are compacted anyway
+            refresh_interval: Seconds between checks for records and compactions
+                of other processes
+            on_compact: Optional callable run after each compaction, including
+                compactions of other processes (e.g. to re-map a search index
+                onto the new file)
+        """
+        self.directory = directory
+        self.embedding_size = embedding_size
+        self.compact_threshold = compact_threshold
+        self.compact_interval = compact_interval
+        self.refresh_interval = refresh_interval
+        self.on_compact = on_compact
+        self.path = os.path.join(directory, GALLERY_FILE_NAME)
+        self.append_path = os.path.join(directory, APPEND_FILE_NAME)
+        self.lock_path = os.path.join(directory, LOCK_FILE_NAME)
+        self.record_size = RECORD_HEADER.size + embedding_size * 4
+
+        self._lock = threading.RLock()
+        self._ids = []
+        self._matrix = np.zeros((0, embedding_size), dtype=np.float32)
+        self._rows = {}  # person id -> row of the mapped matrix
+        self._pending = {}  # person id -> encoding (None = deleted) appended since the last compaction
+        self._num_records = 0
+        self._identity = None  # (inode, mtime, size) of the mapped gallery file
+        self._offset = 0  # bytes of the append segment replayed into _pending
+        self._last_compaction = time.monotonic()
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.compactions = 0
+        self.last_compaction_seconds = 0.0
+
+    def __len__(self):
+        with self._lock:
+            deleted = sum(1 for person_id, encoding in self._pending.items()
+                          if encoding is None and person_id in self._rows)
+            added = sum(1 for person_id, encoding in self._pending.items()
+                        if encoding is not None and person_id not in self._rows)
+            return len(self._rows) - deleted + added
+
+    def __contains__(self, person_id):
+        return self.get(person_id) is not None
+
+    def exists(self):
+        """True if the gallery file has been created."""
+        return os.path.exists(self.path)
+
+    def _file_lock(self):
+        return _FileLock(self.lock_path)
+
+    def open(self):
+        """
+        Map the gallery file, creating an empty one if needed. Records left in
+        the append segment (e.g. after a crash) are compacted first.
+
+        Returns:
+            self
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, self._file_lock():
+            if not self.exists():
+                write_gallery_file(self.path, [], np.zeros((0, self.embedding_size), dtype=np.float32))
+            self._map()
+            self._replay_append_segment()
+            if self._num_records:
+                self._compact_locked()
+        return self
+
+    def _file_identity(self):
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _map(self):
+        """Map the gallery file on disk (with the file lock held) and forget the replayed log."""
+        identity = self._file_identity()
+        person_ids, matrix = read_gallery_file(self.path)
+        if matrix.shape[1] != self.embedding_size:
+            raise ValueError(f"Gallery file has {matrix.shape[1]}-d encodings, expected {self.embedding_size}")
+        self._ids = person_ids
+        self._matrix = matrix
+        self._rows = {person_id: row for row, person_id in enumerate(person_ids)}
+        self._pending = {}
+        self._num_records = 0
+        self._identity = identity
+        self._offset = 0
+
+    def refresh(self):
+        """
+        Pick up the records appended and the compactions done by other processes.
+
+        Returns:
+            bool: True if the gallery file was re-mapped (on_compact has run)
+        """
+        with self._lock, self._file_lock():
+            remapped = self._refresh_locked()
+        if remapped:
+            self._notify_compact()
+        return remapped
+
+    def _refresh_locked(self):
+        remapped = False
+        append_size = os.path.getsize(self.append_path) if os.path.exists(self.append_path) else 0
+        # A new gallery file, or a log shorter than what was replayed, means another process compacted
+        if self._file_identity() != self._identity or append_size < self._offset:
+            self._map()
+            self._last_compaction = time.monotonic()
+            remapped = True
+        self._replay_append_segment()
+        return remapped
+
+    def get(self, person_id):
+        """Get a copy of a person's encoding, or None if not stored."""
+        with self._lock:
+            if person_id in self._pending:
+                encoding = self._pending[person_id]
+                return None if encoding is None else encoding.copy()
+            row = self._rows.get(person_id)
+            return None if row is None else np.array(self._matrix[row])
+
+    def read(self):
+        """
+        All stored encodings.
+
+        Returns:
+            Tuple of (person_ids, encodings). Without pending appended records
+            the encodings are the shared read-only memory map itself.
+        """
+        with self._lock:
+            if not self._pending:
+                return list(self._ids), self._matrix
+            keep = np.array([person_id not in self._pending for person_id in self._ids], dtype=bool)
+            added = [(person_id, encoding) for person_id, encoding in self._pending.items() if encoding is not None]
+            person_ids = [person_id for person_id, kept in zip(self._ids, keep) if kept]
+            person_ids += [person_id for person_id, _ in added]
+            encodings = np.concatenate([
+                np.asarray(self._matrix[keep], dtype=np.float32).reshape(-1, self.embedding_size),
+                np.asarray([encoding for _, encoding in added], dtype=np.float32).reshape(-1, self.embedding_size)
+            ])
+            return person_ids, encodings
+
+    def append(self, person_id, encoding):
+        """Store a person's encoding (replacing an existing one) in the append segment."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.embedding_size)
+        self._write_records([(OP_ADD, person_id, encoding)])
+
+    def append_many(self, person_ids, encodings):
+        """Store several encodings with a single write and fsync."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.embedding_size)
+        assert len(person_ids) == encodings.shape[0]
+        self._write_records([(OP_ADD, person_id, encoding) for person_id, encoding in zip(person_ids, encodings)])
+
+    def delete(self, person_id):
+        """
+        Delete a person's encoding.
+
+        Returns:
+            bool: True if the person was stored
+        """
+        with self._lock:
+            if self.get(person_id) is None:
+                return False
+            self._write_records([(OP_DELETE, person_id, None)])
+            return True
+
+    def _pack_record(self, op, person_id, encoding):
+        id_bytes = str(person_id).encode('ascii')
+        if len(id_bytes) > MAX_ID_LENGTH:
+            raise ValueError(f"Person id longer than {MAX_ID_LENGTH} characters: {person_id}")
+        record = RECORD_HEADER.pack(op, len(id_bytes), id_bytes)
+        return record + (np.zeros(self.embedding_size, dtype='<f4') if encoding is None else encoding.astype('<f4')).tobytes()
+
+    def _write_records(self, records):
+        """Append (op, person_id, encoding) records with one write and fsync."""
+        data = b''.join(self._pack_record(*record) for record in records)
+
+        with self._lock:
+            with self._file_lock():
+                # Catch up with the other processes first, so the replayed offset stays record-aligned
+                remapped = self._refresh_locked()
+                with open(self.append_path, 'ab') as f:
+                    # A record torn by a crashed writer would misalign everything after it
+                    if f.tell() != self._offset:
+                        f.truncate(self._offset)
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._offset += len(data)
+            for _, person_id, encoding in records:
+                self._pending[person_id] = None if encoding is None else encoding.copy()
+            self._num_records += len(records)
+            if self._num_records >= self.compact_threshold:
+                self._wake.set()
+        if remapped:
+            self._notify_compact()
+
+    def _replay_append_segment(self):
+        """Apply the records appended (by any process) since the last replay, leaving a torn last record."""
+        if not os.path.exists(self.append_path):
+            return
+        with open(self.append_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        usable = len(data) - len(data) % self.record_size
+        for offset in range(0, usable, self.record_size):
+            op, id_length, id_bytes = RECORD_HEADER.unpack_from(data, offset)
+            person_id = id_bytes[:id_length].decode('ascii')
+            if op == OP_ADD:
+                self._pending[person_id] = np.frombuffer(
+                    data, dtype='<f4', count=self.embedding_size, offset=offset + RECORD_HEADER.size
+                ).astype(np.float32)
+            elif op == OP_DELETE:
+                self._pending[person_id] = None
+        self._offset += usable
+        self._num_records += usable // self.record_size
+
+    def compact(self):
+        """Fold the append segment into a new gallery file and re-map it."""
+        with self._lock, self._file_lock():
+            self._compact_locked()
+        self._notify_compact()
+
+    def _notify_compact(self):
+        if self.on_compact is not None:
+            try:
+                self.on_compact()
+            except Exception as e:
+                print(f"Error after gallery compaction: {e}")
+
+    def _compact_locked(self):
+        start = time.perf_counter()
+        # Another process may have compacted or appended in the meantime
+        self._refresh_locked()
+        if self._pending:
+            person_ids, encodings = self.read()
+            write_gallery_file(self.path, person_ids, encodings)
+        with open(self.append_path, 'wb') as f:
+            os.fsync(f.fileno())
+        self._map()
+        self._last_compaction = time.monotonic()
+        self.compactions += 1
+        self.last_compaction_seconds = time.perf_counter() - start
+
+    def start(self):
+        """Start the background compaction thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='gallery-compaction', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background compaction thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh()
+                due = time.monotonic() - self._last_compaction >= self.compact_interval
+                if self._num_records >= self.compact_threshold or (due and self._num_records):
+                    self.compact()
+            except Exception as e:
+                print(f"Error compacting gallery file: {e}")
+
+    def get_stats(self):
+        """Sizes of the mapped gallery and the append segment."""
+        with self._lock:
+            return {
+                'path': self.path,
+                'mapped_encodings': len(self._ids),
+                'pending_records': self._num_records,
+                'compactions': self.compactions,
+                'last_compaction_seconds': round(self.last_compaction_seconds, 3)
+            }
+
+
+class _FileLock:
+    """Exclusive flock on a lock file (no-op where fcntl is unavailable)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def migrate_encoding_files(encodings_dir, embedding_size=512):
+    """
+    Build the consolidated gallery file from per-person <person_id>.npy files.
+
+    Args:
+        encodings_dir: Directory holding one .npy encoding per person
+        embedding_size: Dimension of the face encodings
+
+    Returns:
+        Tuple of (migrated person ids, list of files that could not be read)
+    """
+    person_ids = []
+    encodings = []
+    failed = []
+    paths = sorted(glob.glob(os.path.join(encodings_dir, '*.npy')))
+    for path in paths:
+        try:
+            encoding = np.asarray(np.load(path), dtype=np.float32).reshape(embedding_size)
+        except Exception as e:
+            print(f"Error loading encoding {path}: {e}")
+            failed.append(path)
+            continue
+        person_ids.append(os.path.splitext(os.path.basename(path))[0])
+        encodings.append(encoding)
+
+    gallery = GalleryFile(encodings_dir, embedding_size)
+    with gallery._file_lock():
+        write_gallery_file(gallery.path, person_ids, np.asarray(encodings, dtype=np.float32).reshape(-1, embedding_size))
+        # Records appended against a previous gallery file no longer apply
+        if os.path.exists(gallery.append_path):
+            os.remove(gallery.append_path)
+    return person_ids, failed
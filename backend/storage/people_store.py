@@ -0,0 +1,247 @@
+"""
+SQLite People Store
+
+Keeps the registered people in an SQLite database (WAL mode, so request
+threads and worker processes read while another one writes) with indexed
+lookups by id and employee_id. Registering or deleting a person writes one
+row instead of rewriting the whole people.json.
+
+Every write bumps a version counter in the same transaction and stamps the
+rows it touches (deletions leave a tombstone) with the new version. Readers
+keep the people list and an id -> person dict in memory and, when the stored
+version has moved, fetch only the rows changed since their cached version, so
+the hot path costs one primary-key lookup instead of parsing every record.
+Writes from other processes are picked up the same way. The cached dict is
+replaced, never modified, so a caller's copy stays consistent.
+
+people.json remains the import/export format (import_json / export_json).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+# Columns of the people table; other keys of a person record are kept as JSON in 'extra'
+PERSON_COLUMNS = ('id', 'name', 'email', 'employee_id', 'image_path', 'aligned_path',
+                  'encoding_path', 'added_date', 'image_count')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS people (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    employee_id TEXT,
+    image_path TEXT,
+    aligned_path TEXT,
+    encoding_path TEXT,
+    added_date TEXT,
+    image_count INTEGER,
+    extra TEXT,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS people_employee_id ON people (employee_id);
+CREATE INDEX IF NOT EXISTS people_version ON people (version);
+CREATE TABLE IF NOT EXISTS deleted (id TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS deleted_version ON deleted (version);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+
+class PeopleStore:
+    """
+    People records in SQLite with a version-checked in-memory cache.
+    """
+
+    def __init__(self, db_path, timeout=30.0):
+        """
+        Open (and create if needed) the people database.
+
+        Args:
+            db_path: Path of the SQLite database file
+            timeout: Seconds to wait for a lock held by another writer
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._cache_version = -1
+        self._people = []
+        self._by_id = {}
+
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        connection.commit()
+
+    def _connection(self):
+        """SQLite connection of the calling thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=self.timeout)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _to_row(person, version):
+        extra = {key: value for key, value in person.items() if key not in PERSON_COLUMNS}
+        row = tuple(person.get(column) for column in PERSON_COLUMNS)
+        return row + (json.dumps(extra) if extra else None, version)
+
+    @staticmethod
+    def _to_person(row):
+        person = {column: row[column] for column in PERSON_COLUMNS if row[column] is not None}
+        if row['extra']:
+            person.update(json.loads(row['extra']))
+        return person
+
+    @property
+    def version(self):
+        """Version counter, incremented by every write."""
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0])
+
+    def _refresh(self):
+        """Bring the cached records up to the stored version."""
+        version = self.version
+        if version == self._cache_version:
+            return
+        with self._cache_lock:
+            if version == self._cache_version:
+                return
+            connection = self._connection()
+            if self._cache_version < 0:
+                rows = connection.execute('SELECT * FROM people ORDER BY rowid').fetchall()
+                by_id = {row['id']: self._to_person(row) for row in rows}
+            else:
+                # Rows written after `version` was read are applied again on the next refresh
+                by_id = dict(self._by_id)
+                deleted = connection.execute(
+                    'SELECT id FROM deleted WHERE version > ?', (self._cache_version,)
+                ).fetchall()
+                for row in deleted:
+                    by_id.pop(row['id'], None)
+                changed = connection.execute(
+                    'SELECT * FROM people WHERE version > ?', (self._cache_version,)
+                ).fetchall()
+                for row in changed:
+                    by_id[row['id']] = self._to_person(row)
+            self._by_id = by_id
+            self._people = None  # Rebuilt from by_id on the next all()
+            self._cache_version = version
+
+    def all(self):
+        """
+        All people, in registration order.
+
+        Returns:
+            List of person dicts (shared cache: do not modify)
+        """
+        self._refresh()
+        people = self._people
+        if people is None:
+            people = self._people = list(self._by_id.values())
+        return people
+
+    def by_id(self):
+        """
+        All people keyed by id.
+
+        Returns:
+            Dict of person id -> person dict (shared cache: do not modify)
+        """
+        self._refresh()
+        return self._by_id
+
+    def count(self):
+        """Number of registered people."""
+        return len(self.by_id())
+
+    def get(self, person_id):
+        """Get a person by id, or None."""
+        return self.by_id().get(person_id)
+
+    def get_by_employee_id(self, employee_id):
+        """Get the people with an employee id (indexed lookup)."""
+        rows = self._connection().execute('SELECT * FROM people WHERE employee_id = ?', (employee_id,)).fetchall()
+        return [self._to_person(row) for row in rows]
+
+    def _write(self, apply):
+        """Bump the version and run apply(connection, version) in one transaction."""
+        connection = self._connection()
+        with connection:
+            connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            version = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            apply(connection, version)
+
+    def _insert(self, connection, people, version):
+        placeholders = ', '.join('?' * (len(PERSON_COLUMNS) + 2))
+        connection.executemany(
+            f"INSERT OR REPLACE INTO people ({', '.join(PERSON_COLUMNS)}, extra, version) VALUES ({placeholders})",
+            [self._to_row(person, version) for person in people]
+        )
+
+    def add(self, person):
+        """Insert or replace one person."""
+        self.add_many([person])
+
+    def add_many(self, people):
+        """Insert or replace several people in one transaction."""
+        self._write(lambda connection, version: self._insert(connection, people, version))
+
+    def delete(self, person_id):
+        """
+        Delete a person.
+
+        Returns:
+            bool: True if the person existed
+        """
+        if self.get(person_id) is None:
+            return False
+
+        def apply(connection, version):
+            connection.execute('DELETE FROM people WHERE id = ?', (person_id,))
+            connection.execute('INSERT OR REPLACE INTO deleted (id, version) VALUES (?, ?)', (person_id, version))
+
+        self._write(apply)
+        return True
+
+    def import_json(self, json_path, replace=False):
+        """
+        Load people from a people.json file.
+
+        Args:
+            json_path: Path of the JSON list of person records
+            replace: Delete all current records first
+
+        Returns:
+            int: Number of imported people
+        """
+        with open(json_path, 'r') as f:
+            people = [person for person in json.load(f) if person.get('id')]
+
+        def apply(connection, version):
+            if replace:
+                connection.execute('INSERT OR REPLACE INTO deleted (id, version) SELECT id, ? FROM people', (version,))
+                connection.execute('DELETE FROM people')
+            self._insert(connection, people, version)
+
+        self._write(apply)
+        return len(people)
+
+    def export_json(self, json_path):
+        """
+        Write all people to a people.json file (atomically).
+
+        Returns:
+            int: Number of exported people
+        """
+        people = self.all()
+        temp_path = f"{json_path}.tmp-{os.getpid()}"
+        with open(temp_path, 'w') as f:
+            json.dump(people, f, indent=2)
+        os.replace(temp_path, json_path)
+        return len(people)
@@ -89,6 +89,37 @@ def test_face_encoding():
         print(f"✗ Face encoding test failed: {e}")
         return False
 
+def test_face_alignment():
+    """Cross-check the NumPy alignment transforms against scikit-image"""
+    print("\nTesting face alignment...")
+    
+    try:
+        import numpy as np
+        from face_alignment.alignment import estimate_norm_batch, estimate_norm_reference, get_arcface_dst, trans
+        
+        if trans is None:
+            print("⚠ scikit-image not installed - skipping the reference comparison")
+            return True
+        
+        # Template landmarks moved, scaled and rotated like detected faces
+        rng = np.random.default_rng(0)
+        angles = rng.uniform(-0.6, 0.6, 100)
+        rotations = np.stack([np.cos(angles), -np.sin(angles), np.sin(angles), np.cos(angles)], axis=1).reshape(-1, 2, 2)
+        landmarks = (get_arcface_dst()[np.newaxis] @ rotations * rng.uniform(0.5, 4.0, (100, 1, 1))
+                     + rng.uniform(0, 600, (100, 1, 2)) + rng.normal(0, 2.0, (100, 5, 2))).astype(np.float32)
+        
+        batch = estimate_norm_batch(landmarks)
+        reference = np.array([estimate_norm_reference(lmk) for lmk in landmarks])
+        difference = float(np.abs(batch - reference).max())
+        if difference > 1e-3:
+            print(f"✗ Alignment transforms differ from scikit-image (max abs difference {difference:.2e})")
+            return False
+        print(f"✓ Alignment transforms match scikit-image (max abs difference {difference:.2e})")
+        return True
+    except Exception as e:
+        print(f"✗ Face alignment test failed: {e}")
+        return False
+
 def test_directories():
     """Test if database directories exist"""
     print("\nChecking database directories...")
@@ -150,6 +181,7 @@ def main():
         ("Import Test", test_imports),
         ("Face Detection Test", test_face_detection),
         ("Face Encoding Test", test_face_encoding),
+        ("Face Alignment Test", test_face_alignment),
         ("Directory Test", test_directories)
     ]
     